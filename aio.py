@@ -0,0 +1,108 @@
+# aio.py
+# Shared asyncio I/O core. Each server process runs one event loop on a daemon
+# thread; page code hands it batches of network calls (translation, Gemini, asset
+# downloads) and waits for them together instead of one after another. Every lane
+# has its own concurrency limit and timeout, so a page fanning out dozens of
+# translations cannot starve the tutor or hold a script run forever.
+#
+# googletrans, google-generativeai and requests are blocking clients, so calls run
+# on a bounded thread pool owned by the loop; the loop does the scheduling,
+# limiting and timeouts.
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Concurrent calls allowed per lane, and seconds before a call is abandoned
+LANE_LIMITS = {'translate': 8, 'llm': 4, 'http': 4}
+LANE_TIMEOUTS = {'translate': 10, 'llm': 60, 'http': 10}
+DEFAULT_LIMIT = 4
+DEFAULT_TIMEOUT = 30
+
+
+class IOLoop:
+    def __init__(self, limits=LANE_LIMITS, timeouts=LANE_TIMEOUTS, max_workers=None):
+        self.limits = dict(limits)
+        self.timeouts = dict(timeouts)
+        # Abandoned (timed-out) calls keep their thread until the client returns, so leave headroom
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or 2 * sum(self.limits.values()),
+                                            thread_name_prefix='aio')
+        self._semaphores = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='aio-loop', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    # Semaphores are created on the loop thread, the only place they are used
+    def _semaphore(self, lane):
+        if lane not in self._semaphores:
+            self._semaphores[lane] = asyncio.Semaphore(self.limits.get(lane, DEFAULT_LIMIT))
+        return self._semaphores[lane]
+
+    def _count(self, lane, outcome):
+        with self._stats_lock:
+            counts = self._stats.setdefault(lane, {'calls': 0, 'errors': 0, 'timeouts': 0})
+            counts[outcome] += 1
+
+    # Run a blocking func(*args) in lane under the lane's limit and timeout
+    async def call(self, lane, func, *args, timeout=None):
+        timeout = timeout if timeout is not None else self.timeouts.get(lane, DEFAULT_TIMEOUT)
+        async with self._semaphore(lane):
+            self._count(lane, 'calls')
+            try:
+                return await asyncio.wait_for(self.loop.run_in_executor(self._executor, partial(func, *args)), timeout)
+            except asyncio.TimeoutError:
+                self._count(lane, 'timeouts')
+                raise
+            except Exception:
+                self._count(lane, 'errors')
+                raise
+
+    # All calls at once; failures and timeouts come back as exception objects in place
+    async def gather(self, lane, func, arg_tuples, timeout=None):
+        return await asyncio.gather(*(self.call(lane, func, *args, timeout=timeout) for args in arg_tuples),
+                                    return_exceptions=True)
+
+    # Blocking entry point for script threads: wait for a coroutine scheduled on the loop
+    def run(self, coro, timeout=None):
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("IOLoop.run() called from the event loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def map(self, lane, func, arg_tuples, timeout=None):
+        arg_tuples = list(arg_tuples)
+        if not arg_tuples:
+            return []
+        return self.run(self.gather(lane, func, arg_tuples, timeout))
+
+    # Schedule one call without waiting; returns a concurrent.futures.Future
+    def submit(self, lane, func, *args, timeout=None):
+        return asyncio.run_coroutine_threadsafe(self.call(lane, func, *args, timeout=timeout), self.loop)
+
+    # Executor-like view of a lane, for code written against executor.submit(fn, *args)
+    def executor(self, lane):
+        return LaneExecutor(self, lane)
+
+    def stats(self):
+        with self._stats_lock:
+            return {lane: dict(counts) for lane, counts in self._stats.items()}
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+
+class LaneExecutor:
+    def __init__(self, io_loop, lane):
+        self.io_loop = io_loop
+        self.lane = lane
+
+    def submit(self, func, *args):
+        return self.io_loop.submit(self.lane, func, *args)
@@ -0,0 +1,153 @@
+# arcade.py
+# Server side of the browser games in components/<game>/. The server deals a game
+# from a random seed and signs the seed into a token; the page hands the deal and
+# the token to the game's component, which plays entirely in the browser and
+# reports back once, with its list of moves. The token is checked (signature,
+# player, age, not used before), the moves are replayed against the deal derived
+# again from the seed, and the score is computed here, so neither a posted score
+# nor a game that was never dealt can count.
+#
+# Adding a game: a deal(rng) -> layout function, a replay(layout, moves) ->
+# (score, moves made) function raising InvalidGame, an entry in GAMES, and a
+# component at components/<name>/index.html.
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+COMPONENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'components')
+TOKEN_TTL = 2 * 3600
+# Faster than this per move is a script, not a student
+MIN_SECONDS_PER_MOVE = 0.3
+
+MEMORY_SYMBOLS = ['π', '√', '∞', 'α', 'β', '∫', '∑', 'Δ']
+MEMORY_MAX_MOVES = 200
+
+ArcadeGame = namedtuple('ArcadeGame', 'name subject max_score deal replay')
+Verdict = namedtuple('Verdict', 'ok game score reason')
+
+
+class InvalidGame(Exception):
+    pass
+
+
+def deal_memory_match(rng):
+    cards = MEMORY_SYMBOLS * 2
+    rng.shuffle(cards)
+    return cards
+
+
+# moves: card indices in the order they were turned over; every two are one move
+def replay_memory_match(cards, moves):
+    if not isinstance(moves, list) or len(moves) % 2 or len(moves) > 2 * MEMORY_MAX_MOVES:
+        raise InvalidGame("moves must be pairs of cards")
+    matched = [False] * len(cards)
+    for first, second in zip(moves[::2], moves[1::2]):
+        for card in (first, second):
+            if type(card) is not int or not 0 <= card < len(cards) or matched[card]:
+                raise InvalidGame(f"card {card!r} cannot be turned over")
+        if first == second:
+            raise InvalidGame("the same card twice in one move")
+        if cards[first] == cards[second]:
+            matched[first] = matched[second] = True
+    if not all(matched):
+        raise InvalidGame("not every pair was matched")
+    made = len(moves) // 2
+    return max(10, 100 - (made - len(cards) // 2) * 5), made
+
+
+GAMES = {
+    'memory_match': ArcadeGame("Memory Match", "General", 100, deal_memory_match, replay_memory_match),
+}
+
+
+class Arcade:
+    def __init__(self, db, secret=None, games=GAMES, token_ttl=TOKEN_TTL, min_seconds_per_move=MIN_SECONDS_PER_MOVE):
+        self.db = db
+        self.games = games
+        self.token_ttl = token_ttl
+        self.min_seconds_per_move = min_seconds_per_move
+        self.secret = (secret or self._shared_secret()).encode('utf-8')
+        # Seeds already scored, until their tokens expire; per process, like the auth rate limits
+        self._spent = {}
+        self._lock = threading.Lock()
+        self.dealt = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    # Generated once and kept in the database, so every server process signs with the same key
+    def _shared_secret(self):
+        with self.db.transaction() as c:
+            c.execute("INSERT OR IGNORE INTO app_secrets (name, value) VALUES ('arcade', ?)", (secrets.token_hex(32),))
+            c.execute("SELECT value FROM app_secrets WHERE name = 'arcade'")
+            return c.fetchone()[0]
+
+    def _sign(self, payload):
+        return base64.urlsafe_b64encode(hmac.new(self.secret, payload, hashlib.sha256).digest()).rstrip(b'=')
+
+    def deal(self, game, seed):
+        return self.games[game].deal(random.Random(seed))
+
+    # (token, layout) for a new game; the layout is what the component shows
+    def new_game(self, user_id, game):
+        seed = secrets.randbits(64)
+        payload = json.dumps({'g': game, 'u': user_id, 's': seed, 't': time.time()},
+                             separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self.dealt += 1
+        return (base64.urlsafe_b64encode(payload).rstrip(b'=') + b'.' + self._sign(payload)).decode('ascii'), \
+            self.deal(game, seed)
+
+    def _claims(self, token):
+        try:
+            encoded, signature = token.encode('ascii').split(b'.')
+            payload = base64.urlsafe_b64decode(encoded + b'=' * (-len(encoded) % 4))
+            claims = json.loads(payload)
+        except (AttributeError, ValueError, UnicodeError):
+            raise InvalidGame("malformed token")
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            raise InvalidGame("bad signature")
+        return claims
+
+    def _check(self, user_id, token, moves, now):
+        claims = self._claims(token)
+        if claims.get('u') != user_id or claims.get('g') not in self.games:
+            raise InvalidGame("token is for another player or game")
+        elapsed = now - claims.get('t', 0)
+        if elapsed > self.token_ttl:
+            raise InvalidGame("token expired")
+        game = self.games[claims['g']]
+        score, made = game.replay(self.deal(claims['g'], claims['s']), moves)
+        if elapsed < made * self.min_seconds_per_move:
+            raise InvalidGame(f"{made} moves in {elapsed:.1f}s")
+        with self._lock:
+            for seed, expires in list(self._spent.items()):
+                if expires < now:
+                    del self._spent[seed]
+            if claims['s'] in self._spent:
+                raise InvalidGame("already scored")
+            self._spent[claims['s']] = claims['t'] + self.token_ttl
+        return game, score
+
+    # The score for a finished game, computed from its moves; each token scores once
+    def submit(self, user_id, token, moves):
+        try:
+            game, score = self._check(user_id, token, moves, time.time())
+        except InvalidGame as e:
+            with self._lock:
+                self.rejected += 1
+            return Verdict(False, None, None, str(e))
+        with self._lock:
+            self.accepted += 1
+        return Verdict(True, game, score, None)
+
+    def stats(self):
+        with self._lock:
+            return {'dealt': self.dealt, 'accepted': self.accepted, 'rejected': self.rejected,
+                    'spent_tokens': len(self._spent)}
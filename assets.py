@@ -0,0 +1,123 @@
+# assets.py
+# Local store for remote Lottie animations. Animations are kept on disk with
+# ETag/age metadata, loaded lazily on first use and refreshed in the background,
+# so rendering a page never waits on the network.
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LOTTIE_ASSET_DIR = os.path.join('assets', 'lottie')
+LOTTIE_MAX_AGE = 7 * 24 * 3600
+FETCH_TIMEOUT = 5
+RETRY_INTERVAL = 60
+
+
+class LottieStore:
+    # With an aio.IOLoop, downloads share its 'http' lane instead of a private thread pool
+    def __init__(self, urls, asset_dir=LOTTIE_ASSET_DIR, max_age=LOTTIE_MAX_AGE, max_workers=4, io_loop=None):
+        self.urls = dict(urls)
+        self.asset_dir = asset_dir
+        self.max_age = max_age
+        self._memory = {}  # name -> (data or None, fetched_at)
+        self._in_flight = set()
+        self._last_attempt = {}
+        self._lock = threading.Lock()
+        self._io_loop = io_loop
+        self._executor = None if io_loop else ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lottie')
+        os.makedirs(asset_dir, exist_ok=True)
+
+    def _data_path(self, name):
+        return os.path.join(self.asset_dir, f"{name}.json")
+
+    def _meta_path(self, name):
+        return os.path.join(self.asset_dir, f"{name}.meta.json")
+
+    def _read_meta(self, name):
+        try:
+            with open(self._meta_path(name), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    # When the copy on disk was fetched; 0 if it was fetched from a different URL
+    def _fetched_at(self, name):
+        meta = self._read_meta(name)
+        return meta.get('fetched_at', 0) if meta.get('url') == self.urls[name] else 0
+
+    # Returns the animation if it is available locally, otherwise None; never blocks on the network.
+    # A missing or stale copy is refreshed in the background, at most once per RETRY_INTERVAL.
+    def get(self, name):
+        with self._lock:
+            if name in self._memory:
+                data, fetched_at = self._memory[name]
+                if (data is None or time.time() - fetched_at > self.max_age) and \
+                        time.time() - self._last_attempt.get(name, 0) > RETRY_INTERVAL:
+                    self._in_flight_submit(name)
+                return data
+        data = None
+        try:
+            with open(self._data_path(name), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        fetched_at = self._fetched_at(name)
+        with self._lock:
+            self._memory[name] = (data, fetched_at)
+        if data is None or time.time() - fetched_at > self.max_age:
+            self.refresh_async(name)
+        return data
+
+    def refresh_async(self, name):
+        with self._lock:
+            self._in_flight_submit(name)
+
+    # Caller holds self._lock
+    def _in_flight_submit(self, name):
+        if name in self._in_flight:
+            return
+        self._in_flight.add(name)
+        self._last_attempt[name] = time.time()
+        if self._io_loop:
+            self._io_loop.submit('http', self._refresh, name)
+        else:
+            self._executor.submit(self._refresh, name)
+
+    def _refresh(self, name):
+        import requests  # only once an animation is actually fetched
+        try:
+            url = self.urls[name]
+            meta = self._read_meta(name)
+            headers = {}
+            if meta.get('etag') and meta.get('url') == url and os.path.exists(self._data_path(name)):
+                headers['If-None-Match'] = meta['etag']
+            r = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+            if r.status_code == 304:
+                meta['fetched_at'] = time.time()
+                self._write_json(self._meta_path(name), meta)
+                with self._lock:
+                    if name in self._memory:
+                        self._memory[name] = (self._memory[name][0], meta['fetched_at'])
+            elif r.status_code == 200:
+                data = r.json()
+                fetched_at = time.time()
+                self._write_json(self._data_path(name), data)
+                self._write_json(self._meta_path(name), {
+                    'url': url,
+                    'etag': r.headers.get('ETag'),
+                    'fetched_at': fetched_at,
+                })
+                with self._lock:
+                    self._memory[name] = (data, fetched_at)
+        except (requests.RequestException, ValueError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._in_flight.discard(name)
@@ -0,0 +1,266 @@
+# auth.py
+# Login path with bounded bcrypt cost. Password checks run on a small worker pool
+# and are shed once too many are waiting, so a class logging in together queues
+# for a few cores instead of starving every other request. Failed attempts are
+# rate limited per username and per client address before any hashing happens.
+# A successful login yields a signed session token; presenting it restores the
+# session with one HMAC check instead of another bcrypt run. Tokens travel in the
+# page URL, so they are short-lived and single-use: each carries the user's session
+# generation, which every newly issued token, every restore and logout move on,
+# so a token left in browser history stops working. Hashes made with an older
+# work factor are upgraded on the next good login.
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get('EDUGAMIFY_BCRYPT_ROUNDS', 12))
+HASH_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Checks allowed to wait for a worker before new logins are turned away as busy
+MAX_PENDING = 32
+CHECK_TIMEOUT = 15
+TOKEN_TTL = 3600
+
+# (failed attempts, window seconds). Only failures count per address: a whole class
+# behind one school NAT or reverse proxy logs in from a single address
+USERNAME_FAILURE_LIMIT = (5, 300)
+ADDRESS_FAILURE_LIMIT = (50, 60)
+
+OK = 'ok'
+INVALID = 'invalid'
+RATE_LIMITED = 'rate_limited'
+BUSY = 'busy'
+
+USER_COLUMNS = "id, username, password, name, grade, school, language, avatar, points"
+
+LoginResult = namedtuple('LoginResult', 'status user')
+
+
+class Busy(Exception):
+    pass
+
+
+class RateLimiter:
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._hits = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+
+    # Caller holds self._lock
+    def _recent(self, key, now):
+        hits = self._hits.get(key)
+        if hits is None:
+            return None
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        return hits
+
+    def allowed(self, key):
+        now = time.monotonic()
+        with self._lock:
+            hits = self._recent(key, now)
+            return hits is None or len(hits) < self.limit
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            hits = self._recent(key, now)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            hits.append(now)
+            if now - self._pruned_at > self.window:
+                self._prune(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    # Caller holds self._lock; drop keys with no hits left in the window
+    def _prune(self, now):
+        for key in [key for key in self._hits if not self._recent(key, now)]:
+            del self._hits[key]
+        self._pruned_at = now
+
+
+class Authenticator:
+    def __init__(self, db, secret=None, rounds=BCRYPT_ROUNDS, workers=HASH_WORKERS, max_pending=MAX_PENDING,
+                 token_ttl=TOKEN_TTL):
+        self.db = db
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self.token_ttl = token_ttl
+        self.secret = (secret or self._shared_secret()).encode('utf-8')
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.username_failures = RateLimiter(*USERNAME_FAILURE_LIMIT)
+        self.address_failures = RateLimiter(*ADDRESS_FAILURE_LIMIT)
+        self.checks = 0
+        self.shed = 0
+        self.rehashed = 0
+
+    # Generated once and kept in the database, so every server process signs with the same key
+    def _shared_secret(self):
+        with self.db.transaction() as c:
+            c.execute("INSERT OR IGNORE INTO app_secrets (name, value) VALUES ('session_token', ?)",
+                      (secrets.token_hex(32),))
+            c.execute("SELECT value FROM app_secrets WHERE name = 'session_token'")
+            return c.fetchone()[0]
+
+    # Run a bcrypt call on the pool; with shed=True, raises Busy when too many are already waiting
+    def _run(self, func, *args, shed=True, timeout=CHECK_TIMEOUT):
+        with self._lock:
+            if shed and self._pending >= self.max_pending:
+                self.shed += 1
+                raise Busy()
+            self._pending += 1
+        try:
+            future = self._pool.submit(func, *args)
+            try:
+                return future.result(timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise Busy()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    # Registration waits its turn rather than being shed
+    def hash_password(self, password):
+        return self._run(self._hash, password, shed=False, timeout=None)
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    def _check(self, password, hashed):
+        self.checks += 1
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+    # Returns LoginResult(status, user_row); user_row columns are USER_COLUMNS
+    def login(self, username, password, address=None):
+        if not self.username_failures.allowed(username) or (address and not self.address_failures.allowed(address)):
+            return LoginResult(RATE_LIMITED, None)
+        user = self.db.query_one(f"SELECT {USER_COLUMNS} FROM users WHERE username = ?", (username,))
+        # Registration already reveals which usernames exist, so unknown names are rejected without hashing
+        if user is None:
+            self._failed(username, address)
+            return LoginResult(INVALID, None)
+        try:
+            ok = self._run(self._check, password, user[2])
+        except Busy:
+            return LoginResult(BUSY, None)
+        if not ok:
+            self._failed(username, address)
+            return LoginResult(INVALID, None)
+        self.username_failures.reset(username)
+        if self.needs_rehash(user[2]):
+            try:
+                user = self._rehash(user, password)
+            except Busy:
+                pass  # upgraded on a later login
+        return LoginResult(OK, user)
+
+    # Busy outcomes are not failures; the student retries the same password
+    def _failed(self, username, address):
+        self.username_failures.hit(username)
+        if address:
+            self.address_failures.hit(address)
+
+    def needs_rehash(self, hashed):
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    # Done before the session token is issued, because tokens are bound to the stored hash.
+    # Only replaces the hash it verified, so a password changed meanwhile is left alone.
+    def _rehash(self, user, password):
+        new_hash = self._run(self._hash, password, shed=False)
+        with self.db.transaction() as c:
+            c.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?", (new_hash, user[0], user[2]))
+            if not c.rowcount:
+                return user
+        self.rehashed += 1
+        return user[:2] + (new_hash,) + user[3:]
+
+    # Tokens are bound to the password hash, so changing the password (or a rehash) revokes them
+    def _fingerprint(self, hashed):
+        return hashlib.sha256(hashed.encode('utf-8')).hexdigest()[:16]
+
+    def _sign(self, payload):
+        return base64.urlsafe_b64encode(hmac.new(self.secret, payload, hashlib.sha256).digest()).rstrip(b'=')
+
+    # The user's next session generation; with expected set, only if it is still current
+    def _next_generation(self, user_id, expected=None):
+        with self.db.transaction() as c:
+            if expected is None:
+                c.execute("UPDATE users SET session_generation = session_generation + 1 WHERE id = ?", (user_id,))
+            else:
+                c.execute('''UPDATE users SET session_generation = session_generation + 1
+                             WHERE id = ? AND session_generation = ?''', (user_id, expected))
+            if not c.rowcount:
+                return None
+            c.execute("SELECT session_generation FROM users WHERE id = ?", (user_id,))
+            return c.fetchone()[0]
+
+    def _token(self, user, generation):
+        payload = json.dumps({'uid': user[0], 'exp': int(time.time() + self.token_ttl), 'gen': generation,
+                              'fp': self._fingerprint(user[2])}, separators=(',', ':')).encode('utf-8')
+        return (base64.urlsafe_b64encode(payload).rstrip(b'=') + b'.' + self._sign(payload)).decode('ascii')
+
+    # A new token for the user; any token issued before it stops working
+    def issue_token(self, user):
+        return self._token(user, self._next_generation(user[0]))
+
+    def _verify(self, token):
+        try:
+            encoded, signature = token.encode('ascii').split(b'.')
+            payload = base64.urlsafe_b64decode(encoded + b'=' * (-len(encoded) % 4))
+        except (ValueError, UnicodeError):
+            return None, None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None, None
+        try:
+            claims = json.loads(payload)
+        except ValueError:
+            return None, None
+        if claims.get('exp', 0) < time.time():
+            return None, None
+        row = self.db.query_one(f"SELECT {USER_COLUMNS}, session_generation FROM users WHERE id = ?", (claims.get('uid'),))
+        if row is None or row[-1] != claims.get('gen') or \
+                not hmac.compare_digest(self._fingerprint(row[2]), claims.get('fp', '')):
+            return None, None
+        return row[:-1], claims
+
+    # The user row for a valid, unexpired, current token, else None; the token stays usable
+    def verify_token(self, token):
+        return self._verify(token)[0]
+
+    # Restore a session: (user row, replacement token) for a valid token, which is used up; else None
+    def redeem_token(self, token):
+        user, claims = self._verify(token)
+        if user is None:
+            return None
+        generation = self._next_generation(user[0], expected=claims['gen'])
+        # Another session redeemed it first
+        if generation is None:
+            return None
+        return user, self._token(user, generation)
+
+    # Logout: every token the user holds stops working
+    def revoke_tokens(self, user_id):
+        self._next_generation(user_id)
+
+    def stats(self):
+        return {'checks': self.checks, 'pending': self._pending, 'shed': self.shed, 'rehashed': self.rehashed}
@@ -0,0 +1,66 @@
+# badges.py
+# Event-driven badge engine. Each learning event bumps the student's running
+# counters (users.points plus user_stats) and only the rules that read a counter
+# that changed are evaluated. Everything runs on the caller's cursor, so counter
+# updates and badge inserts commit with the event that caused them.
+from collections import namedtuple
+
+BadgeRule = namedtuple('BadgeRule', 'name description counter condition')
+
+BADGE_RULES = [
+    BadgeRule("Quick Learner", "Earned 50 points", 'points', lambda points: 50 <= points < 100),
+    BadgeRule("Knowledge Seeker", "Earned 100 points", 'points', lambda points: points >= 100),
+    BadgeRule("Math Whiz", "Solved 10 math problems", 'problems_solved', lambda solved: solved >= 10),
+    BadgeRule("Science Explorer", "Solved 10 science problems", 'problems_solved', lambda solved: solved >= 10),
+    BadgeRule("Multitalented", "Studied 3 different subjects", 'subjects_covered', lambda subjects: subjects >= 3),
+    BadgeRule("Game Master", "Played 5 educational games", 'games_played', lambda games: games >= 5),
+]
+
+RULES_BY_COUNTER = {}
+for _rule in BADGE_RULES:
+    RULES_BY_COUNTER.setdefault(_rule.counter, []).append(_rule)
+
+
+# Apply one event's counter deltas and award any badges it unlocks; returns the new badge names
+def record_event(c, user_id, points=0, problems_solved=0, games_played=0, subject=None):
+    changed = set()
+    subjects_added = 0
+    if subject is not None:
+        c.execute("INSERT OR IGNORE INTO user_subjects (user_id, subject) VALUES (?, ?)", (user_id, subject))
+        subjects_added = c.rowcount
+    if points:
+        c.execute("UPDATE users SET points = points + ? WHERE id = ?", (points, user_id))
+        changed.add('points')
+    if problems_solved or games_played or subjects_added:
+        c.execute('''INSERT INTO user_stats (user_id, problems_solved, games_played, subjects_covered)
+                     VALUES (?, ?, ?, ?)
+                     ON CONFLICT (user_id) DO UPDATE SET
+                         problems_solved = problems_solved + excluded.problems_solved,
+                         games_played = games_played + excluded.games_played,
+                         subjects_covered = subjects_covered + excluded.subjects_covered''',
+                  (user_id, problems_solved, games_played, subjects_added))
+        changed.update(name for name, delta in (('problems_solved', problems_solved),
+                                                ('games_played', games_played),
+                                                ('subjects_covered', subjects_added)) if delta)
+    if not changed:
+        return []
+
+    c.execute('''SELECT u.points, COALESCE(s.problems_solved, 0), COALESCE(s.games_played, 0), COALESCE(s.subjects_covered, 0)
+                 FROM users u LEFT JOIN user_stats s ON s.user_id = u.id WHERE u.id = ?''', (user_id,))
+    row = c.fetchone()
+    if row is None:
+        return []
+    counters = dict(zip(('points', 'problems_solved', 'games_played', 'subjects_covered'), row))
+
+    candidates = [rule for counter in changed for rule in RULES_BY_COUNTER.get(counter, [])
+                  if rule.condition(counters[counter])]
+    if not candidates:
+        return []
+    placeholders = ", ".join("?" for _ in candidates)
+    c.execute(f"SELECT badge_name FROM gamification WHERE user_id = ? AND badge_name IN ({placeholders})",
+              [user_id] + [rule.name for rule in candidates])
+    earned = {name for (name,) in c.fetchall()}
+    new_badges = [rule for rule in candidates if rule.name not in earned]
+    c.executemany("INSERT INTO gamification (user_id, badge_name, badge_description) VALUES (?, ?, ?)",
+                  [(user_id, rule.name, rule.description) for rule in new_badges])
+    return [rule.name for rule in new_badges]
@@ -0,0 +1,100 @@
+# benchmarks/bench_arcade.py
+# Server time spent on one game of Memory Match. Before the game moved into the
+# browser, each card flip was a button press that re-ran the whole script (sidebar,
+# stylesheet, games page, score list); now a game costs one script run, when the
+# component submits its moves, plus replaying them in arcade.py. Reruns of the real
+# games page are timed through Streamlit's AppTest with the offline fakes; the
+# flips per game come from simulated students who remember each card they have
+# seen with probability --recall.
+#
+#   python -m benchmarks.bench_arcade --games 200 --recall 0.7 --reruns 20
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from arcade import Arcade, deal_memory_match
+from benchmarks.bench_db_writes import percentile
+from benchmarks.harness import install_fakes, new_app
+from migrations import migrate
+from storage import Database
+
+
+# Card indices a student turns over until every pair is matched
+def play(cards, recall, rng):
+    seen, matched, flips = {}, set(), []
+    hidden = lambda: [i for i in range(len(cards)) if i not in matched]
+    while len(matched) < len(cards):
+        unknown = [i for i in hidden() if i not in seen]
+        first = rng.choice(unknown or hidden())
+        seen[first] = cards[first]
+        partner = next((i for i, symbol in seen.items() if symbol == cards[first] and i != first and i not in matched
+                        and rng.random() < recall), None)
+        if partner is None:
+            others = [i for i in hidden() if i != first and i not in seen] or [i for i in hidden() if i != first]
+            partner = rng.choice(others)
+        seen[partner] = cards[partner]
+        flips += [first, partner]
+        if cards[first] == cards[partner]:
+            matched.update((first, partner))
+    return flips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server time per Memory Match game, rerun per flip vs one submit.")
+    parser.add_argument('--games', type=int, default=200, help="simulated games")
+    parser.add_argument('--recall', type=float, default=0.7, help="chance a student remembers a card seen before")
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--language', default='Hindi')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    flips = [len(play(deal_memory_match(rng), args.recall, rng)) for _ in range(args.games)]
+
+    # The app keeps its databases in the working directory
+    scratch = tempfile.mkdtemp()
+    os.chdir(scratch)
+    install_fakes()
+    at = new_app()
+    at.run()
+    at.session_state["user"] = {'id': 1, 'username': 'bench', 'name': 'Bench Student', 'grade': 7,
+                                'school': 'Bench School', 'language': args.language, 'avatar': 'default', 'points': 0}
+    at.session_state["page"] = "games"
+    at.session_state["current_game"] = "Memory Match"
+    at.run()
+    samples = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+    if at.exception:
+        raise SystemExit([e.message for e in at.exception])
+    rerun = statistics.median(samples)
+
+    db = Database(os.path.join(scratch, 'arcade.db'))
+    migrate(db)
+    arcade = Arcade(db, min_seconds_per_move=0.0)
+    replays = []
+    for _ in range(args.games):
+        token, cards = arcade.new_game(1, 'memory_match')
+        moves = play(cards, args.recall, rng)
+        start = time.perf_counter()
+        verdict = arcade.submit(1, token, moves)
+        replays.append(time.perf_counter() - start)
+        assert verdict.ok, verdict.reason
+    replay = statistics.median(replays)
+
+    p50, p95 = percentile(flips, 50), percentile(flips, 95)
+    print(f"{args.games} simulated games, recall {args.recall:g}: {p50:.0f} card flips per game (p95 {p95:.0f}); "
+          f"games page rerun {rerun * 1000:.1f}ms ({args.language})")
+    print(f"{'server time per game':<24} {'p50':>9} {'p95':>9}")
+    print(f"{'a rerun per flip':<24} {p50 * rerun:>8.2f}s {p95 * rerun:>8.2f}s")
+    print(f"{'one submit + replay':<24} {rerun + replay:>8.2f}s {rerun + replay:>8.2f}s")
+    print(f"replaying a game's moves: {replay * 1e6:.0f}us")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
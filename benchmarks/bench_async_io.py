@@ -0,0 +1,98 @@
+# benchmarks/bench_async_io.py
+# Page-load network time against a local fake server with injected latency: every
+# label translation and asset download one after another (the old page path) versus
+# fanned out on the shared aio.IOLoop with per-lane limits and timeouts.
+#
+#   python -m benchmarks.bench_async_io --latency 0.2 --labels 40
+import argparse
+import asyncio
+import time
+
+import requests
+
+from aio import IOLoop
+from benchmarks.fake_server import FakeServer
+
+
+def translate(base_url, text, dest, delay=None):
+    params = {'q': text, 'dest': dest}
+    if delay is not None:
+        params['delay'] = delay
+    return requests.get(f"{base_url}/translate", params=params, timeout=30).json()['text']
+
+
+def fetch_asset(base_url, name):
+    return requests.get(f"{base_url}/lottie/{name}", timeout=30).json()
+
+
+def generate(base_url, prompt):
+    return requests.post(f"{base_url}/generate", json={'prompt': prompt}, timeout=60).json()['text']
+
+
+def sequential_page(base_url, labels, assets, dest):
+    start = time.perf_counter()
+    texts = [translate(base_url, label, dest) for label in labels]
+    files = [fetch_asset(base_url, name) for name in assets]
+    return time.perf_counter() - start, len(texts) + len(files)
+
+
+def fanned_out_page(io_loop, base_url, labels, assets, dest):
+    async def page():
+        return await asyncio.gather(
+            io_loop.gather('translate', translate, [(base_url, label, dest) for label in labels]),
+            io_loop.gather('http', fetch_asset, [(base_url, name) for name in assets]))
+
+    start = time.perf_counter()
+    texts, files = io_loop.run(page())
+    return time.perf_counter() - start, len(texts) + len(files)
+
+
+# A stuck translation must not hold the page past the lane timeout; the caller falls back to English
+def page_with_straggler(io_loop, base_url, labels, dest, stuck_seconds):
+    start = time.perf_counter()
+    args = [(base_url, label, dest) for label in labels] + [(base_url, 'stuck label', dest, stuck_seconds)]
+    results = io_loop.map('translate', translate, args)
+    failed = sum(isinstance(result, BaseException) for result in results)
+    return time.perf_counter() - start, failed
+
+
+# Chat turn: question to English, then the tutor answer, then the answer to the student's language
+def chat_turn(io_loop, base_url, dest):
+    start = time.perf_counter()
+    question = io_loop.run(io_loop.call('translate', translate, base_url, "प्रकाश संश्लेषण क्या है?", 'en'))
+    answer = io_loop.run(io_loop.call('llm', generate, base_url, question))
+    sentences = [s for s in answer.split('. ') if s]
+    io_loop.map('translate', translate, [(base_url, s, dest) for s in sentences])
+    return time.perf_counter() - start, len(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--labels', type=int, default=40)
+    parser.add_argument('--assets', type=int, default=5)
+    parser.add_argument('--translate-limit', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    args = parser.parse_args()
+
+    labels = [f"Label number {i}" for i in range(args.labels)]
+    assets = [f"anim{i}" for i in range(args.assets)]
+    with FakeServer(latency=args.latency) as server:
+        io_loop = IOLoop(limits={'translate': args.translate_limit, 'llm': 4, 'http': 4},
+                         timeouts={'translate': args.timeout, 'llm': 30, 'http': 10})
+        seq, n = sequential_page(server.url, labels, assets, 'hi')
+        print(f"sequential page   {n:>3} requests  {seq:6.2f}s")
+        server.max_in_flight = 0
+        fan, n = fanned_out_page(io_loop, server.url, labels, assets, 'hi')
+        print(f"fanned-out page   {n:>3} requests  {fan:6.2f}s  ({seq / fan:.1f}x, peak {server.max_in_flight} in flight, "
+              f"limits translate={args.translate_limit} http=4)")
+        straggler, failed = page_with_straggler(io_loop, server.url, labels[:8], 'hi', stuck_seconds=args.timeout * 5)
+        print(f"page w/ straggler {len(labels[:8]) + 1:>3} requests  {straggler:6.2f}s  ({failed} timed out after {args.timeout}s)")
+        turn, sentences = chat_turn(io_loop, server.url, 'hi')
+        print(f"chat turn         {sentences + 2:>3} requests  {turn:6.2f}s")
+        print(f"lane stats: {io_loop.stats()}")
+        io_loop.close()
+
+
+if __name__ == '__main__':
+    main()
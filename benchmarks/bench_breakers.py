@@ -0,0 +1,92 @@
+# benchmarks/bench_breakers.py
+# Page renders through a Translate outage. Each render translates a page's worth
+# of labels the cache has not seen, through TranslationCache on the app's I/O lane,
+# against a fake translator that for part of the run hangs for --hang seconds and
+# then fails, like googletrans when the service is unreachable. Without a breaker
+# every render waits out the hung calls; with one, renders fall back to English at
+# once while it is open, and a probe every --reset seconds notices the recovery.
+#
+#   python -m benchmarks.bench_breakers --renders 16 --labels 20 --hang 3
+import argparse
+import os
+import tempfile
+import time
+
+from aio import IOLoop
+from benchmarks.bench_db_writes import percentile
+from benchmarks.fakes import FakeText, FakeTranslator
+from breaker import CircuitBreaker
+from translation_cache import TranslationCache
+
+
+class FlakyTranslator(FakeTranslator):
+    def __init__(self, latency, hang):
+        super().__init__(latency)
+        self.hang = hang
+        self.down = False
+
+    def translate(self, text, dest='en', src='auto'):
+        if self.down:
+            self.calls += 1
+            time.sleep(self.hang)
+            raise ConnectionError("translate.googleapis.com unreachable")
+        time.sleep(self.latency)
+        self.calls += 1
+        return FakeText("\n".join(f"[{dest}] {line}" for line in text.split("\n")))
+
+
+def run(args, use_breaker, scratch):
+    translator = FlakyTranslator(args.latency, args.hang)
+    # As in the app, the lane's own timeout is the looser one
+    io_loop = IOLoop(timeouts={'translate': 2 * args.timeout})
+    breaker = CircuitBreaker('translate', timeout=args.timeout, failures=args.failures, reset_after=args.reset)
+    backend = lambda text, dest, src: translator.translate(text, dest=dest, src=src).text
+    if use_breaker:
+        guarded = backend
+        backend = lambda text, dest, src: breaker.call(guarded, text, dest, src)
+    cache = TranslationCache(backend, db_path=os.path.join(scratch, f'translations-{use_breaker}.db'),
+                             fan_out=lambda func, arg_tuples: io_loop.map('translate', func, arg_tuples))
+    outage = range(args.renders // 4, args.renders * 3 // 4)
+    rows = []
+    for render in range(args.renders):
+        translator.down = render in outage
+        labels = [f"page {render} label {i}" for i in range(args.labels)]
+        start = time.perf_counter()
+        texts = cache.translate_many(labels, 'hi')
+        elapsed = time.perf_counter() - start
+        rows.append((elapsed, sum(1 for label, text in zip(labels, texts) if text == label), breaker.state))
+        time.sleep(args.interval)
+    io_loop.close()
+    return rows, translator.calls, breaker.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page translation latency through a Translate outage.")
+    parser.add_argument('--renders', type=int, default=16)
+    parser.add_argument('--labels', type=int, default=20, help="untranslated labels per render")
+    parser.add_argument('--latency', type=float, default=0.05, help="translator latency while it is up")
+    parser.add_argument('--hang', type=float, default=3.0, help="seconds a call hangs before failing while down")
+    parser.add_argument('--timeout', type=float, default=1.0, help="per-call timeout")
+    parser.add_argument('--failures', type=int, default=5, help="failures in a row that open the breaker")
+    parser.add_argument('--reset', type=float, default=2.0, help="seconds before an open breaker is probed")
+    parser.add_argument('--interval', type=float, default=0.5, help="seconds between renders")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        plain, plain_calls, _ = run(args, False, scratch)
+        guarded, guarded_calls, stats = run(args, True, scratch)
+    outage = range(args.renders // 4, args.renders * 3 // 4)
+    print(f"{args.labels} new labels per render; translator down for renders {outage.start}-{outage.stop - 1}, "
+          f"hanging {args.hang:g}s per call; per-call timeout {args.timeout:g}s")
+    print(f"{'render':>6} {'no breaker':>12} {'English':>10}   {'breaker':>10} {'English':>10} {'state':>10}")
+    for render, ((t1, n1, _), (t2, n2, state)) in enumerate(zip(plain, guarded)):
+        print(f"{render:>6} {t1 * 1000:>10.0f}ms {n1:>10}   {t2 * 1000:>8.0f}ms {n2:>10} {state:>10}")
+    down = lambda rows: [rows[i][0] for i in outage]
+    print(f"during the outage: render p50 {percentile(down(plain), 50):.2f}s without a breaker, "
+          f"{percentile(down(guarded), 50):.3f}s with one; translator calls {plain_calls} vs {guarded_calls}")
+    print(f"breaker: {stats['trips']} trips, {stats['short_circuits']} calls failed fast, "
+          f"{stats['timeouts']} timeouts")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_bundles.py
+# Offline bundles (bundles.py) on a synthetic content library: how many bytes a
+# student on a slow link fetches for a whole subject, for an update after one file
+# changed, and for a download that broke part way, against fetching the files
+# one by one. Transfers go through the real Range server on localhost; times at
+# --kbps are computed from the bytes, so the numbers do not depend on this machine.
+#
+#   python -m benchmarks.bench_bundles --groups 4 --files 6 --kbps 100
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.request import urlopen
+
+from bundles import BundleServer, apply_delta, build_bundles, bundle_path, download, extract, read_header
+from migrations import migrate
+from storage import Database
+
+WORDS = ("the plant uses sunlight water and carbon dioxide to make food energy leaf root stem cell "
+         "fraction numerator denominator equation solve both sides divide multiply force mass").split()
+
+
+# Worksheets are compressible text, diagrams are not
+def write_content(content_dir, db, groups, files, kilobytes, rng):
+    os.makedirs(content_dir, exist_ok=True)
+    with db.transaction() as c:
+        c.execute("DELETE FROM offline_content")
+        for group in range(groups):
+            grade, subject = 6 + group, ["Math", "Science", "Technology", "Engineering", "English"][group % 5]
+            for i in range(files):
+                name = f"g{grade}_{subject.lower()}_{i}" + (".png" if i % 3 == 2 else ".txt")
+                size = kilobytes * 1024
+                with open(os.path.join(content_dir, name), 'wb') as f:
+                    if name.endswith('.png'):
+                        f.write(rng.randbytes(size))
+                    else:
+                        f.write(" ".join(rng.choice(WORDS) for _ in range(size // 5)).encode()[:size])
+                c.execute('''INSERT INTO offline_content (title, subject, content_type, content, grade_level, language)
+                             VALUES (?, ?, ?, ?, ?, 'English')''', (f"{subject} {i}", subject, "worksheet", name, grade))
+
+
+# Change a few hundred bytes in the middle of one worksheet, as a corrected typo would
+def edit_one_file(content_dir, name):
+    path = os.path.join(content_dir, name)
+    with open(path, 'r+b') as f:
+        f.seek(os.path.getsize(path) // 2)
+        f.write(b"corrected " * 30)
+
+
+def seconds_at(nbytes, kbps):
+    return nbytes * 8 / (kbps * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes and time on a slow link for offline content bundles.")
+    parser.add_argument('--groups', type=int, default=4, help="(grade, subject) groups")
+    parser.add_argument('--files', type=int, default=6, help="files per group")
+    parser.add_argument('--kilobytes', type=int, default=512, help="size of each file")
+    parser.add_argument('--kbps', type=float, default=100.0, help="link speed for the time estimates (2G is ~50-200)")
+    parser.add_argument('--break-at', type=float, default=0.6, help="fraction of the bundle fetched before the link drops")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        content_dir, bundle_dir = os.path.join(scratch, 'content'), os.path.join(scratch, 'bundles')
+        db = Database(os.path.join(scratch, 'edugamify.db'))
+        migrate(db)
+        write_content(content_dir, db, args.groups, args.files, args.kilobytes, random.Random(args.seed))
+
+        start = time.perf_counter()
+        first = build_bundles(db, content_dir, bundle_dir)
+        build_seconds = time.perf_counter() - start
+        (grade, subject, language), old_id, _, _ = first[0]
+        edit_one_file(content_dir, f"g{grade}_{subject.lower()}_0.txt")
+        start = time.perf_counter()
+        second = build_bundles(db, content_dir, bundle_dir)
+        rebuild_seconds = time.perf_counter() - start
+        new_id = second[0][1]
+        rebuilt = sum(1 for _, _, status, _ in second if status == 'built')
+
+        server = BundleServer(('127.0.0.1', 0), db, bundle_dir)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with urlopen(f"{base}/bundles/{grade}/{subject}/{language}?have={old_id}") as response:
+                info = json.load(response)
+            device = os.path.join(scratch, 'device')
+            os.makedirs(device)
+
+            # Full bundle, with the link dropping part way and the download resuming
+            partial = os.path.join(device, 'full.bundle')
+            size = info['stored_size']
+            with urlopen(f"{base}{info['url']}") as response, open(partial, 'wb') as out:
+                out.write(response.read(int(size * args.break_at)))
+            resumed = download(f"{base}{info['url']}", partial)
+            fetched_full = int(size * args.break_at) + resumed
+            # Update from the old version: only the changed chunks
+            old_copy = os.path.join(device, 'old.bundle')
+            with open(bundle_path(bundle_dir, old_id), 'rb') as f, open(old_copy, 'wb') as out:
+                out.write(f.read())
+            delta = os.path.join(device, 'update.delta')
+            delta_bytes = download(f"{base}{info['delta']['url']}", delta)
+            rebuilt_path = os.path.join(device, 'new.bundle')
+            apply_delta(old_copy, delta, rebuilt_path)
+            extract(rebuilt_path, os.path.join(device, 'files'))
+            with open(rebuilt_path, 'rb') as f:
+                assert read_header(f.read())[0]['manifest_id'] == new_id
+            with open(partial, 'rb') as f, open(bundle_path(bundle_dir, new_id), 'rb') as g:
+                assert f.read() == g.read(), "resumed download differs from the bundle"
+
+            start = time.perf_counter()
+            for _ in range(20):
+                with urlopen(f"{base}{info['url']}") as response:
+                    response.read()
+            serve_seconds = (time.perf_counter() - start) / 20
+        finally:
+            server.shutdown()
+            server.server_close()
+            db.close()
+
+    raw = info['size']
+    rows = [
+        ("files one by one", raw),
+        ("bundle", size),
+        ("bundle, broken + restarted", int(size * args.break_at) + size),
+        ("bundle, broken + resumed", fetched_full),
+        ("update: files again", raw),
+        ("update: delta", delta_bytes),
+    ]
+    print(f"{args.groups} groups x {args.files} files x {args.kilobytes} KiB; "
+          f"built in {build_seconds:.2f}s, rebuild after one edit {rebuild_seconds:.2f}s ({rebuilt} group rebuilt)")
+    print(f"{'one subject':<28} {'bytes':>10} {'at ' + format(args.kbps, 'g') + ' kbit/s':>14}")
+    for label, nbytes in rows:
+        print(f"{label:<28} {nbytes:>10} {seconds_at(nbytes, args.kbps):>13.0f}s")
+    print(f"serving one bundle over localhost: {serve_seconds * 1000:.1f}ms ({size / serve_seconds / 1e6:.0f} MB/s)")
+
+
+if __name__ == '__main__':
+    main()
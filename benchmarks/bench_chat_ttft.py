@@ -0,0 +1,54 @@
+# benchmarks/bench_chat_ttft.py
+# Time to first visible answer text in chat_page: the blocking generate-then-translate
+# path versus streaming with sentence-level translation pipelined behind the model.
+#
+#   python -m benchmarks.bench_chat_ttft --first-token 1.5 --translate-latency 0.4
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeModel, FakeTranslator
+from streaming import stream_translated
+
+
+def blocking_turn(model, translator, dest):
+    start = time.perf_counter()
+    text = model.generate_content("prompt").text
+    if dest != 'en':
+        text = translator.translate(text, dest=dest, src='en').text
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def streaming_turn(model, translator, dest, pool):
+    start = time.perf_counter()
+    first = None
+    translate = None if dest == 'en' else (lambda sentence: translator.translate(sentence, dest=dest, src='en').text)
+    chunks = (chunk.text for chunk in model.generate_content("prompt", stream=True))
+    for english, shown in stream_translated(chunks, translate, pool):
+        if shown and first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--first-token', type=float, default=1.5)
+    parser.add_argument('--token-latency', type=float, default=0.08)
+    parser.add_argument('--translate-latency', type=float, default=0.4)
+    args = parser.parse_args()
+
+    model = FakeModel(first_token_latency=args.first_token, token_latency=args.token_latency)
+    translator = FakeTranslator(latency=args.translate_latency)
+    pool = ThreadPoolExecutor(max_workers=4)
+    print(f"{'mode':<10}{'lang':<6}{'first text (s)':>16}{'complete (s)':>14}")
+    for dest in ('en', 'hi'):
+        for label, turn in (("blocking", lambda: blocking_turn(model, translator, dest)),
+                            ("streaming", lambda: streaming_turn(model, translator, dest, pool))):
+            first, total = turn()
+            print(f"{label:<10}{dest:<6}{first:>16.2f}{total:>14.2f}")
+    pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
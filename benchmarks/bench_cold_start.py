@@ -0,0 +1,67 @@
+# benchmarks/bench_cold_start.py
+# Cold start of a server process: time from the first run of main1.py in a fresh
+# interpreter to the rendered login page, with a fresh or an existing database.
+# Streamlit itself is imported before the clock starts, as a running server has
+# it loaded already. Each sample is a new process, so nothing is warm but the OS
+# page cache. Also lists which heavy modules the login page pulled in.
+#
+#   python -m benchmarks.bench_cold_start --runs 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import ROOT
+
+HEAVY_MODULES = ["pandas", "plotly.express", "googletrans", "google.generativeai", "streamlit_lottie", "requests"]
+
+
+def worker():
+    from benchmarks.harness import new_app
+
+    at = new_app()
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise SystemExit([e.message for e in at.exception])
+    print(json.dumps({'seconds': elapsed, 'loaded': [name for name in HEAVY_MODULES if name in sys.modules]}))
+
+
+def sample(db_path, scratch):
+    env = dict(os.environ, PYTHONPATH=ROOT, EDUGAMIFY_DB=db_path)
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_cold_start', '--worker'], cwd=scratch, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time from a fresh process to the rendered login page.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        db_path = os.path.join(scratch, 'edugamify.db')
+        fresh = []
+        for i in range(args.runs):
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            fresh.append(sample(db_path, scratch))
+        existing = [sample(db_path, scratch) for _ in range(args.runs)]
+    for label, runs in (("new database", fresh), ("existing database", existing)):
+        seconds = [run['seconds'] for run in runs]
+        print(f"{label:<18} median {statistics.median(seconds) * 1000:7.0f}ms  "
+              f"min {min(seconds) * 1000:7.0f}ms  max {max(seconds) * 1000:7.0f}ms")
+    print(f"heavy modules loaded by the login page: {', '.join(existing[-1]['loaded']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
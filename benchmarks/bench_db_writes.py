@@ -0,0 +1,172 @@
+# benchmarks/bench_db_writes.py
+# Concurrent quiz-score writes: the old shared module-level connection, the pooled
+# WAL storage layer, and the write-behind queue (with and without a spool file).
+# Latency is what the student's request waits for, including reading back points.
+# Ends with a backpressure run (tiny queue, slow writer, spool on) that exits
+# non-zero if producers waiting on the full queue stop the writer.
+#
+#   python -m benchmarks.bench_db_writes --students 40 --saves 25
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from migrations import migrate
+from storage import Database, create_schema
+from writebehind import WriteBehind
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def seed_users(path, students):
+    conn = sqlite3.connect(path)
+    create_schema(conn.cursor())
+    conn.executemany("INSERT INTO users (username, password, name, grade, school) VALUES (?, '', ?, 7, 'Bench School')",
+                     [(f"student{i}", f"Student {i}") for i in range(students)])
+    conn.commit()
+    conn.close()
+
+
+# Old pattern: one connection shared by every session thread, rollback journal,
+# commit after each statement
+def legacy_save(conn, user_id, score):
+    c = conn.cursor()
+    c.execute("INSERT INTO game_scores (user_id, game_name, score, subject) VALUES (?, ?, ?, ?)",
+              (user_id, "Math Quiz", score, "Math"))
+    c.execute("UPDATE users SET points = points + ? WHERE id = ?", (score // 10, user_id))
+    conn.commit()
+    c.execute("INSERT INTO analytics (user_id, subject, time_spent, problems_solved) VALUES (?, ?, ?, ?)",
+              (user_id, "Math", 5, 1))
+    c.execute("UPDATE users SET points = points + ? WHERE id = ?", (10, user_id))
+    conn.commit()
+    c.execute("SELECT points FROM users WHERE id = ?", (user_id,))
+    c.fetchone()
+
+
+def pooled_save(db, user_id, score):
+    with db.transaction() as c:
+        c.execute("INSERT INTO game_scores (user_id, game_name, score, subject) VALUES (?, ?, ?, ?)",
+                  (user_id, "Math Quiz", score, "Math"))
+        c.execute("UPDATE users SET points = points + ? WHERE id = ?", (score // 10, user_id))
+        c.execute("INSERT INTO analytics (user_id, subject, time_spent, problems_solved) VALUES (?, ?, ?, ?)",
+                  (user_id, "Math", 5, 1))
+        c.execute("UPDATE users SET points = points + ? WHERE id = ?", (10, user_id))
+    db.query_one("SELECT points FROM users WHERE id = ?", (user_id,))
+
+
+def write_score(c, user_id, points, score):
+    c.execute("INSERT INTO game_scores (user_id, game_name, score, subject) VALUES (?, ?, ?, ?)",
+              (user_id, "Math Quiz", score, "Math"))
+    c.execute("UPDATE users SET points = points + ? WHERE id = ?", (score // 10, user_id))
+    c.execute("INSERT INTO analytics (user_id, subject, time_spent, problems_solved) VALUES (?, ?, ?, ?)",
+              (user_id, "Math", 5, 1))
+    c.execute("UPDATE users SET points = points + ? WHERE id = ?", (10, user_id))
+
+
+def queued_save(writer, user_id, score):
+    writer.submit('score', user_id, points=score // 10 + 10, score=score)
+    writer.points(user_id)
+
+
+def run(label, save, students, saves, drain=None):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(students)
+
+    def student(user_id):
+        barrier.wait()
+        local = []
+        for i in range(saves):
+            start = time.perf_counter()
+            try:
+                save(user_id, 10 * (i % 10))
+            except Exception as e:  # the shared legacy connection is not thread-safe
+                errors.append(e)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=student, args=(i + 1,)) for i in range(students)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if drain:
+        drain()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {len(latencies) / elapsed:8.0f} saves/s   p50 {percentile(latencies, 50) * 1000:7.2f} ms"
+          f"   p99 {percentile(latencies, 99) * 1000:7.2f} ms   errors {len(errors)}")
+
+
+# Producers blocked on a full queue must not stop the writer from draining it
+def full_queue(tmp, producers=4, saves=10, timeout=10):
+    path = os.path.join(tmp, 'full.db')
+    seed_users(path, producers)
+    db = Database(path)
+    migrate(db)
+
+    def slow_score(c, user_id, points, score):
+        time.sleep(0.01)
+        write_score(c, user_id, points, score)
+
+    writer = WriteBehind(db, {'score': slow_score}, spool_path=os.path.join(tmp, 'full.spool'), maxsize=2,
+                         batch_size=1)
+    threads = [threading.Thread(target=lambda user_id=i + 1: [queued_save(writer, user_id, 10) for _ in range(saves)],
+                                daemon=True) for i in range(producers)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + timeout
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    stuck = sum(t.is_alive() for t in threads)
+    print(f"{'full':<8} {producers * saves} saves through a 2-event queue with a spool: {writer.stats()}")
+    if stuck:
+        raise SystemExit(f"write-behind deadlocked: {stuck} producers still waiting after {timeout}s")
+    writer.close()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--saves', type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        seed_users(legacy_path, args.students)
+        conn = sqlite3.connect(legacy_path, check_same_thread=False)
+        run("before", lambda user_id, score: legacy_save(conn, user_id, score), args.students, args.saves)
+        conn.close()
+
+        pooled_path = os.path.join(tmp, 'pooled.db')
+        seed_users(pooled_path, args.students)
+        db = Database(pooled_path)
+        run("pooled", lambda user_id, score: pooled_save(db, user_id, score), args.students, args.saves)
+        db.close()
+
+        for label, spool in (("queued", None), ("spooled", os.path.join(tmp, 'events.spool'))):
+            path = os.path.join(tmp, f'{label}.db')
+            seed_users(path, args.students)
+            db = Database(path)
+            migrate(db)
+            writer = WriteBehind(db, {'score': write_score}, spool_path=spool)
+            # Throughput includes draining the queue, so it counts committed saves
+            run(label, lambda user_id, score: queued_save(writer, user_id, score), args.students, args.saves,
+                drain=writer.flush)
+            print(f"{'':<8} {writer.stats()}")
+            writer.close()
+            db.close()
+
+        full_queue(tmp)
+
+
+if __name__ == '__main__':
+    main()
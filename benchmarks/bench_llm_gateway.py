@@ -0,0 +1,133 @@
+# benchmarks/bench_llm_gateway.py
+# A class asking the tutor the same few questions at once, against a fake Gemini
+# model that enforces a requests-per-minute quota the way the API does. Each
+# student checks a response cache first, then either calls the model directly, as
+# chat turns did before, or goes through LLMGateway on the app's I/O lane. Reports upstream calls, students who
+# got the "trouble responding" fallback, and time to first chunk and to the full
+# answer. A second run floods the gateway with background requests and then sends
+# chat turns, to show the priority queue's effect on their queue wait.
+#
+#   python -m benchmarks.bench_llm_gateway --students 40 --questions 12 --quota 15
+import argparse
+import random
+import threading
+import time
+
+from aio import IOLoop
+from benchmarks.bench_db_writes import percentile
+from benchmarks.fakes import FakeModel
+from llm_gateway import BACKGROUND, INTERACTIVE, LLMGateway
+
+
+# Both paths sit behind a response cache, as in the app; the direct path stores an answer once it has streamed
+def ask_direct(model, answers, question):
+    if question in answers:
+        yield answers[question]
+        return
+    chunks = []
+    for chunk in model.generate_content(question, stream=True):
+        chunks.append(chunk.text)
+        yield chunk.text
+    answers[question] = "".join(chunks)
+
+
+def ask_gateway(gateway, model, answers, question, priority=INTERACTIVE):
+    if question in answers:
+        return iter([answers[question]])
+    return gateway.stream(question, lambda: (chunk.text for chunk in model.generate_content(question, stream=True)),
+                          context=question, priority=priority)
+
+
+# One thread per student, arriving over `spread` seconds; returns per-student (first chunk, total, failed)
+def run_class(ask, students, questions, spread, rng):
+    results = [None] * students
+    arrivals = sorted(rng.uniform(0, spread) for _ in range(students))
+    asks = [f"question {rng.randrange(questions)}" for _ in range(students)]
+    start = time.perf_counter()
+
+    def student(i):
+        time.sleep(max(0.0, start + arrivals[i] - time.perf_counter()))
+        asked = time.perf_counter()
+        first = None
+        try:
+            for _ in ask(asks[i]):
+                if first is None:
+                    first = time.perf_counter() - asked
+            results[i] = (first, time.perf_counter() - asked, False)
+        except Exception:
+            results[i] = (None, time.perf_counter() - asked, True)
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(label, results, model):
+    answered = [r for r in results if not r[2]]
+    first = [r[0] for r in answered]
+    total = [r[1] for r in answered]
+    print(f"{label:<9} {model.calls:>9} {len(results) - len(answered):>7} "
+          f"{percentile(first, 50) if first else 0:>10.2f}s {percentile(first, 95) if first else 0:>7.2f}s "
+          f"{percentile(total, 50) if total else 0:>10.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tutor calls from a whole class, direct and through the gateway.")
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--questions', type=int, default=12, help="distinct questions the class asks")
+    parser.add_argument('--spread', type=float, default=3.0, help="seconds over which the students ask")
+    parser.add_argument('--quota', type=int, default=15, help="model requests allowed per minute")
+    parser.add_argument('--first-token', type=float, default=1.0)
+    parser.add_argument('--token-latency', type=float, default=0.05)
+    parser.add_argument('--background', type=int, default=20, help="background requests in the priority run")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    io_loop = IOLoop()
+    submit = lambda func, *call_args: io_loop.submit('llm', func, *call_args)
+
+    print(f"{args.students} students, {args.questions} distinct questions over {args.spread:g}s, "
+          f"model quota {args.quota}/min")
+    print(f"{'':<9} {'model calls':>9} {'failed':>7} {'first p50':>11} {'p95':>8} {'answer p50':>11}")
+    model, answers = FakeModel(args.first_token, args.token_latency, requests_per_minute=args.quota), {}
+    report("direct", run_class(lambda q: ask_direct(model, answers, q), args.students, args.questions, args.spread,
+                               random.Random(args.seed)), model)
+    model, answers = FakeModel(args.first_token, args.token_latency, requests_per_minute=args.quota), {}
+    gateway = LLMGateway(submit, on_result=answers.__setitem__, per_minute=args.quota, burst=max(1, args.quota // 3))
+    report("gateway", run_class(lambda q: ask_gateway(gateway, model, answers, q), args.students, args.questions,
+                                args.spread, random.Random(args.seed)), model)
+    stats = gateway.stats()
+    print(f"gateway: {stats['coalesced']} of {stats['requests']} requests merged into an in-flight call, "
+          f"queue wait p50 {stats['queue_wait_p50_ms']:.0f}ms p99 {stats['queue_wait_p99_ms']:.0f}ms, "
+          f"{stats['quota_errors']} quota errors, {stats['expired']} expired")
+
+    # Priority: background work queued first, then chat turns; two calls per second, burst of two
+    model = FakeModel(0.05, 0.0)
+    gateway = LLMGateway(submit, per_minute=120, burst=2)
+    waits = {BACKGROUND: [], INTERACTIVE: []}
+
+    def request(name, priority):
+        asked = time.perf_counter()
+        for _ in ask_gateway(gateway, model, {}, name, priority):
+            waits[priority].append(time.perf_counter() - asked)
+            break
+
+    threads = [threading.Thread(target=request, args=(f"background {i}", BACKGROUND)) for i in range(args.background)]
+    threads += [threading.Thread(target=request, args=(f"chat {i}", INTERACTIVE)) for i in range(5)]
+    for thread in threads[:args.background]:
+        thread.start()
+    time.sleep(0.2)
+    for thread in threads[args.background:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"priority run, {args.background} background requests queued ahead of 5 chat turns at 2 calls/s: "
+          f"chat first chunk p50 {percentile(waits[INTERACTIVE], 50):.2f}s, "
+          f"background p50 {percentile(waits[BACKGROUND], 50):.2f}s")
+    io_loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_logins.py
+# 500 students logging in at once: unbounded bcrypt checks on every request thread
+# versus auth.Authenticator's bounded pool (students told the server is busy retry
+# after a short pause), then the same students reconnecting with their session
+# tokens, and password-guessing runs against one account and across all of them.
+# Every student logs in from one address, as a class behind a school NAT does. A probe thread times a
+# small page render throughout, to show what everyone else sees during the rush.
+#
+#   python -m benchmarks.bench_logins --students 500 --rounds 10
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import bcrypt
+
+from auth import BUSY, OK, Authenticator
+from benchmarks.bench_db_writes import percentile
+from migrations import migrate
+from storage import Database
+
+
+def seed(db, students, rounds):
+    # One hash shared by every account keeps seeding fast; each login still pays a full check
+    hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds)).decode('utf-8')
+    with db.transaction() as c:
+        c.executemany("INSERT INTO users (username, password, name, grade, school) VALUES (?, ?, ?, 7, 'Bench School')",
+                      [(f"student{i}", hashed, f"Student {i}") for i in range(students)])
+
+
+def stampede(label, login, students, db):
+    latencies = []
+    outcomes = Counter()
+    attempts = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(students + 1)
+    done = threading.Event()
+    probes = []
+
+    def probe():
+        barrier.wait()
+        while not done.is_set():
+            start = time.perf_counter()
+            db.query_one("SELECT points FROM users WHERE id = ?", (1,))
+            sum(i * i for i in range(20000))  # a few ms of page rendering
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    def student(i):
+        barrier.wait()
+        start = time.perf_counter()
+        tries = 1
+        outcome = login(i)
+        while outcome == BUSY:
+            time.sleep(random.uniform(0.5, 1.5))
+            tries += 1
+            outcome = login(i)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+            attempts[tries] += 1
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+    print(f"{label:<16} {elapsed:7.2f}s total   login p50 {percentile(latencies, 50):6.2f}s"
+          f"   p99 {percentile(latencies, 99):6.2f}s   page render p99 {percentile(probes, 99) * 1000:7.1f} ms"
+          f"   {dict(outcomes)}   max tries {max(attempts)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--max-pending', type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'auth.db'), pool_size=16)
+        migrate(db)
+        seed(db, args.students, args.rounds)
+        print(f"{args.students} simultaneous logins, bcrypt rounds {args.rounds}, {os.cpu_count()} CPU(s)")
+
+        def unbounded(i):
+            user = db.query_one("SELECT * FROM users WHERE username = ?", (f"student{i}",))
+            return 'ok' if bcrypt.checkpw(b"secret", user[2].encode('utf-8')) else 'invalid'
+        stampede("unbounded", unbounded, args.students, db)
+
+        auth = Authenticator(db, rounds=args.rounds, max_pending=args.max_pending)
+        tokens = {}
+
+        def pooled(i):
+            # The whole school behind one NAT address
+            result = auth.login(f"student{i}", "secret", address="10.0.0.1")
+            if result.status == OK:
+                tokens[i] = auth.issue_token(result.user)
+            return result.status
+        stampede("bounded pool", pooled, args.students, db)
+        stampede("token reconnect", lambda i: OK if i in tokens and auth.redeem_token(tokens[i]) else 'invalid',
+                 args.students, db)
+
+        checks_before = auth.checks
+        guesses = Counter(auth.login("student0", f"guess{i}", address="10.0.0.9").status for i in range(1000))
+        print(f"{'1000 bad guesses':<16} {dict(guesses)}   bcrypt checks run: {auth.checks - checks_before}")
+        checks_before = auth.checks
+        sprayed = Counter(auth.login(f"student{i}", "guess", address="10.0.0.9").status for i in range(1, 1000))
+        print(f"{'999 users, one guess each':<16} {dict(sprayed)}   bcrypt checks run: {auth.checks - checks_before}")
+        print(f"auth stats: {auth.stats()}")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_page_render.py
+# Rerun time of each page of main1.py, with the fragment cache off (every rerun
+# rebuilds its headings, cards and labels) and on. Each mode runs the real app
+# through Streamlit's AppTest in a fresh process and scratch directory, with the
+# Gemini model and googletrans replaced by the offline fakes; every page is
+# rendered once to warm the translation cache before the timed reruns. Each page
+# rerun is paired with a rerun that selects no page (sidebar and stylesheet only),
+# and the page's own cost is the difference.
+#
+#   python -m benchmarks.bench_page_render --reruns 20 --language Hindi
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import ROOT, install_fakes, new_app
+
+BASELINE = "(sidebar)"
+PAGES = ["dashboard", "subjects", "chat", "games", "offline", "profile", "about", "contact"]
+
+
+def worker(args):
+    translator, _ = install_fakes(args.translate_latency)
+    at = new_app()
+    at.run()
+    at.session_state["user"] = {'id': 1, 'username': 'bench', 'name': 'Bench Student', 'grade': 7,
+                                'school': 'Bench School', 'language': args.language, 'avatar': 'default', 'points': 0}
+    results = {}
+    for page in PAGES:
+        at.session_state["page"] = page
+        at.run()
+        if at.exception:
+            raise SystemExit(f"{page}: {[e.message for e in at.exception]}")
+        # Alternate baseline and page reruns so drift in the rerun overhead cancels out
+        totals, own = [], []
+        for _ in range(args.reruns):
+            at.session_state["page"] = BASELINE
+            start = time.perf_counter()
+            at.run()
+            baseline = time.perf_counter() - start
+            at.session_state["page"] = page
+            start = time.perf_counter()
+            at.run()
+            total = time.perf_counter() - start
+            totals.append(total)
+            own.append(total - baseline)
+        results[page] = (statistics.median(totals) * 1000, statistics.median(own) * 1000)
+    results['translator_calls'] = translator.calls
+    print(json.dumps(results))
+
+
+def run_mode(args, enabled):
+    env = dict(os.environ, EDUGAMIFY_FRAGMENT_CACHE='1' if enabled else '0', PYTHONPATH=ROOT)
+    with tempfile.TemporaryDirectory() as scratch:
+        env['EDUGAMIFY_DB'] = os.path.join(scratch, 'edugamify.db')
+        out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_page_render', '--worker',
+                              '--reruns', str(args.reruns), '--language', args.language,
+                              '--translate-latency', str(args.translate_latency)],
+                             cwd=scratch, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-page rerun time with and without the fragment cache.")
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--language', default='Hindi')
+    parser.add_argument('--translate-latency', type=float, default=0.01)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    before = run_mode(args, enabled=False)
+    after = run_mode(args, enabled=True)
+    print(f"median of {args.reruns} reruns per page, language {args.language}; "
+          f"page = rerun minus a sidebar-only rerun")
+    print(f"{'':<10} {'rerun':>21} {'page':>21}")
+    print(f"{'page':<10} {'no cache':>10} {'cached':>10} {'no cache':>10} {'cached':>10}")
+    for page in PAGES:
+        (total_before, own_before), (total_after, own_after) = before[page], after[page]
+        print(f"{page:<10} {total_before:>8.1f}ms {total_after:>8.1f}ms {own_before:>8.1f}ms {own_after:>8.1f}ms")
+    print(f"translator calls: {before['translator_calls']} without cache, {after['translator_calls']} with")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_question_bank.py
+# Drawing a quiz from a large bank: ORDER BY RANDOM() over the subject's rows
+# versus sampling sequence positions per bucket, plus per-question lookups.
+#
+#   python -m benchmarks.bench_question_bank --per-bucket 10000
+import argparse
+import os
+import tempfile
+import time
+
+from migrations import migrate
+from questionbank import DIFFICULTIES, QuestionBank, add_questions
+from storage import Database
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--per-bucket', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bank.db'))
+        migrate(db)
+        with db.transaction() as c:
+            add_questions(c, [('Math', 7, d, f"Question {d}-{i}: what is {i} + {d}?", [str(i + d), str(i), str(d), "0"], 0)
+                              for d in DIFFICULTIES for i in range(args.per_bucket)])
+        bank = QuestionBank(db)
+        total = args.per_bucket * len(DIFFICULTIES)
+        print(f"bank: {total} Math questions for grade 7")
+
+        order_by_random = timed(lambda: db.query(
+            "SELECT id FROM questions WHERE subject = ? AND grade = ? ORDER BY RANDOM() LIMIT 5", ('Math', 7)), args.repeat)
+        sampled = timed(lambda: bank.sample('Math', 7, k=5), args.repeat)
+        one_bucket = timed(lambda: bank.sample('Math', 7, k=5, difficulty=2), args.repeat)
+        ids = bank.sample('Math', 7, k=5)
+        uncached = QuestionBank(db, cache_size=0)
+        lookup = timed(lambda: [uncached.get(question_id) for question_id in ids], args.repeat) / len(ids)
+        print(f"ORDER BY RANDOM() LIMIT 5   {order_by_random:8.3f} ms")
+        print(f"sample(k=5)                 {sampled:8.3f} ms")
+        print(f"sample(k=5, difficulty=2)   {one_bucket:8.3f} ms")
+        print(f"get(id) from disk           {lookup:8.3f} ms per question")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
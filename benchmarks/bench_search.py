@@ -0,0 +1,112 @@
+# benchmarks/bench_search.py
+# Full-text search (search.py) over a synthetic chat_history: word frequencies
+# follow a Zipf curve like real text, with Hindi and Telugu turns mixed in. Times a
+# student searching their own tutor history (search_chats) for rare, common,
+# two-word and prefix queries, against FTS5's built-in bm25() ranking over the
+# same owner-scoped match and against the LIKE scan it replaces. The rows go in
+# through the triggers, so the seeding rate is the index's write cost.
+#
+#   python -m benchmarks.bench_search --rows 1000000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_db_writes import percentile
+from migrations import migrate
+from search import fts_query, search_chats, search_content
+from storage import Database
+
+TOPIC_WORDS = ["photosynthesis", "fraction", "gravity", "equation", "molecule", "circuit", "acceleration",
+               "denominator", "ecosystem", "triangle", "voltage", "evaporation", "multiplication", "friction"]
+COMMON_WORDS = ["the", "is", "of", "and", "to", "how", "what", "why", "a", "in", "explain", "example"]
+INDIC_TURNS = [("प्रकाश संश्लेषण क्या है?", "प्रकाश संश्लेषण वह प्रक्रिया है जिससे पौधे भोजन बनाते हैं", "Hindi"),
+               ("గురుత్వాకర్షణ అంటే ఏమిటి?", "గురుత్వాకర్షణ వస్తువులను భూమి వైపు లాగుతుంది", "Telugu")]
+QUERIES = [("rare word", "evaporation"), ("common word", "the"), ("two words", "gravity explain"),
+           ("prefix", "photo*"), ("Hindi", "संश्लेषण"), ("no match", "zzzz")]
+
+
+def vocabulary(size, rng):
+    letters = "abcdefghijklmnoprstuvw"
+    words = COMMON_WORDS + TOPIC_WORDS
+    while len(words) < size:
+        words.append("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    cumulative, total = [], 0.0
+    for rank in range(1, size + 1):
+        total += 1 / rank
+        cumulative.append(total)
+    return words, cumulative
+
+
+def seed_chats(db, rows, users, vocab_size, rng, batch=20000):
+    words, cumulative = vocabulary(vocab_size, rng)
+    sentence = lambda n: " ".join(rng.choices(words, cum_weights=cumulative, k=n))
+    done = 0
+    while done < rows:
+        n = min(batch, rows - done)
+        turns = []
+        for _ in range(n):
+            if rng.random() < 0.05:
+                message, response, language = rng.choice(INDIC_TURNS)
+                turns.append((rng.randint(1, users), message, "Photosynthesis and gravity", response, language))
+            else:
+                turns.append((rng.randint(1, users), sentence(8), sentence(30), None, 'English'))
+        with db.transaction() as c:
+            c.executemany('''INSERT INTO chat_history (user_id, message, response, response_translated, language, subject)
+                             VALUES (?, ?, ?, ?, ?, 'Science')''', turns)
+        done += n
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of full-text search over a synthetic chat history.")
+    parser.add_argument('--rows', type=int, default=200000, help="chat_history rows")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        db = Database(os.path.join(scratch, 'edugamify.db'))
+        migrate(db)
+        start = time.perf_counter()
+        seed_chats(db, args.rows, args.users, args.vocabulary, rng)
+        seed_seconds = time.perf_counter() - start
+        with db.transaction() as c:
+            c.execute("INSERT INTO chat_history_fts (chat_history_fts) VALUES ('optimize')")
+        user_id, turns = db.query_one('''SELECT user_id, COUNT(*) FROM chat_history GROUP BY user_id
+                                         ORDER BY COUNT(*) DESC LIMIT 1''')
+        print(f"{args.rows} chat rows for {args.users} students, seeded through the triggers at "
+              f"{args.rows / seed_seconds:,.0f} rows/s; searching as a student with {turns} turns")
+        print(f"{'query':<12} {'hits':>5} {'search_chats p50/p99':>22} {'fts bm25() p50':>15} {'LIKE p50':>10}")
+        for label, text in QUERIES:
+            samples, results = timed(lambda: search_chats(db, user_id, text), args.repeat)
+            # The same match ordered by FTS5's bm25(), whose document counts span every student
+            builtin, _ = timed(lambda: db.query(
+                '''SELECT rowid FROM chat_history_fts WHERE chat_history_fts MATCH ? ORDER BY rank LIMIT 11''',
+                (f'owner:"u{user_id}" AND ({fts_query(text)})',)), max(3, args.repeat // 5))
+            like, _ = timed(lambda: db.query(
+                '''SELECT id FROM chat_history WHERE user_id = ? AND (message LIKE ? OR response LIKE ?
+                   OR response_translated LIKE ?) ORDER BY timestamp DESC LIMIT 11''',
+                (user_id,) + (f"%{text.rstrip('*')}%",) * 3), args.repeat)
+            print(f"{label:<12} {len(results.hits):>5} {percentile(samples, 50) * 1000:>10.2f}/"
+                  f"{percentile(samples, 99) * 1000:<6.2f} ms {percentile(builtin, 50) * 1000:>12.2f} ms "
+                  f"{percentile(like, 50) * 1000:>7.2f} ms")
+        samples, _ = timed(lambda: search_content(db, "algebra", language='English'), args.repeat)
+        print(f"offline content search p50 {percentile(samples, 50) * 1000:.2f} ms")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+# benchmarks/bench_suite.py
+# End-to-end benchmark of the app's main interactions, reproducible offline. A
+# synthetic database is seeded (benchmarks.seed), then a fresh process drives
+# main1.py headlessly (benchmarks.harness) with fake translator and Gemini
+# backends of configurable latency, one student session after another:
+#
+#   login         submitting the login form (one bcrypt check)
+#   dashboard     rerendering the dashboard of a student with history
+#   chat_turn     asking the tutor a new question and rendering the answer
+#   quiz_answer   answering a quiz question
+#   score_save    saving a finished quiz's score
+#
+# Latencies are wall time of the Streamlit rerun(s) the interaction causes, as
+# the student would wait for them. The app's own profiler runs with every call
+# timed, so the results also break down DB helpers, translation and Gemini.
+# Results are written as JSON; --compare flags scenarios that got slower than a
+# previous run's by more than --tolerance and exits non-zero.
+#
+#   python -m benchmarks.bench_suite --users 200 --sessions 20 --output after.json --compare before.json
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_db_writes import percentile
+from benchmarks.harness import ROOT, install_fakes, new_app, timed_run
+from benchmarks.seed import SEED_PASSWORD, seed_database
+
+SCENARIOS = ["login", "dashboard", "chat_turn", "quiz_answer", "score_save"]
+CHAT_TOPICS = ["photosynthesis", "fractions", "gravity", "the water cycle", "prime numbers", "electric circuits"]
+PROFILE_GROUPS = ("db.", "translate.", "llm.", "auth.", "chart.", "page.")
+
+
+def buttons(at, prefix=None, label=None):
+    return [b for b in at.button if (prefix and b.key and b.key.startswith(prefix)) or (label and label in b.label)]
+
+
+def run_session(samples, username, session, rng, args):
+    at = new_app()
+    at.run()
+    at.text_input[0].input(username)
+    at.text_input[1].input(SEED_PASSWORD)
+    at.button[0].click()
+    samples['login'].append(timed_run(at))
+    if at.session_state["page"] != "dashboard":
+        raise RuntimeError(f"login as {username} failed")
+
+    for _ in range(args.reruns):
+        at.session_state["page"] = "dashboard"
+        samples['dashboard'].append(timed_run(at))
+
+    at.session_state["page"] = "chat"
+    at.run()
+    for turn in range(args.chat_turns):
+        # Unique per session and turn, so every question misses the response cache and reaches the model
+        question = f"Can you explain {rng.choice(CHAT_TOPICS)} with example {session}-{turn}?"
+        at.chat_input[0].set_value(question)
+        samples['chat_turn'].append(timed_run(at))
+
+    at.session_state["page"] = "games"
+    at.session_state["current_game"] = "Math Quiz"
+    at.run()
+    while True:
+        options = buttons(at, prefix="quiz_Math_opt_")
+        if not options:
+            break
+        rng.choice(options).click()
+        samples['quiz_answer'].append(timed_run(at))
+    save = buttons(at, label="Save Score")
+    if save:
+        save[0].click()
+        samples['score_save'].append(timed_run(at))
+
+
+def worker(args):
+    translator, model = install_fakes(args.translate_latency, args.first_token, args.token_latency)
+    rng = random.Random(args.seed)
+    samples = {name: [] for name in SCENARIOS}
+    start = time.perf_counter()
+    for session in range(args.sessions):
+        run_session(samples, f"student{rng.randint(1, args.users)}", session, rng, args)
+    print(json.dumps({'samples': samples, 'wall_seconds': time.perf_counter() - start,
+                      'translator_calls': translator.calls, 'model_calls': model.calls}))
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        'count': len(samples),
+        'throughput_per_s': round(len(samples) / sum(samples), 3),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+# Per-call calls/p50/p99 from the app profiler's Prometheus dump
+def read_profile(path):
+    profile = {}
+    if not os.path.exists(path):
+        return profile
+    pattern = re.compile(r'edugamify_(calls_total|latency_seconds)\{name="([^"]+)"(?:,quantile="([^"]+)")?\} (\S+)')
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            match = pattern.match(line)
+            if not match or not match.group(2).startswith(PROFILE_GROUPS):
+                continue
+            kind, name, quantile, value = match.groups()
+            entry = profile.setdefault(name, {})
+            if kind == 'calls_total':
+                entry['calls'] = int(value)
+            else:
+                entry[f"p{round(float(quantile) * 100)}_ms"] = round(float(value) * 1000, 3)
+    return {name: entry for name, entry in profile.items() if entry.get('calls')}
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as scratch:
+        db_path = os.path.join(scratch, 'edugamify.db')
+        metrics_path = os.path.join(scratch, 'metrics.prom')
+        seed_start = time.perf_counter()
+        seed_database(db_path, users=args.users, chats=args.chats, scores=args.scores, rounds=args.bcrypt_rounds,
+                      seed=args.seed, languages=[args.language])
+        seed_seconds = time.perf_counter() - seed_start
+        env = dict(os.environ, PYTHONPATH=ROOT, EDUGAMIFY_DB=db_path, EDUGAMIFY_BCRYPT_ROUNDS=str(args.bcrypt_rounds),
+                   EDUGAMIFY_PROFILE_SAMPLE='1', EDUGAMIFY_METRICS_PATH=metrics_path)
+        command = [sys.executable, '-m', 'benchmarks.bench_suite', '--worker'] + [
+            f"--{name.replace('_', '-')}={value}" for name, value in vars(args).items()
+            if name not in ('worker', 'output', 'compare', 'tolerance', 'language')]
+        out = subprocess.run(command, cwd=scratch, env=env, check=True, capture_output=True, text=True).stdout
+        raw = json.loads(out.strip().splitlines()[-1])
+        profile = read_profile(metrics_path)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'args': {name: value for name, value in vars(args).items() if name not in ('worker', 'output', 'compare')},
+            'seed_seconds': round(seed_seconds, 3),
+            'wall_seconds': round(raw['wall_seconds'], 3),
+            'translator_calls': raw['translator_calls'],
+            'model_calls': raw['model_calls'],
+        },
+        'scenarios': {name: summarize(raw['samples'][name]) for name in SCENARIOS},
+        'profile': profile,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Scenarios whose p50 grew by more than tolerance (a fraction) against baseline
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'vs baseline':<12} {'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for name in SCENARIOS:
+        before, after = baseline.get('scenarios', {}).get(name), results['scenarios'].get(name)
+        if not before or not after:
+            continue
+        change = after['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{name:<12} {before['p50_ms']:>9.1f}ms {after['p50_ms']:>8.1f}ms {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of login, dashboard, chat and quiz.")
+    parser.add_argument('--users', type=int, default=200, help="students in the synthetic database")
+    parser.add_argument('--chats', type=int, default=20, help="seeded chat turns and analytics rows per student")
+    parser.add_argument('--scores', type=int, default=10, help="seeded game scores per student")
+    parser.add_argument('--sessions', type=int, default=10, help="student sessions to drive")
+    parser.add_argument('--reruns', type=int, default=5, help="dashboard renders per session")
+    parser.add_argument('--chat-turns', type=int, default=2, help="tutor questions per session")
+    parser.add_argument('--language', default='English', help="language of the seeded students")
+    parser.add_argument('--translate-latency', type=float, default=0.05)
+    parser.add_argument('--first-token', type=float, default=0.5, help="fake Gemini time to first token")
+    parser.add_argument('--token-latency', type=float, default=0.02, help="fake Gemini time per later chunk")
+    parser.add_argument('--bcrypt-rounds', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results as JSON here")
+    parser.add_argument('--compare', metavar='JSON', help="earlier results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed p50 slowdown before flagging")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    results = run(args)
+    meta = results['meta']
+    print(f"{args.sessions} sessions over {args.users} seeded students in {meta['wall_seconds']:.1f}s "
+          f"({meta['model_calls']} model calls, {meta['translator_calls']} translator calls)")
+    print(f"{'scenario':<12} {'n':>4} {'per s':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name in SCENARIOS:
+        row = results['scenarios'][name]
+        if row:
+            print(f"{name:<12} {row['count']:>4} {row['throughput_per_s']:>7.1f} {row['p50_ms']:>7.1f}ms "
+                  f"{row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/fake_server.py
+# Local HTTP stand-in for the translator, the LLM and the Lottie CDN, with injected
+# latency, so network fan-out can be measured offline.
+#
+#   GET  /translate?q=...&dest=hi[&delay=2]  -> {"text": "[hi] ..."}
+#   POST /generate  {"prompt": ...}          -> {"text": answer}
+#   GET  /lottie/<name>                      -> {"name": name, "layers": []}
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.fakes import DEFAULT_ANSWER
+
+
+class FakeServer:
+    def __init__(self, latency=0.2, jitter=0.05, port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, payload, delay=None):
+                server._enter()
+                try:
+                    time.sleep(delay if delay is not None else server.latency + random.uniform(0, server.jitter))
+                    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # client gave up
+                finally:
+                    server._leave()
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                delay = float(query['delay'][0]) if 'delay' in query else None
+                if url.path == '/translate':
+                    self._reply({'text': f"[{query.get('dest', ['en'])[0]}] {query.get('q', [''])[0]}"}, delay)
+                elif url.path.startswith('/lottie/'):
+                    self._reply({'name': url.path.rsplit('/', 1)[-1], 'layers': []}, delay)
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/generate':
+                    self.send_error(404)
+                    return
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._reply({'text': DEFAULT_ANSWER}, server.latency * 5)
+
+        return Handler
@@ -0,0 +1,82 @@
+# benchmarks/fakes.py
+# Offline stand-ins for the Gemini model and googletrans with configurable latency.
+import threading
+import time
+from collections import deque
+
+DEFAULT_ANSWER = (
+    "Great question! 🌱 Photosynthesis is how plants make their own food. "
+    "Leaves take in sunlight, water and carbon dioxide. "
+    "Chlorophyll turns them into glucose and releases oxygen.\n"
+    "Try this: list three things a plant needs and earn 10 EduPoints! 🎯"
+)
+
+
+class FakeText:
+    def __init__(self, text):
+        self.text = text
+
+
+# Same name and status code as the API's quota error
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class FakeModel:
+    # With requests_per_minute set, calls beyond it in any 60 s window fail like the real quota
+    def __init__(self, first_token_latency=1.0, token_latency=0.05, answer=DEFAULT_ANSWER, words_per_chunk=4,
+                 requests_per_minute=None):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.answer = answer
+        self.words_per_chunk = words_per_chunk
+        self.requests_per_minute = requests_per_minute
+        self.calls = 0
+        self.rejected = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        with self._lock:
+            self.calls += 1
+            if self.requests_per_minute is None:
+                return
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.requests_per_minute:
+                self.rejected += 1
+                raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+            self._recent.append(now)
+
+    def _chunks(self):
+        words = self.answer.split(" ")
+        for i in range(0, len(words), self.words_per_chunk):
+            chunk = " ".join(words[i:i + self.words_per_chunk])
+            yield chunk if i + self.words_per_chunk >= len(words) else chunk + " "
+
+    def _stream(self):
+        time.sleep(self.first_token_latency)
+        for i, chunk in enumerate(self._chunks()):
+            if i:
+                time.sleep(self.token_latency)
+            yield FakeText(chunk)
+
+    def generate_content(self, prompt, stream=False):
+        self._admit()
+        if stream:
+            return self._stream()
+        chunks = list(self._chunks())
+        time.sleep(self.first_token_latency + self.token_latency * (len(chunks) - 1))
+        return FakeText("".join(chunks))
+
+
+class FakeTranslator:
+    def __init__(self, latency=0.3):
+        self.latency = latency
+        self.calls = 0
+
+    def translate(self, text, dest='en', src='auto'):
+        self.calls += 1
+        time.sleep(self.latency)
+        return FakeText(text if dest == src else f"[{dest}] {text}")
@@ -0,0 +1,44 @@
+# benchmarks/harness.py
+# Runs main1.py headlessly for benchmarks: Streamlit's AppTest drives the real
+# script in-process, with googletrans and Gemini swapped for the offline fakes
+# before the script first imports them. Call install_fakes() in a fresh process
+# (the app's singletons live for the life of the process) whose working directory
+# is a scratch directory, since the app keeps its databases in the current one.
+import os
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT, 'main1.py')
+
+
+# Returns (translator, model) so callers can read their call counts
+def install_fakes(translate_latency=0.01, first_token_latency=0.0, token_latency=0.0):
+    import google.generativeai as genai
+    import googletrans
+
+    from benchmarks.fakes import FakeModel, FakeTranslator
+
+    translator = FakeTranslator(latency=translate_latency)
+    model = FakeModel(first_token_latency, token_latency)
+    googletrans.Translator = lambda: translator
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = lambda name: model
+    return translator, model
+
+
+def new_app(timeout=120):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(MAIN_SCRIPT, default_timeout=timeout)
+    at.secrets["genai"] = {"api_key": "bench"}
+    return at
+
+
+# Run the script once more and return the wall time; raises if the page raised
+def timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError([e.message for e in at.exception])
+    return elapsed
@@ -0,0 +1,82 @@
+# benchmarks/seed.py
+# Synthetic edugamify.db for benchmarks: N students spread over schools, grades and
+# languages, each with chat history, analytics over the last few weeks and game
+# scores, and counters, points and badges consistent with them. Seeded from a fixed
+# random seed, so the same arguments always produce the same data. Every student's
+# password is SEED_PASSWORD.
+#
+#   python -m benchmarks.seed --db /tmp/bench.db --users 1000
+import argparse
+import random
+import sys
+
+import bcrypt
+
+from badges import record_event
+from migrations import migrate, rebuild_analytics_rollups
+from storage import Database
+
+SEED_PASSWORD = "secret"
+SCHOOLS = ["Govt. High School Rampur", "ZP School Kotha", "Kendriya Vidyalaya Palli", "Model School Ghat"]
+LANGUAGES = ["English", "Hindi", "Telugu", "Tamil"]
+SUBJECTS = ["Math", "Science", "Technology", "Engineering", "English"]
+GAMES = [("Math Quiz", "Math"), ("Science Quiz", "Science"), ("Memory Match", "General")]
+QUESTIONS = [
+    ("What is photosynthesis?", "Photosynthesis is how plants make food from sunlight, water and carbon dioxide."),
+    ("How do I solve 3x + 5 = 20?", "Subtract 5 from both sides to get 3x = 15, then divide by 3: x = 5."),
+    ("Why is the sky blue?", "Air scatters blue sunlight more than red, so the sky looks blue."),
+    ("What is Newton's second law?", "Force equals mass times acceleration: F = ma."),
+]
+
+
+def seed_database(path, users=1000, chats=20, days=30, scores=10, rounds=10, seed=0, languages=LANGUAGES):
+    rng = random.Random(seed)
+    db = Database(path)
+    migrate(db)
+    # One hash shared by every account keeps seeding fast; each login still pays a full check
+    hashed = bcrypt.hashpw(SEED_PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    with db.transaction() as c:
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM users")
+        first = c.fetchone()[0] + 1
+        c.executemany("INSERT INTO users (username, password, name, grade, school, language) VALUES (?, ?, ?, ?, ?, ?)",
+                      [(f"student{i}", hashed, f"Student {i}", rng.randint(6, 12), rng.choice(SCHOOLS),
+                        rng.choice(languages)) for i in range(first, first + users)])
+        for user_id in range(first, first + users):
+            ago = lambda: f"-{rng.randint(0, days - 1)} days"
+            c.executemany('''INSERT INTO chat_history (user_id, message, response, subject, sentiment, timestamp)
+                             VALUES (?, ?, ?, ?, 'neutral', datetime('now', ?))''',
+                          [(user_id,) + rng.choice(QUESTIONS) + (rng.choice(SUBJECTS), ago()) for _ in range(chats)])
+            analytics = [(user_id, rng.choice(SUBJECTS), rng.randint(1, 10), rng.randint(0, 5), ago())
+                         for _ in range(chats)]
+            c.executemany('''INSERT INTO analytics (user_id, subject, time_spent, problems_solved, date)
+                             VALUES (?, ?, ?, ?, datetime('now', ?))''', analytics)
+            games = [(user_id,) + rng.choice(GAMES) + (rng.randrange(0, 60, 10), ago()) for _ in range(scores)]
+            c.executemany('''INSERT INTO game_scores (user_id, game_name, subject, score, timestamp)
+                             VALUES (?, ?, ?, ?, datetime('now', ?))''', games)
+            # Same counter updates the app's events make, so points, stats and badges agree with the rows
+            record_event(c, user_id, points=10 * chats + sum(score // 10 + 10 for _, _, _, score, _ in games),
+                         problems_solved=sum(row[3] for row in analytics) + len(games), games_played=len(games))
+            for subject in {row[1] for row in analytics} | {subject for _, _, subject, _, _ in games}:
+                record_event(c, user_id, subject=subject)
+        rebuild_analytics_rollups(c)
+    db.close()
+    return list(range(first, first + users))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a synthetic edugamify.db for benchmarks.")
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--chats', type=int, default=20, help="chat turns and analytics rows per student")
+    parser.add_argument('--scores', type=int, default=10, help="game scores per student")
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--rounds', type=int, default=10, help="bcrypt work factor of the seeded passwords")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    ids = seed_database(args.db, args.users, args.chats, args.days, args.scores, args.rounds, args.seed)
+    print(f"seeded {len(ids)} students into {args.db}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# breaker.py
+# Circuit breakers for the network backends (googletrans, Gemini). Every call runs
+# with a timeout on the breaker's own small pool, so a hung client costs the caller
+# at most `timeout` seconds. After `failures` failed calls in a row the breaker
+# opens: calls fail at once with CircuitOpen and callers fall back to cached or
+# English text instead of each waiting out another timeout. After `reset_after`
+# seconds it is half-open and lets a single call through as a probe; success
+# closes it, failure opens it for another interval.
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+FAILURES = int(os.environ.get('EDUGAMIFY_BREAKER_FAILURES', 5))
+RESET_AFTER = float(os.environ.get('EDUGAMIFY_BREAKER_RESET', 30))
+# Timed-out calls keep their thread until the client returns; the breaker opens long before these run out
+MAX_WORKERS = 16
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+# Numeric state for the metrics export
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_END = object()
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    # is_failure(error) -> False for errors that say nothing about the backend's
+    # health (a quota error, say): they neither count nor reset the run of failures
+    def __init__(self, name, timeout, failures=FAILURES, reset_after=RESET_AFTER, is_failure=None,
+                 max_workers=MAX_WORKERS):
+        self.name = name
+        self.timeout = timeout
+        self.failures = failures
+        self.reset_after = reset_after
+        self.is_failure = is_failure or (lambda error: True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'breaker-{name}')
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        self._probing = False
+        self._run = 0
+        self.calls = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.short_circuits = 0
+        self.trips = 0
+
+    # Raises CircuitOpen unless a call may go upstream now; the caller must then _record an outcome
+    def _admit(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.short_circuits += 1
+                    raise CircuitOpen(f"{self.name} is being probed after an outage")
+                self._probing = True
+            elif self.state == OPEN:
+                self.short_circuits += 1
+                raise CircuitOpen(f"{self.name} is unavailable")
+            self.calls += 1
+
+    # ok is True, False, or None for an outcome that does not count either way
+    def _record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._run = 0
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                    logger.info("%s recovered; circuit closed", self.name)
+            elif ok is False:
+                self.failed += 1
+                self._run += 1
+                # Calls admitted before the breaker opened may still fail afterwards; they do not reopen it
+                if self.state == HALF_OPEN or (self.state == CLOSED and self._run >= self.failures):
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+                    self.trips += 1
+                    logger.warning("%s failed %d times in a row; failing fast for %gs", self.name, self._run,
+                                   self.reset_after)
+
+    def _outcome(self, error):
+        return None if error is not None and not self.is_failure(error) else error is None
+
+    def _timed(self, func, *args):
+        future = self._executor.submit(func, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"{self.name} did not answer within {self.timeout:g}s") from None
+
+    # True while calls would fail at once; lets callers skip queueing work that cannot run
+    def rejecting(self):
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_after
+
+    def call(self, func, *args):
+        self._admit()
+        try:
+            result = self._timed(func, *args)
+        except Exception as e:
+            self._record(self._outcome(e))
+            raise
+        self._record(True)
+        return result
+
+    # Items of make_iterable(), each within the timeout; the call succeeds once the iterable is exhausted
+    def stream(self, make_iterable):
+        self._admit()
+        outcome = None
+        try:
+            iterator = self._timed(lambda: iter(make_iterable()))
+            while True:
+                item = self._timed(next, iterator, _END)
+                if item is _END:
+                    break
+                yield item
+            outcome = True
+        except Exception as e:
+            outcome = self._outcome(e)
+            raise
+        finally:
+            # A consumer that stops early leaves the outcome unknown, which releases a probe
+            self._record(outcome)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': STATE_CODES[self.state],
+                'calls': self.calls,
+                'failures': self.failed,
+                'timeouts': self.timeouts,
+                'short_circuits': self.short_circuits,
+                'trips': self.trips,
+                'consecutive_failures': self._run,
+            }
@@ -0,0 +1,116 @@
+# build_ui_catalog.py
+# Offline build step: extract the static UI strings from main1.py, translate them
+# once into every language in LANGUAGE_MAPPING and write ui_catalog.json.
+#
+#   python build_ui_catalog.py            # build / refresh the catalog
+#   python build_ui_catalog.py --check    # list strings missing from the catalog
+import argparse
+import ast
+import json
+import os
+import sys
+
+from translation_cache import UI_CATALOG_PATH, TranslationCache, load_ui_catalog
+
+APP_SOURCE = 'main1.py'
+CATALOG_VERSION = 1
+
+TRANSLATE_CALLS = {'translate_from_english'}
+# fragment_labels and build_static_fragment hand their lists to translate_many_from_english
+BATCH_TRANSLATE_CALLS = {'translate_many_from_english', 'fragment_labels', 'build_static_fragment'}
+MARKER_CALLS = {'N_'}
+
+
+def _call_name(node):
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _string_constants(node):
+    return [n.value for n in ast.walk(node) if isinstance(n, ast.Constant) and isinstance(n.value, str)]
+
+
+def load_language_mapping(tree):
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == 'LANGUAGE_MAPPING' for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise SystemExit("LANGUAGE_MAPPING not found in %s" % APP_SOURCE)
+
+
+# Static strings are literals passed to translate_from_english, literals marked with N_(),
+# and list literals or module-level lists (e.g. GAMES_LABELS) handed to translate_many_from_english.
+def extract_ui_strings(tree):
+    module_lists = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, (ast.List, ast.Tuple)):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    module_lists[target.id] = node.value
+
+    strings = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        name = _call_name(node)
+        arg = node.args[0]
+        if name in TRANSLATE_CALLS or name in MARKER_CALLS:
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                strings.append(arg.value)
+        elif name in BATCH_TRANSLATE_CALLS:
+            if isinstance(arg, ast.Name) and arg.id in module_lists:
+                strings.extend(_string_constants(module_lists[arg.id]))
+            for literal in ast.walk(arg):
+                if isinstance(literal, (ast.List, ast.Tuple)):
+                    strings.extend(e.value for e in literal.elts if isinstance(e, ast.Constant) and isinstance(e.value, str))
+    return sorted(set(s for s in strings if s.strip()))
+
+
+def write_catalog(languages, path=UI_CATALOG_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CATALOG_VERSION, 'languages': languages}, f,
+                  ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the precompiled UI string catalog.")
+    parser.add_argument('--source', default=APP_SOURCE)
+    parser.add_argument('--output', default=UI_CATALOG_PATH)
+    parser.add_argument('--check', action='store_true', help="report missing strings without translating")
+    args = parser.parse_args(argv)
+
+    with open(args.source, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    language_codes = sorted(set(load_language_mapping(tree).values()) - {'en'})
+    strings = extract_ui_strings(tree)
+    catalog = load_ui_catalog(args.output)
+
+    missing = {code: [s for s in strings if s not in catalog.get(code, {})] for code in language_codes}
+    if args.check:
+        for code, texts in missing.items():
+            print(f"{code}: {len(strings) - len(texts)}/{len(strings)} strings")
+        return 1 if any(missing.values()) else 0
+
+    from googletrans import Translator
+    translator = Translator()
+    cache = TranslationCache(lambda text, dest, src: translator.translate(text, dest=dest, src=src).text)
+    languages = {}
+    for code in language_codes:
+        existing = catalog.get(code, {})
+        translated = cache.translate_many(missing[code], code, 'en') if missing[code] else []
+        entries = {s: existing[s] for s in strings if s in existing}
+        # Strings the backend failed on are left out so the app keeps falling back to live translation
+        entries.update({s: t for s, t in zip(missing[code], translated) if cache.get(s, code, 'en') is not None})
+        languages[code] = entries
+        print(f"{code}: {len(entries)}/{len(strings)} strings")
+    write_catalog(languages, args.output)
+    print(f"Wrote {args.output}; translation cache: {cache.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,429 @@
+# bundles.py
+# Offline content packaging for students on slow links. The files listed in
+# offline_content are packed into one bundle per (grade, subject, language):
+# each file is cut into fixed-size chunks, every chunk is named by the SHA-256 of
+# its bytes and zlib-compressed on its own, and the bundle is named by the hash of
+# its manifest, so an unchanged bundle is never rebuilt or re-downloaded. A device
+# holding an older version downloads a delta holding only the chunks it lacks.
+# Bundles and deltas are immutable files served with HTTP Range support from
+# memory maps, so an interrupted download resumes where it stopped:
+#
+#   python -m bundles build [--content-dir content]   # (re)build changed bundles
+#   python -m bundles serve --port 8502               # resumable download server
+#   python -m bundles stats
+#
+# A bundle file is MAGIC, an 8-byte big-endian header length, a JSON header (the
+# manifest plus a table of the chunks stored in this file), then the chunk data.
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from storage import DB_PATH, Database
+
+CONTENT_DIR = os.environ.get('EDUGAMIFY_CONTENT_DIR', 'content')
+BUNDLE_DIR = os.environ.get('EDUGAMIFY_BUNDLE_DIR', 'bundles')
+CHUNK_SIZE = 64 * 1024
+COMPRESSION_LEVEL = 9
+MAGIC = b'SKBUNDLE1\n'
+HEADER_LENGTH = struct.Struct('>Q')
+OPEN_FILES = 64
+SERVE_PORT = 8502
+COPY_SIZE = 64 * 1024
+
+_FILE_NAME = re.compile(r'^[0-9a-f]{64}(?:_[0-9a-f]{64})?\.(?:bundle|delta)$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _canonical(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+# Deterministic, so the same chunk is stored byte-for-byte the same in every bundle
+def pack_chunk(data):
+    packed = zlib.compress(data, COMPRESSION_LEVEL)
+    return ('zlib', packed) if len(packed) < len(data) else ('raw', data)
+
+
+def unpack_chunk(codec, payload):
+    return zlib.decompress(payload) if codec == 'zlib' else bytes(payload)
+
+
+# Manifest for one group's files, the bytes of each distinct chunk, and the files not found
+def build_manifest(grade, subject, language, items, content_dir=CONTENT_DIR, chunk_size=CHUNK_SIZE):
+    files, chunks, missing = [], OrderedDict(), []
+    for item_id, title, filename in items:
+        path = os.path.join(content_dir, filename)
+        if not os.path.isfile(path):
+            missing.append(filename)
+            continue
+        digest, ids, size = hashlib.sha256(), [], 0
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(chunk_size)
+                if not block:
+                    break
+                chunk_id = hashlib.sha256(block).hexdigest()
+                chunks.setdefault(chunk_id, block)
+                digest.update(block)
+                ids.append(chunk_id)
+                size += len(block)
+        files.append({'item': item_id, 'title': title, 'name': filename, 'size': size,
+                      'sha256': digest.hexdigest(), 'chunks': ids})
+    manifest = {'grade': grade, 'subject': subject, 'language': language, 'chunk_size': chunk_size, 'files': files}
+    return manifest, chunks, missing
+
+
+def manifest_id(manifest):
+    return hashlib.sha256(_canonical(manifest)).hexdigest()
+
+
+# Write MAGIC + header + chunk data atomically; chunks maps id -> (size, codec, payload)
+def write_bundle(path, header, chunks):
+    table, offset = [], 0
+    for chunk_id, (size, codec, payload) in chunks.items():
+        table.append({'id': chunk_id, 'offset': offset, 'stored_size': len(payload), 'size': size, 'codec': codec})
+        offset += len(payload)
+    encoded = _canonical(dict(header, chunks=table))
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + HEADER_LENGTH.pack(len(encoded)) + encoded)
+        for size, codec, payload in chunks.values():
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(MAGIC) + HEADER_LENGTH.size + len(encoded) + offset
+
+
+# (header, offset of the chunk data) from a bundle or delta's bytes (a file's mmap works)
+def read_header(buf):
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not a bundle file")
+    start = len(MAGIC) + HEADER_LENGTH.size
+    length, = HEADER_LENGTH.unpack(bytes(buf[len(MAGIC):start]))
+    return json.loads(bytes(buf[start:start + length])), start + length
+
+
+def read_chunks(buf):
+    header, data = read_header(buf)
+    return header, {entry['id']: (entry['size'], entry['codec'], buf[data + entry['offset']:
+                                                                     data + entry['offset'] + entry['stored_size']])
+                    for entry in header['chunks']}
+
+
+def bundle_path(bundle_dir, new_id, base_id=None):
+    name = f"{base_id}_{new_id}.delta" if base_id else f"{new_id}.bundle"
+    return os.path.join(bundle_dir, name)
+
+
+def _map(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Only the chunks of new_id's bundle that base_id's bundle lacks; built once, then served from disk
+def build_delta(bundle_dir, base_id, new_id):
+    path = bundle_path(bundle_dir, new_id, base_id)
+    if os.path.exists(path):
+        return path
+    base, new = _map(bundle_path(bundle_dir, base_id)), _map(bundle_path(bundle_dir, new_id))
+    try:
+        base_header, _ = read_header(base)
+        have = {entry['id'] for entry in base_header['chunks']}
+        header, chunks = read_chunks(new)
+        header = {key: value for key, value in header.items() if key != 'chunks'}
+        header['base'] = base_id
+        write_bundle(path, header, OrderedDict((chunk_id, (size, codec, bytes(payload)))
+                                               for chunk_id, (size, codec, payload) in chunks.items()
+                                               if chunk_id not in have))
+    finally:
+        base.close()
+        new.close()
+    return path
+
+
+# Device side: rebuild the full new bundle from the old one plus a delta
+def apply_delta(base_path, delta_path, out_path):
+    with open(base_path, 'rb') as f:
+        base_header, base_chunks = read_chunks(f.read())
+    with open(delta_path, 'rb') as f:
+        header, delta_chunks = read_chunks(f.read())
+    if header.get('base') != base_header['manifest_id']:
+        raise ValueError("delta does not apply to this bundle")
+    available = dict(base_chunks, **delta_chunks)
+    order = OrderedDict()
+    for entry in header['files']:
+        for chunk_id in entry['chunks']:
+            if chunk_id not in order:
+                order[chunk_id] = available[chunk_id]
+    header = {key: value for key, value in header.items() if key not in ('chunks', 'base')}
+    return write_bundle(out_path, header, order)
+
+
+# Device side: unpack every file, checking each against the manifest
+def extract(path, out_dir):
+    with open(path, 'rb') as f:
+        header, chunks = read_chunks(f.read())
+    os.makedirs(out_dir, exist_ok=True)
+    for entry in header['files']:
+        digest = hashlib.sha256()
+        target = os.path.join(out_dir, os.path.basename(entry['name']))
+        with open(target, 'wb') as out:
+            for chunk_id in entry['chunks']:
+                size, codec, payload = chunks[chunk_id]
+                data = unpack_chunk(codec, payload)
+                digest.update(data)
+                out.write(data)
+        if digest.hexdigest() != entry['sha256']:
+            raise ValueError(f"{entry['name']} is corrupt")
+    return [entry['name'] for entry in header['files']]
+
+
+# Device side: fetch url into path, resuming from whatever part of it is already there; returns bytes fetched
+def download(url, path, block=COPY_SIZE):
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+    have = os.path.getsize(path) if os.path.exists(path) else 0
+    request = Request(url, headers={'Range': f"bytes={have}-"} if have else {})
+    try:
+        response = urlopen(request)
+    except HTTPError as e:
+        if e.code == 416:
+            return 0
+        raise
+    fetched = 0
+    with response, open(path, 'ab' if response.status == 206 else 'wb') as out:
+        while True:
+            data = response.read(block)
+            if not data:
+                break
+            out.write(data)
+            fetched += len(data)
+    return fetched
+
+
+# Build a new version of every group whose files changed; returns (group, manifest_id, status, missing files)
+def build_bundles(db, content_dir=CONTENT_DIR, bundle_dir=BUNDLE_DIR, chunk_size=CHUNK_SIZE):
+    os.makedirs(bundle_dir, exist_ok=True)
+    groups = OrderedDict()
+    for item_id, title, subject, filename, grade, language in db.query(
+            '''SELECT id, title, subject, content, grade_level, language FROM offline_content
+               ORDER BY grade_level, subject, language, id'''):
+        groups.setdefault((grade, subject, language), []).append((item_id, title, filename))
+    results = []
+    for (grade, subject, language), items in groups.items():
+        manifest, chunks, missing = build_manifest(grade, subject, language, items, content_dir, chunk_size)
+        if not manifest['files']:
+            results.append(((grade, subject, language), None, 'empty', missing))
+            continue
+        new_id = manifest_id(manifest)
+        latest = latest_bundle(db, grade, subject, language)
+        if latest and latest[0] == new_id and os.path.exists(bundle_path(bundle_dir, new_id)):
+            results.append(((grade, subject, language), new_id, 'unchanged', missing))
+            continue
+        # Compressing is most of the cost of a build, so only changed groups pay it
+        packed = OrderedDict((chunk_id, (len(block),) + pack_chunk(block)) for chunk_id, block in chunks.items())
+        stored = write_bundle(bundle_path(bundle_dir, new_id), dict(manifest, manifest_id=new_id), packed)
+        with db.transaction() as c:
+            c.execute('''INSERT INTO content_bundles (grade, subject, language, manifest_id, files, size, stored_size)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                      (grade, subject, language, new_id, len(manifest['files']),
+                       sum(entry['size'] for entry in manifest['files']), stored))
+        results.append(((grade, subject, language), new_id, 'built', missing))
+    return results
+
+
+# (manifest_id, files, size, stored_size) of the current version, or None
+def latest_bundle(db, grade, subject, language):
+    return db.query_one('''SELECT manifest_id, files, size, stored_size FROM content_bundles
+                           WHERE grade = ? AND subject = ? AND language = ? ORDER BY id DESC LIMIT 1''',
+                        (grade, subject, language))
+
+
+class MappedFiles:
+    # Open memory maps of served files, least recently used closed first
+    def __init__(self, directory, size=OPEN_FILES):
+        self.directory = directory
+        self.size = size
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            entry = self._maps.get(name)
+            if entry is not None:
+                self._maps.move_to_end(name)
+                return entry
+        mapped = _map(os.path.join(self.directory, name))
+        entry = (mapped, read_header(mapped)[0])
+        with self._lock:
+            self._maps[name] = entry
+            # Evicted maps are left to the garbage collector, as a response may still be sending from one
+            while len(self._maps) > self.size:
+                self._maps.popitem(last=False)
+        return entry
+
+
+class BundleServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, db, bundle_dir=BUNDLE_DIR):
+        self.db = db
+        self.bundle_dir = bundle_dir
+        self.files = MappedFiles(bundle_dir)
+        self._delta_lock = threading.Lock()
+        super().__init__(address, BundleRequestHandler)
+
+    # Newest version of a group, plus a delta for a device that already holds an older one
+    def describe(self, grade, subject, language, have=None):
+        latest = latest_bundle(self.db, grade, subject, language)
+        if latest is None:
+            return None
+        new_id, files, size, stored_size = latest
+        info = {'manifest_id': new_id, 'files': files, 'size': size, 'stored_size': stored_size,
+                'url': f"/files/{new_id}.bundle"}
+        known = have and have != new_id and self.db.query_one(
+            "SELECT 1 FROM content_bundles WHERE manifest_id = ?", (have,))
+        if known and os.path.exists(bundle_path(self.bundle_dir, have)):
+            with self._delta_lock:
+                path = build_delta(self.bundle_dir, have, new_id)
+            info['delta'] = {'base': have, 'url': f"/files/{os.path.basename(path)}",
+                             'stored_size': os.path.getsize(path)}
+        return info
+
+    def count_download(self, header):
+        ids = [entry['item'] for entry in header['files']]
+        placeholders = ", ".join("?" for _ in ids)
+        with self.db.transaction() as c:
+            c.execute(f"UPDATE offline_content SET download_count = download_count + 1 WHERE id IN ({placeholders})", ids)
+
+
+class BundleRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        if len(parts) == 4 and parts[0] == 'bundles' and parts[1].isdigit():
+            have = parse_qs(url.query).get('have', [None])[0]
+            info = self.server.describe(int(parts[1]), parts[2], parts[3], have)
+            if info is None:
+                return self.send_error(404)
+            return self._send_json(info, body)
+        if len(parts) == 2 and parts[0] == 'files' and _FILE_NAME.match(parts[1]):
+            try:
+                mapped, header = self.server.files.get(parts[1])
+            except FileNotFoundError:
+                return self.send_error(404)
+            return self._send_file(parts[1], mapped, header, body)
+        self.send_error(404)
+
+    def _send_json(self, obj, body):
+        data = json.dumps(obj).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def _send_file(self, name, mapped, header, body):
+        size = len(mapped)
+        etag = f'"{name}"'
+        start, end = 0, size - 1
+        requested = self.headers.get('Range')
+        # If-Range: resume only if the file is the one the client started on (names never change content)
+        if requested and self.headers.get('If-Range', etag) == etag:
+            match = _RANGE.match(requested.strip())
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                else:
+                    start = max(0, size - int(match.group(2)))
+                if start > end or start >= size:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f"bytes */{size}")
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.end_headers()
+        if not body:
+            return
+        if start == 0 and name.endswith('.bundle'):
+            self.server.count_download(header)
+        view = memoryview(mapped)
+        try:
+            for offset in range(start, end + 1, COPY_SIZE):
+                self.wfile.write(view[offset:min(offset + COPY_SIZE, end + 1)])
+        except ConnectionError:
+            # The link dropped; the client resumes from what it has with a Range request
+            self.close_connection = True
+        finally:
+            view.release()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and serve offline content bundles.")
+    parser.add_argument('command', choices=['build', 'serve', 'stats'])
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--content-dir', default=CONTENT_DIR)
+    parser.add_argument('--bundle-dir', default=BUNDLE_DIR)
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    args = parser.parse_args(argv)
+
+    from migrations import migrate
+    db = Database(args.db)
+    migrate(db)
+    if args.command == 'build':
+        for (grade, subject, language), new_id, status, missing in build_bundles(db, args.content_dir, args.bundle_dir):
+            print(f"grade {grade:<3} {subject:<12} {language:<10} {status:<9} {new_id[:12] if new_id else '':<12}"
+                  + (f"  missing: {', '.join(missing)}" if missing else ""))
+    elif args.command == 'stats':
+        for row in db.query('''SELECT grade, subject, language, files, size, stored_size, built_at FROM content_bundles b
+                               WHERE id = (SELECT MAX(id) FROM content_bundles
+                                           WHERE grade = b.grade AND subject = b.subject AND language = b.language)
+                               ORDER BY grade, subject, language'''):
+            grade, subject, language, files, size, stored_size, built_at = row
+            print(f"grade {grade:<3} {subject:<12} {language:<10} {files:>3} files {size:>10} -> {stored_size:>10} bytes  {built_at}")
+    else:
+        server = BundleServer(('', args.port), db, args.bundle_dir)
+        print(f"serving {args.bundle_dir} on port {args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# fragments.py
+# Cache of rendered page fragments: the HTML blocks and translated labels of a
+# page's static content, keyed on (page, language). Each is built once per process
+# and language; blocks built from a student's data are not cached here.
+import re
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = 512
+
+
+# Drop comments and indentation so the stylesheet sent on every rerun is as small as possible
+def compact_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};])\s*", r"\1", css).strip()
+
+
+class FragmentCache:
+    def __init__(self, maxsize=CACHE_SIZE, enabled=True):
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+
+    # build() -> (fragment, complete), run only when (page, lang) has not been built yet;
+    # an incomplete fragment (e.g. holding fallback text) is returned but not kept
+    def get(self, page, lang, build):
+        key = (page, lang)
+        with self._lock:
+            if self.enabled and key in self._fragments:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return self._fragments[key]
+        start = time.perf_counter()
+        fragment, complete = build()
+        with self._lock:
+            self.misses += 1
+            self.build_seconds += time.perf_counter() - start
+            if self.enabled and complete:
+                self._fragments[key] = fragment
+                if len(self._fragments) > self.maxsize:
+                    self._fragments.popitem(last=False)
+        return fragment
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'build_seconds': round(self.build_seconds, 3),
+            'size': len(self._fragments),
+        }
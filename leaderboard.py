@@ -0,0 +1,150 @@
+# leaderboard.py
+# In-memory ranked leaderboards (global, per school, per grade) kept up to date on
+# every points change. Ranks and top-N are answered by binary search over sorted
+# keys instead of sorting the users table per view.
+import threading
+import time
+from bisect import bisect_left, insort
+
+TOP_CACHE_TTL = 5
+REBUILD_INTERVAL = 300
+
+
+class RankedBoard:
+    # points: {user_id: points} to start from, sorted once rather than inserted one by one
+    def __init__(self, points=None):
+        self._points = dict(points or {})
+        self._keys = sorted((-p, user_id) for user_id, p in self._points.items())  # sorted (-points, user_id)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, user_id, points):
+        old = self._points.get(user_id)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+        self._points[user_id] = points
+        insort(self._keys, (-points, user_id))
+
+    def points(self, user_id):
+        return self._points.get(user_id)
+
+    def remove(self, user_id):
+        old = self._points.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+
+    def top(self, n):
+        return [(user_id, -neg_points) for neg_points, user_id in self._keys[:n]]
+
+    # Competition ranking: 1 + number of students with strictly more points
+    def rank(self, user_id):
+        points = self._points.get(user_id)
+        if points is None:
+            return None
+        return bisect_left(self._keys, (-points,)) + 1
+
+
+class Leaderboard:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Users whose points changed while a reload was reading the table; None when not reloading
+        self._touched = None
+        self._boards = {}
+        self._profiles = {}
+        self._top_cache = {}
+        self._loaded_at = 0.0
+
+    def _scopes(self, user_id):
+        name, grade, school = self._profiles[user_id]
+        return [('global',), ('school', school), ('grade', grade)]
+
+    def _place(self, user_id, points):
+        for scope in self._scopes(user_id):
+            self._boards.setdefault(scope, RankedBoard()).update(user_id, points)
+
+    # Full rebuild picks up points written by other server processes. Called without
+    # self._lock: one thread reads the table and builds the boards while the others
+    # keep using the old ones, then they are swapped in.
+    def _reload_if_stale(self):
+        if time.time() - self._loaded_at < REBUILD_INTERVAL:
+            return
+        # There is nothing to serve before the first load, so that one is waited for
+        if not self._reload_lock.acquire(blocking=not self._loaded_at):
+            return
+        try:
+            if time.time() - self._loaded_at < REBUILD_INTERVAL:
+                return
+            with self._lock:
+                self._touched = set()
+            rows = self.db.query("SELECT id, name, grade, school, points FROM users")
+            profiles, scoped = {}, {}
+            for user_id, name, grade, school, points in rows:
+                profiles[user_id] = (name, grade, school)
+                for scope in (('global',), ('school', school), ('grade', grade)):
+                    scoped.setdefault(scope, {})[user_id] = points or 0
+            boards = {scope: RankedBoard(points) for scope, points in scoped.items()}
+            with self._lock:
+                touched, self._touched = self._touched, None
+                self._boards, self._profiles, self._top_cache = boards, profiles, {}
+                # Their rows may have been read before or after the change, so read them again
+                for user_id in touched:
+                    self._load_user(user_id)
+                self._loaded_at = time.time()
+        finally:
+            self._reload_lock.release()
+
+    # Place the user's committed row; caller holds self._lock
+    def _load_user(self, user_id):
+        row = self.db.query_one("SELECT name, grade, school, points FROM users WHERE id = ?", (user_id,))
+        if row is None:
+            return False
+        self._profiles[user_id] = row[:3]
+        self._place(user_id, row[3] or 0)
+        return True
+
+    def _ensure_user(self, user_id):
+        return user_id in self._profiles or self._load_user(user_id)
+
+    def _scope_key(self, scope, user_id):
+        if scope == 'global' or user_id is None:
+            return ('global',)
+        name, grade, school = self._profiles[user_id]
+        return ('school', school) if scope == 'school' else ('grade', grade)
+
+    # Call after the transaction that changed the points has committed. The committed
+    # total is read back rather than delta added, so a reload that already saw the
+    # change cannot count it twice.
+    def add_points(self, user_id, delta):
+        if not delta:
+            return
+        self._reload_if_stale()
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(user_id)
+            self._load_user(user_id)
+
+    # scope is 'global', 'school' or 'grade'; school/grade boards are the ones user_id belongs to
+    def top(self, n=10, scope='global', user_id=None):
+        self._reload_if_stale()
+        with self._lock:
+            if user_id is not None and not self._ensure_user(user_id):
+                user_id = None
+            key = (self._scope_key(scope, user_id), n)
+            cached = self._top_cache.get(key)
+            if cached and cached[0] > time.time():
+                return cached[1]
+            board = self._boards.get(key[0], RankedBoard())
+            result = [self._profiles[uid] + (points,) for uid, points in board.top(n)]
+            self._top_cache[key] = (time.time() + TOP_CACHE_TTL, result)
+            return result
+
+    def rank(self, user_id, scope='global'):
+        self._reload_if_stale()
+        with self._lock:
+            if not self._ensure_user(user_id):
+                return None, 0
+            board = self._boards[self._scope_key(scope, user_id)]
+            return board.rank(user_id), len(board)
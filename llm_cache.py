@@ -0,0 +1,123 @@
+# llm_cache.py
+# Shared tutor response cache. Answers are stored in edugamify.db so every worker
+# process sees them, keyed on the normalized question plus grade and subject, with
+# a TTL and size-bounded LRU eviction. An optional near-duplicate matcher reuses
+# answers for paraphrased questions using character-shingle similarity.
+import hashlib
+import re
+import threading
+import time
+
+RESPONSE_TTL = 7 * 24 * 3600
+MAX_ENTRIES = 5000
+EVICT_EVERY = 50
+NEAR_DUPLICATE_THRESHOLD = 0.7
+NEAR_DUPLICATE_CANDIDATES = 200
+SHINGLE_SIZE = 3
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_prompt(prompt):
+    text = _PUNCTUATION.sub(" ", prompt.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = text.replace(" ", "_")
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    def __init__(self, db, ttl=RESPONSE_TTL, max_entries=MAX_ENTRIES, near_duplicates=False,
+                 threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(normalized, grade, subject):
+        return hashlib.sha256(f"{grade}|{subject}|{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, prompt, grade, subject):
+        normalized = normalize_prompt(prompt)
+        key = self.make_key(normalized, grade, subject)
+        cutoff = time.time() - self.ttl
+        row = self.db.query_one("SELECT response FROM llm_response_cache WHERE key = ? AND created_at > ?", (key, cutoff))
+        near = False
+        if row is None and self.near_duplicates:
+            key, row = self._near_duplicate(normalized, grade, subject, cutoff)
+            near = row is not None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            if near:
+                self.near_hits += 1
+            else:
+                self.exact_hits += 1
+        with self.db.transaction() as c:
+            c.execute("UPDATE llm_response_cache SET hits = hits + 1, last_hit = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    # Numbers must match exactly so "what is 2+3" never reuses the answer to "what is 2+2"
+    def _near_duplicate(self, normalized, grade, subject, cutoff):
+        target = shingles(normalized)
+        numbers = _NUMBER.findall(normalized)
+        best_key, best_row, best_score = None, None, self.threshold
+        candidates = self.db.query('''SELECT key, prompt, response FROM llm_response_cache
+                                      WHERE grade = ? AND subject = ? AND created_at > ?
+                                      ORDER BY last_hit DESC LIMIT ?''',
+                                   (grade, subject, cutoff, NEAR_DUPLICATE_CANDIDATES))
+        for key, prompt, response in candidates:
+            if _NUMBER.findall(prompt) != numbers:
+                continue
+            score = similarity(target, shingles(prompt))
+            if score >= best_score:
+                best_key, best_row, best_score = key, (response,), score
+        return best_key, best_row
+
+    def put(self, prompt, grade, subject, response):
+        normalized = normalize_prompt(prompt)
+        now = time.time()
+        with self.db.transaction() as c:
+            c.execute('''INSERT OR REPLACE INTO llm_response_cache (key, grade, subject, prompt, response, created_at, last_hit, hits)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, 0)''',
+                      (self.make_key(normalized, grade, subject), grade, subject, normalized, response, now, now))
+            with self._lock:
+                self._puts += 1
+                evict = self._puts % EVICT_EVERY == 0
+            if evict:
+                self._evict(c, now)
+
+    def _evict(self, c, now):
+        c.execute("DELETE FROM llm_response_cache WHERE created_at <= ?", (now - self.ttl,))
+        c.execute('''DELETE FROM llm_response_cache WHERE key IN (
+                         SELECT key FROM llm_response_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?)''',
+                  (self.max_entries,))
+
+    def stats(self):
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            'exact_hits': self.exact_hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_rate': (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+        }
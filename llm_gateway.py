@@ -0,0 +1,263 @@
+# llm_gateway.py
+# Single entry point for tutor calls to Gemini. When a class asks the same
+# question at once, identical in-flight requests (same key, the response cache's
+# key) are merged into one upstream call whose chunks every waiter receives as
+# they arrive. Upstream calls are paced by a token bucket sized to the API quota;
+# requests waiting for a token sit in a priority queue, so a student waiting on
+# the chat page goes ahead of background work. A quota error from the API drains
+# the bucket for a while and puts the request back in the queue once instead of
+# failing it. Waits, merges and rejections are counted for the metrics export.
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from profiling import percentile
+
+REQUESTS_PER_MINUTE = float(os.environ.get('EDUGAMIFY_LLM_RPM', 60))
+BURST = int(os.environ.get('EDUGAMIFY_LLM_BURST', 10))
+# Requests allowed to wait for a token before new ones are turned away
+MAX_QUEUE = 64
+# Seconds a request may wait for a token, and for the answer once it is running
+MAX_WAIT = 30
+ANSWER_TIMEOUT = 60
+# Seconds upstream calls pause after the API reports its quota is exhausted
+QUOTA_BACKOFF = 10
+QUOTA_RETRIES = 1
+WINDOW = 512
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayBusy(Exception):
+    pass
+
+
+def is_quota_error(error):
+    return getattr(error, 'code', None) == 429 or type(error).__name__ in ('ResourceExhausted', 'TooManyRequests')
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Take a token and return 0, or return the seconds until one is available
+    def take(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    # No calls for the next `seconds`; errors arriving together do not add up
+    def drain(self, seconds, now):
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class Flight:
+    # One upstream call and the chunks it has produced so far
+    def __init__(self, key, call, context, priority):
+        self.key = key
+        self.call = call
+        self.context = context
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.dispatched = None
+        self.retries = 0
+        self.waiters = 1
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def add(self, text):
+        with self.cond:
+            self.chunks.append(text)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    # Every chunk from the first, as they arrive; raises the call's error, or TimeoutError past deadline
+    def follow(self, deadline):
+        seen = 0
+        while True:
+            with self.cond:
+                while seen == len(self.chunks) and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("no answer from the model in time")
+                    self.cond.wait(remaining)
+                new, finished, error = self.chunks[seen:], self.done, self.error
+            seen += len(new)
+            yield from new
+            if finished and seen == len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class LLMGateway:
+    # submit(func, *args) runs an upstream call off the dispatcher thread (an I/O
+    # lane); on_result(context, text) sees every completed answer, once
+    def __init__(self, submit, on_result=None, per_minute=REQUESTS_PER_MINUTE, burst=BURST, max_queue=MAX_QUEUE,
+                 max_wait=MAX_WAIT, answer_timeout=ANSWER_TIMEOUT):
+        self.submit = submit
+        self.on_result = on_result
+        self.bucket = TokenBucket(per_minute, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.answer_timeout = answer_timeout
+        self._flights = {}
+        self._queue = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._waits = deque(maxlen=WINDOW)
+        self.requests = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.rejected = 0
+        self.expired = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self._thread = threading.Thread(target=self._dispatch, name='llm-gateway', daemon=True)
+        self._thread.start()
+
+    def _join(self, key, call, context, priority):
+        with self._lock:
+            self.requests += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+                # A more urgent waiter moves a queued call up; the old heap entry goes stale
+                if flight.dispatched is None and priority < flight.priority:
+                    flight.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._sequence), flight))
+                    self._wake.notify()
+                return flight
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise GatewayBusy("too many questions are waiting for the tutor")
+            flight = Flight(key, call, context, priority)
+            self._flights[key] = flight
+            self._push(flight)
+            return flight
+
+    # Caller holds self._lock
+    def _push(self, flight):
+        heapq.heappush(self._queue, (flight.priority, next(self._sequence), flight))
+        self._queued += 1
+        self._wake.notify()
+
+    # Answer chunks for key. call() -> iterable of text chunks is made only if no
+    # identical request is already queued or running; context goes to on_result
+    def stream(self, key, call, context=None, priority=INTERACTIVE):
+        flight = self._join(key, call, context, priority)
+        return flight.follow(time.monotonic() + self.max_wait + self.answer_timeout)
+
+    def generate(self, key, call, context=None, priority=INTERACTIVE):
+        return "".join(self.stream(key, call, context, priority))
+
+    def _dispatch(self):
+        while True:
+            with self._wake:
+                flight = self._next()
+            self.submit(self._run, flight)
+
+    # Caller holds self._lock; blocks until the most urgent flight may be called upstream
+    def _next(self):
+        while True:
+            while not self._queue:
+                self._wake.wait()
+            priority, _, flight = self._queue[0]
+            if flight.dispatched is not None or priority != flight.priority:
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            if now - flight.enqueued > self.max_wait:
+                heapq.heappop(self._queue)
+                self._queued -= 1
+                self.expired += 1
+                self._flights.pop(flight.key, None)
+                flight.finish(GatewayBusy("the tutor is at its request quota; try again shortly"))
+                continue
+            delay = self.bucket.take(now)
+            if delay:
+                # New, more urgent requests wake this early
+                self._wake.wait(min(delay, flight.enqueued + self.max_wait - now + 0.001))
+                continue
+            heapq.heappop(self._queue)
+            self._queued -= 1
+            flight.dispatched = now
+            self.upstream_calls += 1
+            self._waits.append(now - flight.enqueued)
+            return flight
+
+    def _run(self, flight):
+        error = None
+        try:
+            for text in flight.call():
+                flight.add(text)
+        except Exception as e:
+            error = e
+        with self._lock:
+            if error is not None and is_quota_error(error):
+                self.quota_errors += 1
+                self.bucket.drain(QUOTA_BACKOFF, time.monotonic())
+                if not flight.chunks and flight.retries < QUOTA_RETRIES:
+                    flight.retries += 1
+                    flight.dispatched = None
+                    flight.enqueued = time.monotonic()
+                    self._push(flight)
+                    return
+            if error is not None:
+                self.errors += 1
+        if error is None and self.on_result is not None:
+            try:
+                self.on_result(flight.context, "".join(flight.chunks))
+            except Exception:
+                # The waiters already have the answer; failing to store it only costs a later call
+                logger.exception("storing an LLM answer failed")
+        # Removed only after on_result, so a repeat request finds the stored answer or this flight
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.finish(error)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'upstream_calls': self.upstream_calls,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'errors': self.errors,
+                'quota_errors': self.quota_errors,
+                'queued': self._queued,
+                'in_flight': len(self._flights) - self._queued,
+                'tokens': round(self.bucket.tokens, 2),
+                'queue_wait_p50_ms': round(percentile(waits, 0.5) * 1000, 1),
+                'queue_wait_p99_ms': round(percentile(waits, 0.99) * 1000, 1),
+            }
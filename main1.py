@@ -1,18 +1,29 @@
 # main.py
 import streamlit as st
 import sqlite3
-import pandas as pd
-import plotly.express as px
-from datetime import datetime
-import google.generativeai as genai
+import html
 import os
 from dotenv import load_dotenv
-import bcrypt
-import time
-import random
-from googletrans import Translator, LANGUAGES
-from streamlit_lottie import st_lottie
-import requests
+from aio import IOLoop
+from arcade import COMPONENTS_DIR, Arcade
+from assets import LottieStore
+from breaker import CircuitBreaker, CircuitOpen
+from bundles import BUNDLE_DIR, bundle_path
+from auth import BUSY, OK, RATE_LIMITED, Authenticator
+from fragments import FragmentCache, compact_css
+from profiling import EXPORT_INTERVAL, Profiler
+from storage import DB_PATH, Database
+from migrations import ensure_schema
+from questionbank import QUIZ_LENGTH, QuestionBank
+from search import highlighted, search_chats, search_content
+from skill import SkillModel
+from badges import record_event
+from leaderboard import Leaderboard
+from llm_cache import ResponseCache, normalize_prompt
+from llm_gateway import BACKGROUND, INTERACTIVE, LLMGateway, is_quota_error
+from streaming import stream_translated
+from writebehind import WriteBehind
+from translation_cache import TranslationCache, load_ui_catalog
 
 # Load environment variables (for local testing)
 load_dotenv()
@@ -29,25 +40,56 @@ st.set_page_config(
 # Utility Functions
 # ====================
 
-# Lottie animation loader
-def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
+# pandas/plotly (dashboard), googletrans, google.generativeai and streamlit_lottie are
+# imported where first used, so a process serving only the login page never loads them
 
-# Load Lottie animations from the web
-LOTTIE_WELCOME = load_lottieurl("https://lottiefiles.com/animations/school-WwL05096wE")
-LOTTIE_STUDY = load_lottieurl("https://lottiefiles.com/animations/books-w2G4uYjP7H")
-LOTTIE_GAME = load_lottieurl("https://lottiefiles.com/animations/game-Bq4s8gC2uS")
-LOTTIE_TUTOR = load_lottieurl("https://lottiefiles.com/animations/robot-assistant-Zc7hR8sF4G")
-LOTTIE_CELEBRATE = load_lottieurl("https://lottiefiles.com/animations/confetti-TqjP7BwJ3E")
+# Lottie animations, served from the local asset store (assets/lottie)
+LOTTIE_URLS = {
+    'welcome': "https://lottiefiles.com/animations/school-WwL05096wE",
+    'study': "https://lottiefiles.com/animations/books-w2G4uYjP7H",
+    'game': "https://lottiefiles.com/animations/game-Bq4s8gC2uS",
+    'tutor': "https://lottiefiles.com/animations/robot-assistant-Zc7hR8sF4G",
+    'celebrate': "https://lottiefiles.com/animations/confetti-TqjP7BwJ3E",
+}
 
+# One event loop per server process for translation, Gemini and asset requests
+@st.cache_resource
+def get_io_loop():
+    return IOLoop()
 
-# Custom CSS with Animations
-def local_css():
-    st.markdown("""
-        <style>
+io_loop = get_io_loop()
+
+# Call counts and sampled latencies of translation, Gemini, DB helpers and pages;
+# EDUGAMIFY_PROFILE_SAMPLE sets the fraction of calls timed (0 turns timing off)
+@st.cache_resource
+def get_profiler():
+    return Profiler()
+
+profiler = get_profiler()
+profiled = profiler.timed
+
+@st.cache_resource
+def get_lottie_store():
+    # Each animation is fetched in the background the first time a page asks for it
+    return LottieStore(LOTTIE_URLS, io_loop=io_loop)
+
+def load_lottie(name: str):
+    return get_lottie_store().get(name)
+
+def show_lottie(animation, **kwargs):
+    from streamlit_lottie import st_lottie
+    st_lottie(animation, **kwargs)
+
+# Rendered page fragments per (page, language, data versions); EDUGAMIFY_FRAGMENT_CACHE=0 rebuilds them every rerun
+@st.cache_resource
+def get_fragment_cache():
+    return FragmentCache(enabled=os.getenv('EDUGAMIFY_FRAGMENT_CACHE', '1') != '0')
+
+fragments = get_fragment_cache()
+
+
+# Custom CSS with Animations, compacted once per process
+CSS = compact_css("""
         /* Fade In Animation */
         @keyframes fadeIn {
             from { opacity: 0; transform: translateY(20px); }
@@ -143,8 +185,10 @@ def local_css():
             0% { width: 0; }
             100% { width: var(--progress-width); }
         }
-        </style>
-    """, unsafe_allow_html=True)
+""")
+
+def local_css():
+    st.markdown(f"<style>{CSS}</style>", unsafe_allow_html=True)
 
 # Initialize Gemini API
 def setup_gemini():
@@ -155,11 +199,13 @@ def setup_gemini():
         st.error("API key not found. Please set it in `.streamlit/secrets.toml` or as a secret on Streamlit Cloud.")
         st.stop()
     
+    import google.generativeai as genai
     genai.configure(api_key=api_key)
     return genai.GenerativeModel('gemini-2.0-flash')
 
 # Initialize translator
 def setup_translator():
+    from googletrans import Translator
     return Translator()
 
 # Language mapping
@@ -178,107 +224,90 @@ LANGUAGE_MAPPING = {
     'Urdu': 'ur'
 }
 
-# Initialize database
+# Initialize database and apply pending schema migrations (once per process and file)
 def init_db():
-    conn = sqlite3.connect('edugamify.db')
-    c = conn.cursor()
-    
-    # Create users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  username TEXT UNIQUE,
-                  password TEXT,
-                  name TEXT,
-                  grade INTEGER,
-                  school TEXT,
-                  language TEXT DEFAULT 'English',
-                  avatar TEXT DEFAULT 'student1',
-                  points INTEGER DEFAULT 0,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Create chat history table
-    c.execute('''CREATE TABLE IF NOT EXISTS chat_history
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  message TEXT,
-                  response TEXT,
-                  subject TEXT,
-                  sentiment TEXT,
-                  timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    # Create analytics table
-    c.execute('''CREATE TABLE IF NOT EXISTS analytics
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  subject TEXT,
-                  time_spent INTEGER,
-                  problems_solved INTEGER,
-                  date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    # Create gamification table
-    c.execute('''CREATE TABLE IF NOT EXISTS gamification
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  badge_name TEXT,
-                  badge_description TEXT,
-                  earned_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    # Create offline content table
-    c.execute('''CREATE TABLE IF NOT EXISTS offline_content
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  title TEXT,
-                  subject TEXT,
-                  content_type TEXT,
-                  content TEXT,
-                  grade_level INTEGER,
-                  language TEXT,
-                  download_count INTEGER DEFAULT 0)''')
-    
-    # Create game scores table
-    c.execute('''CREATE TABLE IF NOT EXISTS game_scores
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  game_name TEXT,
-                  score INTEGER,
-                  subject TEXT,
-                  timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    # Insert some sample offline content
-    c.execute('''INSERT OR IGNORE INTO offline_content 
-                 (title, subject, content_type, content, grade_level, language) VALUES
-                 ('Basic Algebra', 'Math', 'PDF', 'algebra_basics.pdf', 6, 'English'),
-                 ('Photosynthesis', 'Science', 'PDF', 'photosynthesis.pdf', 7, 'English'),
-                 ('Simple Circuits', 'Technology', 'PDF', 'circuits.pdf', 8, 'English'),
-                 ('Geometry Basics', 'Math', 'Game', 'geometry_game.html', 6, 'English'),
-                 ('English Vocabulary', 'English', 'Flashcards', 'vocabulary_cards.pdf', 6, 'English'),
-                 ('बीजगणित की मूल बातें', 'Math', 'PDF', 'algebra_basics_hindi.pdf', 6, 'Hindi'),
-                 ('প্রকৃতির বিস্ময়', 'Science', 'PDF', 'nature_wonders_bengali.pdf', 7, 'Bengali'),
-                 ('ଗଣିତ ମୌଳିକ', 'Math', 'PDF', 'math_basics_odia.pdf', 6, 'Odia')
-              ''')
-    
-    conn.commit()
-    return conn
+    db = Database(DB_PATH)
+    ensure_schema(db)
+    return db
 
 # Initialize database and models
-conn = init_db()
-model = setup_gemini()
-translator = setup_translator()
+@st.cache_resource
+def get_database():
+    return init_db()
+
+db = get_database()
+
+@st.cache_resource
+def get_leaderboard_service():
+    return Leaderboard(db)
+
+leaderboard = get_leaderboard_service()
+
+# Near-duplicate matching reuses answers for paraphrased questions; opt in with LLM_CACHE_NEAR_DUPLICATES=1
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(db, near_duplicates=os.getenv('LLM_CACHE_NEAR_DUPLICATES') == '1')
+
+response_cache = get_response_cache()
+
+# Identical questions in flight share one Gemini call; calls are paced to the API
+# quota (EDUGAMIFY_LLM_RPM, EDUGAMIFY_LLM_BURST) and answers go to the response cache
+@st.cache_resource
+def get_llm_gateway():
+    return LLMGateway(submit=lambda func, *args: io_loop.submit('llm', func, *args),
+                      on_result=lambda context, text: response_cache.put(*context, text))
+
+llm_gateway = get_llm_gateway()
+
+# Built on the first chat turn or translation miss, not at start-up
+@st.cache_resource
+def get_model():
+    return setup_gemini()
+
+@st.cache_resource
+def get_translator():
+    return setup_translator()
+
+# Per-call timeouts, and fail-fast while a backend is down (EDUGAMIFY_BREAKER_FAILURES,
+# EDUGAMIFY_BREAKER_RESET); the LLM timeout is per chunk, and quota errors are the gateway's to handle
+@st.cache_resource
+def get_breakers():
+    return {'translate': CircuitBreaker('translate', timeout=5),
+            'llm': CircuitBreaker('llm', timeout=30, is_failure=lambda e: not is_quota_error(e))}
+
+breakers = get_breakers()
 
 # Translation functions
+def google_translate(text, dest_lang, src_lang):
+    return breakers['translate'].call(lambda: get_translator().translate(text, dest=dest_lang, src=src_lang).text)
+
+# Shared across reruns and sessions; objects created at script level are rebuilt on every rerun
+@st.cache_resource
+def get_translation_cache():
+    return TranslationCache(google_translate, fan_out=lambda func, args: io_loop.map('translate', func, args))
+
+@st.cache_resource
+def get_ui_catalog():
+    return load_ui_catalog()
+
+translation_cache = get_translation_cache()
+UI_CATALOG = get_ui_catalog()
+
+# Mark a static string for build_ui_catalog.py without translating it
+def N_(text):
+    return text
+
+@profiled('translate')
 def translate_text(text, dest_lang='en', src_lang='auto'):
-    try:
-        if not text or text.strip() == "":
-            return text
-        if dest_lang == 'en' and src_lang == 'en':
-            return text
-        translation = translator.translate(text, dest=dest_lang, src=src_lang)
-        return translation.text
-    except Exception as e:
+    if not text or text.strip() == "":
         return text
+    if dest_lang == src_lang:
+        return text
+    if src_lang == 'en':
+        catalog_text = UI_CATALOG.get(dest_lang, {}).get(text)
+        if catalog_text is not None:
+            return catalog_text
+    return translation_cache.translate(text, dest_lang, src_lang)
 
 def translate_to_english(text, src_lang='auto'):
     return translate_text(text, 'en', src_lang)
@@ -286,39 +315,80 @@ def translate_to_english(text, src_lang='auto'):
 def translate_from_english(text, dest_lang):
     return translate_text(text, dest_lang, 'en')
 
+# Batch-translate a page's labels; misses go to the translator in a single request
+@profiled('translate')
+def translate_many_from_english(texts, dest_lang):
+    if dest_lang == 'en':
+        return list(texts)
+    catalog = UI_CATALOG.get(dest_lang, {})
+    missing = [text for text in texts if text not in catalog]
+    translated = dict(zip(missing, translation_cache.translate_many(missing, dest_lang, 'en'))) if missing else {}
+    return [catalog[text] if text in catalog else translated[text] for text in texts]
+
+# Whether text has a real translation, rather than the English fallback used when the translator fails
+def is_translated(text, dest_lang):
+    return dest_lang == 'en' or text in UI_CATALOG.get(dest_lang, {}) or \
+        translation_cache.get(text, dest_lang, 'en') is not None
+
+# {label: translation} for a fragment, and whether every label really was translated;
+# a fragment holding English fallbacks is not kept, so it is retried on the next rerun
+def fragment_labels(labels, dest_lang):
+    texts = translate_many_from_english(labels, dest_lang)
+    return dict(zip(labels, texts)), all(is_translated(text, dest_lang) for text in labels)
+
 # Authentication functions
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+# bcrypt runs on a bounded pool; EDUGAMIFY_SESSION_SECRET overrides the session-token key kept in the database
+@st.cache_resource
+def get_authenticator():
+    return Authenticator(db, secret=os.getenv('EDUGAMIFY_SESSION_SECRET'))
+
+authenticator = get_authenticator()
 
-def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+def client_address():
+    return getattr(st.context, 'ip_address', None)
 
+@profiled('auth')
 def create_user(username, password, name, grade, school, language):
-    c = conn.cursor()
+    hashed_pw = authenticator.hash_password(password)
     try:
-        hashed_pw = hash_password(password)
-        c.execute("INSERT INTO users (username, password, name, grade, school, language) VALUES (?, ?, ?, ?, ?, ?)",
-                  (username, hashed_pw, name, grade, school, language))
-        conn.commit()
-        user_id = c.lastrowid
-        c.execute("INSERT INTO gamification (user_id, badge_name, badge_description) VALUES (?, ?, ?)",
-                 (user_id, "Starter", "Welcome to EduGamify! You've taken your first step in learning."))
-        conn.commit()
+        with db.transaction() as c:
+            c.execute("INSERT INTO users (username, password, name, grade, school, language) VALUES (?, ?, ?, ?, ?, ?)",
+                      (username, hashed_pw, name, grade, school, language))
+            user_id = c.lastrowid
+            c.execute("INSERT INTO gamification (user_id, badge_name, badge_description) VALUES (?, ?, ?)",
+                     (user_id, "Starter", "Welcome to EduGamify! You've taken your first step in learning."))
         return True
     except sqlite3.IntegrityError:
         return False
 
+# Returns auth.LoginResult(status, user_row)
+@profiled('auth')
 def verify_user(username, password):
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = c.fetchone()
-    if user and check_password(password, user[2]):
-        return user
-    return None
+    return authenticator.login(username, password, client_address())
+
+# The session token in the URL lets a reconnect or a new Streamlit session skip the
+# password check. It lasts an hour and works once: restoring replaces it, logout revokes it
+def start_session(user, token=None):
+    st.session_state.user = {
+        'id': user[0], 'username': user[1], 'name': user[3], 'grade': user[4], 'school': user[5],
+        'language': user[6], 'avatar': user[7], 'points': user[8]
+    }
+    st.query_params['session'] = token or authenticator.issue_token(user)
+
+@profiled('auth')
+def restore_session():
+    token = st.query_params.get('session')
+    restored = authenticator.redeem_token(token) if token else None
+    if restored is None:
+        if token:
+            del st.query_params['session']
+        return False
+    start_session(*restored)
+    return True
 
 # Chat functions
-def get_gemini_response(prompt, user_context):
-    full_prompt = f"""
+def build_tutor_prompt(prompt, user_context):
+    return f"""
     You are an AI tutor named "EduBot" for rural students in grades 6-12.
     The student is in grade {user_context['grade']} and studying at {user_context['school']}.
     The student's preferred language is {user_context['language']}.
@@ -334,12 +404,54 @@ def get_gemini_response(prompt, user_context):
     Provide a helpful, engaging response that addresses the student's question while making learning fun.
     If relevant, suggest a gamified way to practice this concept.
     """
+
+# Requests that share this key (the response cache's) share one upstream call
+def llm_key(prompt, user_context, subject):
+    return ResponseCache.make_key(normalize_prompt(prompt), user_context['grade'], subject)
+
+def tutor_call(prompt, user_context):
+    full_prompt = build_tutor_prompt(prompt, user_context)
+    model = get_model()
+    chunks = lambda: (chunk.text for chunk in model.generate_content(full_prompt, stream=True))
+    return lambda: breakers['llm'].stream(chunks)
+
+TUTOR_UNAVAILABLE = "The AI tutor can't be reached right now. Please try again in a minute."
+
+# Whole answer at once; queued behind students waiting on the chat page
+@profiled('llm')
+def get_gemini_response(prompt, user_context, subject='General', priority=BACKGROUND):
+    cached = response_cache.get(prompt, user_context['grade'], subject)
+    if cached is not None:
+        return cached
+    if breakers['llm'].rejecting():
+        return TUTOR_UNAVAILABLE
     try:
-        response = model.generate_content(full_prompt)
-        return response.text
+        return llm_gateway.generate(llm_key(prompt, user_context, subject), tutor_call(prompt, user_context),
+                                    context=(prompt, user_context['grade'], subject), priority=priority)
+    except CircuitOpen:
+        return TUTOR_UNAVAILABLE
     except Exception as e:
         return f"I'm having trouble responding right now. Please try again later. Error: {str(e)}"
 
+# Yields answer text as the model produces it; the gateway caches the full answer once the stream completes
+def stream_gemini_response(prompt, user_context, subject='General'):
+    cached = response_cache.get(prompt, user_context['grade'], subject)
+    if cached is not None:
+        yield cached
+        return
+    if breakers['llm'].rejecting():
+        yield TUTOR_UNAVAILABLE
+        return
+    try:
+        # Includes the time the page spends rendering between chunks
+        with profiler.span('llm.stream_gemini_response'):
+            yield from llm_gateway.stream(llm_key(prompt, user_context, subject), tutor_call(prompt, user_context),
+                                          context=(prompt, user_context['grade'], subject), priority=INTERACTIVE)
+    except CircuitOpen:
+        yield TUTOR_UNAVAILABLE
+    except Exception as e:
+        yield f"I'm having trouble responding right now. Please try again later. Error: {str(e)}"
+
 def analyze_sentiment(text):
     positive_words = ['good', 'great', 'awesome', 'excellent', 'happy', 'thanks', 'thank you', 'helpful', 'love', 'like']
     negative_words = ['bad', 'terrible', 'hate', 'difficult', 'hard', 'confused', 'problem', 'issue', 'don\'t understand']
@@ -355,266 +467,254 @@ def analyze_sentiment(text):
     else:
         return "neutral"
 
-def save_chat(user_id, message, response, subject):
-    sentiment = analyze_sentiment(message)
-    c = conn.cursor()
-    c.execute("INSERT INTO chat_history (user_id, message, response, subject, sentiment) VALUES (?, ?, ?, ?, ?)",
-              (user_id, message, response, subject, sentiment))
-    c.execute("UPDATE users SET points = points + 5 WHERE id = ?", (user_id,))
-    check_badge_achievements(user_id)
-    conn.commit()
+# Learning events are queued and committed in batches by the write-behind writer;
+# the write_* handlers run on its cursor and return the badges the event unlocked.
+# message is stored as typed and response in English, alongside their renderings
+# in the student's language so history is never translated again
+@profiled('db')
+def save_chat(user_id, message, response, subject, language='English', message_english=None, response_translated=None):
+    writer.submit('chat', user_id, points=5, message=message, response=response, subject=subject, language=language,
+                  message_english=message_english, response_translated=response_translated)
+
+def write_chat(c, user_id, points, message, response, subject, language, message_english, response_translated):
+    sentiment = analyze_sentiment(message_english or message)
+    c.execute("INSERT INTO chat_history (user_id, message, response, subject, sentiment, language, message_english, response_translated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+              (user_id, message, response, subject, sentiment, language, message_english, response_translated))
+    return record_event(c, user_id, points=points)
 
+@profiled('db')
 def get_chat_history(user_id):
-    c = conn.cursor()
-    c.execute("SELECT message, response, timestamp, subject FROM chat_history WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10", (user_id,))
-    return c.fetchall()
+    return db.query("SELECT message, response, timestamp, subject, language, message_english FROM chat_history WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10", (user_id,))
 
 # Analytics functions
+@profiled('db')
 def update_analytics(user_id, subject, time_spent=1, problems_solved=1):
-    c = conn.cursor()
+    writer.submit('analytics', user_id, points=problems_solved * 10, subject=subject, time_spent=time_spent,
+                  problems_solved=problems_solved)
+
+def write_analytics(c, user_id, points, subject, time_spent, problems_solved):
+    record_analytics(c, user_id, subject, time_spent, problems_solved)
+    return record_event(c, user_id, points=points, problems_solved=problems_solved, subject=subject)
+
+# Runs inside the caller's transaction
+def record_analytics(c, user_id, subject, time_spent, problems_solved):
     c.execute("INSERT INTO analytics (user_id, subject, time_spent, problems_solved) VALUES (?, ?, ?, ?)",
               (user_id, subject, time_spent, problems_solved))
-    c.execute("UPDATE users SET points = points + ? WHERE id = ?", (problems_solved * 10, user_id))
-    check_badge_achievements(user_id)
-    conn.commit()
+    c.execute('''INSERT INTO analytics_daily (user_id, subject, day, time_spent, problems_solved)
+                 VALUES (?, ?, date('now'), ?, ?)
+                 ON CONFLICT (user_id, subject, day) DO UPDATE SET
+                     time_spent = time_spent + excluded.time_spent,
+                     problems_solved = problems_solved + excluded.problems_solved''',
+              (user_id, subject, time_spent, problems_solved))
 
+# Dashboard reads go to the analytics_daily rollup maintained by record_analytics
+@profiled('db')
 def get_analytics(user_id):
-    c = conn.cursor()
-    c.execute("SELECT subject, SUM(time_spent) as total_time, SUM(problems_solved) as total_problems FROM analytics WHERE user_id = ? GROUP BY subject", (user_id,))
-    return c.fetchall()
+    return db.query("SELECT subject, SUM(time_spent) as total_time, SUM(problems_solved) as total_problems FROM analytics_daily WHERE user_id = ? GROUP BY subject", (user_id,))
+
+@profiled('db')
+def get_analytics_timeseries(user_id, days=30):
+    return db.query("SELECT day, SUM(time_spent), SUM(problems_solved) FROM analytics_daily WHERE user_id = ? AND day >= date('now', ?) GROUP BY day ORDER BY day",
+                    (user_id, f"-{int(days)} days"))
 
 # Gamification functions
-def check_badge_achievements(user_id):
-    c = conn.cursor()
-    c.execute("SELECT points FROM users WHERE id = ?", (user_id,))
-    points = c.fetchone()[0]
-    c.execute("SELECT COUNT(DISTINCT subject) FROM analytics WHERE user_id = ?", (user_id,))
-    subjects_covered = c.fetchone()[0]
-    c.execute("SELECT SUM(problems_solved) FROM analytics WHERE user_id = ?", (user_id,))
-    problems_solved = c.fetchone()[0] or 0
-    c.execute("SELECT COUNT(*) FROM game_scores WHERE user_id = ?", (user_id,))
-    games_played = c.fetchone()[0]
-    
-    badges = [
-        ("Quick Learner", "Earned 50 points", points >= 50 and points < 100),
-        ("Knowledge Seeker", "Earned 100 points", points >= 100),
-        ("Math Whiz", "Solved 10 math problems", problems_solved >= 10),
-        ("Science Explorer", "Solved 10 science problems", problems_solved >= 10),
-        ("Multitalented", "Studied 3 different subjects", subjects_covered >= 3),
-        ("Game Master", "Played 5 educational games", games_played >= 5),
-    ]
-    
-    new_badge_earned = False
-    for badge_name, badge_desc, condition in badges:
-        if condition:
-            c.execute("SELECT * FROM gamification WHERE user_id = ? AND badge_name = ?", (user_id, badge_name))
-            if not c.fetchone():
-                c.execute("INSERT INTO gamification (user_id, badge_name, badge_description) VALUES (?, ?, ?)",
-                         (user_id, badge_name, badge_desc))
-                conn.commit()
-                new_badge_earned = True
-    
-    if new_badge_earned:
+# Badges are awarded by badges.record_event inside the write transaction and
+# celebrated on the student's next page view after it commits
+def celebrate_badges(new_badges):
+    if new_badges:
         st.balloons()
 
+# Includes points from the student's own events that are still queued for writing
+@profiled('db')
+def get_user_points(user_id):
+    return writer.points(user_id)
+
+@profiled('db')
 def get_badges(user_id):
-    c = conn.cursor()
-    c.execute("SELECT badge_name, badge_description, earned_date FROM gamification WHERE user_id = ? ORDER BY earned_date DESC", (user_id,))
-    return c.fetchall()
+    return db.query("SELECT badge_name, badge_description, earned_date FROM gamification WHERE user_id = ? ORDER BY earned_date DESC", (user_id,))
+
+# Rows of (name, grade, school, points); scope 'school'/'grade' is relative to user_id
+@profiled('db')
+def get_leaderboard(scope='global', user_id=None, n=10):
+    return leaderboard.top(n, scope, user_id)
 
-def get_leaderboard():
-    c = conn.cursor()
-    c.execute("SELECT name, grade, school, points FROM users ORDER BY points DESC LIMIT 10")
-    return c.fetchall()
+@profiled('db')
+def get_rank(user_id, scope='global'):
+    return leaderboard.rank(user_id, scope)
 
 # Game functions
+@profiled('db')
 def save_game_score(user_id, game_name, score, subject):
-    c = conn.cursor()
+    writer.submit('game_score', user_id, points=score // 10 + 10, game_name=game_name, score=score, subject=subject)
+
+def write_game_score(c, user_id, points, game_name, score, subject):
     c.execute("INSERT INTO game_scores (user_id, game_name, score, subject) VALUES (?, ?, ?, ?)",
               (user_id, game_name, score, subject))
-    c.execute("UPDATE users SET points = points + ? WHERE id = ?", (score // 10, user_id))
-    update_analytics(user_id, subject, time_spent=5, problems_solved=1)
-    check_badge_achievements(user_id)
-    conn.commit()
+    record_analytics(c, user_id, subject, time_spent=5, problems_solved=1)
+    # One counter update and one badge evaluation for the score and its analytics row
+    return record_event(c, user_id, points=points, problems_solved=1, games_played=1, subject=subject)
+
+# Committed events move the leaderboard
+def on_event_committed(user_id, points):
+    leaderboard.add_points(user_id, points)
+
+# Single writer thread per process; set EDUGAMIFY_SPOOL to a file path to keep queued events across crashes
+@st.cache_resource
+def get_write_behind():
+    return WriteBehind(db, {'chat': write_chat, 'analytics': write_analytics, 'game_score': write_game_score},
+                       on_commit=on_event_committed, spool_path=os.getenv('EDUGAMIFY_SPOOL'))
 
+writer = get_write_behind()
+
+# Browser-side games deal from a signed seed and are scored by replaying their moves here
+@st.cache_resource
+def get_arcade():
+    return Arcade(db)
+
+arcade = get_arcade()
+
+@st.cache_resource
+def arcade_component(game):
+    import streamlit.components.v1 as components
+    return components.declare_component(game, path=os.path.join(COMPONENTS_DIR, game))
+
+# Component stats (cache hits, queue depths) join the profiler's snapshots; set
+# EDUGAMIFY_METRICS_PATH to also rewrite them there as Prometheus text
+@st.cache_resource
+def start_metrics_export():
+    sources = [('io', io_loop), ('translation_cache', translation_cache), ('response_cache', response_cache),
+               ('fragments', fragments), ('write_behind', writer), ('auth', authenticator), ('llm_gateway', llm_gateway),
+               ('arcade', arcade)]
+    sources += [(f'{backend}_breaker', breaker) for backend, breaker in breakers.items()]
+    for name, source in sources:
+        profiler.add_source(name, source.stats)
+    path = os.getenv('EDUGAMIFY_METRICS_PATH')
+    if path:
+        profiler.start_export(path)
+    return path
+
+metrics_path = start_metrics_export()
+
+@profiled('db')
 def get_game_scores(user_id):
-    c = conn.cursor()
-    c.execute("SELECT game_name, score, timestamp FROM game_scores WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10", (user_id,))
-    return c.fetchall()
-
-def generate_math_questions():
-    questions = []
-    if st.session_state.user['grade'] <= 8:
-        questions = [
-            {"question": "What is 15 + 27?", "options": ["42", "32", "52", "37"], "answer": "42"},
-            {"question": "If a = 5 and b = 3, what is a² + b²?", "options": ["34", "64", "16", "25"], "answer": "34"},
-        ]
-    else:
-        questions = [
-            {"question": "What is the value of sin(90°)?", "options": ["1", "0", "0.5", "√2/2"], "answer": "1"},
-            {"question": "If f(x) = x² + 3x - 4, what is f(2)?", "options": ["6", "2", "10", "8"], "answer": "6"},
-        ]
-    return questions
-
-def math_quiz_game():
-    st.markdown("<h3 class='sub-header'>Math Quiz Challenge</h3>", unsafe_allow_html=True)
-    if 'math_score' not in st.session_state:
-        st.session_state.math_score = 0
-        st.session_state.math_question = 0
-        st.session_state.math_questions = generate_math_questions()
-        st.session_state.math_correct = None
-    if st.session_state.math_question < len(st.session_state.math_questions):
-        question_data = st.session_state.math_questions[st.session_state.math_question]
-        user_lang = st.session_state.user['language']
-        question = translate_from_english(question_data['question'], LANGUAGE_MAPPING[user_lang])
-        options = [translate_from_english(opt, LANGUAGE_MAPPING[user_lang]) for opt in question_data['options']]
-        answer = translate_from_english(question_data['answer'], LANGUAGE_MAPPING[user_lang])
-        st.markdown(f"**Question {st.session_state.math_question + 1}:** {question}")
-        cols = st.columns(2)
-        for i, option in enumerate(options):
-            with cols[i % 2]:
-                if st.button(option, key=f"math_opt_{i}"):
-                    if option == answer:
-                        st.session_state.math_score += 10
-                        st.session_state.math_correct = True
-                    else:
-                        st.session_state.math_correct = False
-                    st.session_state.math_question += 1
-                    st.rerun()
-        if st.session_state.math_correct is not None:
-            if st.session_state.math_correct:
-                st.success(translate_from_english("Correct! 🎉", LANGUAGE_MAPPING[user_lang]))
-            else:
-                st.error(translate_from_english(f"Wrong! The correct answer is {answer}", LANGUAGE_MAPPING[user_lang]))
-    else:
-        st.markdown(f"### {translate_from_english('Quiz Complete!', LANGUAGE_MAPPING[user_lang])}")
-        st.markdown(f"### {translate_from_english('Your score:', LANGUAGE_MAPPING[user_lang])} {st.session_state.math_score}/{len(st.session_state.math_questions) * 10}")
-        if st.button(translate_from_english("Play Again", LANGUAGE_MAPPING[user_lang])):
-            st.session_state.math_score = 0
-            st.session_state.math_question = 0
-            st.session_state.math_questions = generate_math_questions()
-            st.session_state.math_correct = None
-            st.rerun()
-        if st.button(translate_from_english("Save Score", LANGUAGE_MAPPING[user_lang])):
-            save_game_score(st.session_state.user['id'], "Math Quiz", st.session_state.math_score, "Math")
-            st.success(translate_from_english("Score saved! 🎯", LANGUAGE_MAPPING[user_lang]))
-            st.session_state.math_score = 0
-            st.session_state.math_question = 0
-            st.session_state.math_questions = generate_math_questions()
-            st.session_state.math_correct = None
-            st.rerun()
+    return db.query("SELECT game_name, score, timestamp FROM game_scores WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10", (user_id,))
 
-def generate_science_questions():
-    questions = []
-    if st.session_state.user['grade'] <= 8:
-        questions = [
-            {"question": "Which planet is known as the Red Planet?", "options": ["Mars", "Venus", "Jupiter", "Saturn"], "answer": "Mars"},
-            {"question": "What is the process by which plants make their own food?", "options": ["Photosynthesis", "Respiration"], "answer": "Photosynthesis"},
-        ]
-    else:
-        questions = [
-            {"question": "What is the chemical symbol for gold?", "options": ["Au", "Ag", "Fe", "Go"], "answer": "Au"},
-            {"question": "Which subatomic particle has a negative charge?", "options": ["Electron", "Proton", "Neutron", "Photon"], "answer": "Electron"},
-        ]
-    return questions
-
-def science_quiz_game():
-    st.markdown("<h3 class='sub-header'>Science Quiz Challenge</h3>", unsafe_allow_html=True)
-    if 'science_score' not in st.session_state:
-        st.session_state.science_score = 0
-        st.session_state.science_question = 0
-        st.session_state.science_questions = generate_science_questions()
-        st.session_state.science_correct = None
-    if st.session_state.science_question < len(st.session_state.science_questions):
-        question_data = st.session_state.science_questions[st.session_state.science_question]
-        user_lang = st.session_state.user['language']
-        question = translate_from_english(question_data['question'], LANGUAGE_MAPPING[user_lang])
-        options = [translate_from_english(opt, LANGUAGE_MAPPING[user_lang]) for opt in question_data['options']]
-        answer = translate_from_english(question_data['answer'], LANGUAGE_MAPPING[user_lang])
-        st.markdown(f"**Question {st.session_state.science_question + 1}:** {question}")
+# Quiz questions come from the question bank; the session keeps only the sampled ids
+@st.cache_resource
+def get_question_bank():
+    return QuestionBank(db, translate_many=translate_many_from_english, is_translated=is_translated)
+
+question_bank = get_question_bank()
+
+# Ratings are cached per process and written back periodically
+@st.cache_resource
+def get_skill_model():
+    return SkillModel(db)
+
+skill_model = get_skill_model()
+
+QUIZ_LABELS = ["Correct! 🎉", "Wrong! The correct answer is", "Quiz Complete!", "Your score:", "Play Again", "Save Score",
+               "Score saved! 🎯", "No questions are available for your grade yet."]
+
+def new_quiz(subject):
+    return {'ids': [], 'index': 0, 'score': 0, 'correct': None, 'last_answer': None}
+
+# Next question at the difficulty the student's rating calls for; None when the quiz is over
+def next_question_id(subject, asked):
+    if len(asked) >= QUIZ_LENGTH:
+        return None
+    user = st.session_state.user
+    counts = question_bank.bucket_counts(subject, user['grade'])
+    difficulty = skill_model.choose_difficulty(user['id'], subject, [d for d, n in counts.items() if n])
+    if difficulty is None:
+        return None
+    ids = question_bank.sample(subject, user['grade'], k=1, difficulty=difficulty, exclude=asked)
+    # The chosen bucket may be used up; any unseen question beats ending early
+    ids = ids or question_bank.sample(subject, user['grade'], k=1, exclude=asked)
+    return ids[0] if ids else None
+
+def quiz_game(subject):
+    st.markdown(f"<h3 class='sub-header'>{subject} Quiz Challenge</h3>", unsafe_allow_html=True)
+    user_lang = st.session_state.user['language']
+    lang = LANGUAGE_MAPPING[user_lang]
+    translate_many_from_english(QUIZ_LABELS, lang)
+    key = f"quiz_{subject}"
+    if key not in st.session_state:
+        st.session_state[key] = new_quiz(subject)
+    quiz = st.session_state[key]
+    if quiz['index'] == len(quiz['ids']):
+        question_id = next_question_id(subject, quiz['ids'])
+        if question_id is not None:
+            quiz['ids'].append(question_id)
+    if not quiz['ids']:
+        st.info(translate_from_english("No questions are available for your grade yet.", lang))
+        return
+    if quiz['index'] < len(quiz['ids']):
+        question = question_bank.get(quiz['ids'][quiz['index']], lang)
+        st.markdown(f"**Question {quiz['index'] + 1}:** {question.question}")
         cols = st.columns(2)
-        for i, option in enumerate(options):
+        for i, option in enumerate(question.options):
             with cols[i % 2]:
-                if st.button(option, key=f"science_opt_{i}"):
-                    if option == answer:
-                        st.session_state.science_score += 10
-                        st.session_state.science_correct = True
-                    else:
-                        st.session_state.science_correct = False
-                    st.session_state.science_question += 1
+                if st.button(option, key=f"{key}_opt_{i}"):
+                    # Compared by position, so translated options can never mismatch the answer
+                    quiz['correct'] = i == question.answer_index
+                    skill_model.record(st.session_state.user['id'], subject, question.difficulty, 1.0 if quiz['correct'] else 0.0)
+                    if quiz['correct']:
+                        quiz['score'] += 10
+                    quiz['last_answer'] = question.options[question.answer_index]
+                    quiz['index'] += 1
                     st.rerun()
-        if st.session_state.science_correct is not None:
-            if st.session_state.science_correct:
-                st.success(translate_from_english("Correct! 🎉", LANGUAGE_MAPPING[user_lang]))
+        if quiz['correct'] is not None:
+            if quiz['correct']:
+                st.success(translate_from_english("Correct! 🎉", lang))
             else:
-                st.error(translate_from_english(f"Wrong! The correct answer is {answer}", LANGUAGE_MAPPING[user_lang]))
+                st.error(f"{translate_from_english('Wrong! The correct answer is', lang)} {quiz['last_answer']}")
     else:
-        st.markdown(f"### {translate_from_english('Quiz Complete!', LANGUAGE_MAPPING[user_lang])}")
-        st.markdown(f"### {translate_from_english('Your score:', LANGUAGE_MAPPING[user_lang])} {st.session_state.science_score}/{len(st.session_state.science_questions) * 10}")
-        if st.button(translate_from_english("Play Again", LANGUAGE_MAPPING[user_lang])):
-            st.session_state.science_score = 0
-            st.session_state.science_question = 0
-            st.session_state.science_questions = generate_science_questions()
-            st.session_state.science_correct = None
+        st.markdown(f"### {translate_from_english('Quiz Complete!', lang)}")
+        st.markdown(f"### {translate_from_english('Your score:', lang)} {quiz['score']}/{len(quiz['ids']) * 10}")
+        if st.button(translate_from_english("Play Again", lang)):
+            st.session_state[key] = new_quiz(subject)
             st.rerun()
-        if st.button(translate_from_english("Save Score", LANGUAGE_MAPPING[user_lang])):
-            save_game_score(st.session_state.user['id'], "Science Quiz", st.session_state.science_score, "Science")
-            st.success(translate_from_english("Score saved! 🎯", LANGUAGE_MAPPING[user_lang]))
-            st.session_state.science_score = 0
-            st.session_state.science_question = 0
-            st.session_state.science_questions = generate_science_questions()
-            st.session_state.science_correct = None
+        if st.button(translate_from_english("Save Score", lang)):
+            save_game_score(st.session_state.user['id'], f"{subject} Quiz", quiz['score'], subject)
+            st.success(translate_from_english("Score saved! 🎯", lang))
+            st.session_state[key] = new_quiz(subject)
             st.rerun()
 
+MEMORY_LABELS = ["Moves", "Matches", "🎉 Congratulations! You've matched all pairs!", "Your score:", "Score saved! 🎯",
+                 "Play Again", "This game could not be checked, so the score was not saved."]
+
+# Plays in the browser (components/memory_match); the script runs again only when the game is over
 def memory_match_game():
     st.markdown("<h3 class='sub-header'>STEM Memory Match</h3>", unsafe_allow_html=True)
-    if 'memory_cards' not in st.session_state:
-        symbols = ['π', '√', '∞', 'α', 'β', '∫', '∑', 'Δ']
-        st.session_state.memory_cards = symbols + symbols
-        random.shuffle(st.session_state.memory_cards)
-        st.session_state.memory_flipped = [False] * 16
-        st.session_state.memory_matched = [False] * 16
-        st.session_state.memory_first_selection = None
-        st.session_state.memory_moves = 0
-        st.session_state.memory_matches = 0
-    user_lang = st.session_state.user['language']
-    moves_text = translate_from_english("Moves", LANGUAGE_MAPPING[user_lang])
-    matches_text = translate_from_english("Matches", LANGUAGE_MAPPING[user_lang])
-    st.markdown(f"**{moves_text}:** {st.session_state.memory_moves} | **{matches_text}:** {st.session_state.memory_matches}/8")
-    cols = st.columns(4)
-    for i in range(16):
-        with cols[i % 4]:
-            if st.session_state.memory_matched[i]:
-                st.button("✓", key=f"mem_{i}")
-            elif st.session_state.memory_flipped[i]:
-                st.button(st.session_state.memory_cards[i], key=f"mem_{i}")
-            else:
-                if st.button("?", key=f"mem_{i}"):
-                    if st.session_state.memory_first_selection is None:
-                        st.session_state.memory_first_selection = i
-                        st.session_state.memory_flipped[i] = True
-                    else:
-                        st.session_state.memory_flipped[i] = True
-                        st.session_state.memory_moves += 1
-                        if st.session_state.memory_cards[st.session_state.memory_first_selection] == st.session_state.memory_cards[i]:
-                            st.session_state.memory_matched[st.session_state.memory_first_selection] = True
-                            st.session_state.memory_matched[i] = True
-                            st.session_state.memory_matches += 1
-                        st.session_state.memory_first_selection = None
-                    st.rerun()
-    if st.session_state.memory_matches == 8:
-        st.success(translate_from_english("🎉 Congratulations! You've matched all pairs!", LANGUAGE_MAPPING[user_lang]))
-        score = 100 - (st.session_state.memory_moves - 8) * 5
-        score = max(score, 10)
-        st.markdown(f"**{translate_from_english('Your score:', LANGUAGE_MAPPING[user_lang])} {score}**")
-        if st.button(translate_from_english("Save Score", LANGUAGE_MAPPING[user_lang])):
-            save_game_score(st.session_state.user['id'], "Memory Match", score, "General")
-            st.success(translate_from_english("Score saved! 🎯", LANGUAGE_MAPPING[user_lang]))
-            st.session_state.memory_cards = None
-            st.rerun()
+    user_id = st.session_state.user['id']
+    labels = dict(zip(MEMORY_LABELS, translate_many_from_english(MEMORY_LABELS, LANGUAGE_MAPPING[st.session_state.user['language']])))
+    if st.session_state.get('memory_game') is None:
+        token, cards = arcade.new_game(user_id, 'memory_match')
+        st.session_state.memory_game = {'token': token, 'cards': cards, 'verdict': None}
+    game = st.session_state.memory_game
+    result = arcade_component('memory_match')(
+        cards=game['cards'], token=game['token'], key=f"memory_{game['token'][-16:]}", default=None,
+        labels={'moves': labels["Moves"], 'matches': labels["Matches"], 'done': labels["🎉 Congratulations! You've matched all pairs!"]})
+    if result and result.get('token') == game['token'] and game['verdict'] is None:
+        game['verdict'] = verdict = arcade.submit(user_id, result['token'], result.get('moves'))
+        if verdict.ok:
+            save_game_score(user_id, verdict.game.name, verdict.score, verdict.game.subject)
+            skill_model.record_game(user_id, verdict.game.subject, verdict.score, verdict.game.max_score)
+    verdict = game['verdict']
+    if verdict is None:
+        return
+    if verdict.ok:
+        st.markdown(f"**{labels['Your score:']} {verdict.score}**")
+        st.success(labels["Score saved! 🎯"])
+    else:
+        st.error(labels["This game could not be checked, so the score was not saved."])
+    if st.button(labels["Play Again"], key="memory_again"):
+        st.session_state.memory_game = None
+        st.rerun()
 
+@profiled('db')
 def get_offline_content(grade=None, subject=None, language='English'):
-    c = conn.cursor()
     query = "SELECT * FROM offline_content WHERE language = ?"
     params = [language]
     if grade:
@@ -623,44 +723,84 @@ def get_offline_content(grade=None, subject=None, language='English'):
     if subject and subject != 'All':
         query += " AND subject = ?"
         params.append(subject)
-    c.execute(query, params)
-    return c.fetchall()
+    return db.query(query, params)
 
+@profiled('db')
 def increment_download_count(content_id):
-    c = conn.cursor()
-    c.execute("UPDATE offline_content SET download_count = download_count + 1 WHERE id = ?", (content_id,))
-    conn.commit()
+    with db.transaction() as c:
+        c.execute("UPDATE offline_content SET download_count = download_count + 1 WHERE id = ?", (content_id,))
+
+# Public address of `python -m bundles serve`, if one runs next to the app
+BUNDLE_URL = os.getenv('EDUGAMIFY_BUNDLE_URL', '').rstrip('/')
+
+# Newest packaged bundle of each (grade, subject) group for the filters (see bundles.py)
+@profiled('db')
+def get_content_bundles(grade=None, subject=None, language='English'):
+    query = '''SELECT grade, subject, manifest_id, files, size, stored_size FROM content_bundles b
+               WHERE language = ? AND id = (SELECT MAX(id) FROM content_bundles
+                                            WHERE grade = b.grade AND subject = b.subject AND language = b.language)'''
+    params = [language]
+    if grade:
+        query += " AND grade = ?"
+        params.append(grade)
+    if subject and subject != 'All':
+        query += " AND subject = ?"
+        params.append(subject)
+    return db.query(query + " ORDER BY grade, subject", params)
+
+@profiled('db')
+def increment_bundle_downloads(grade, subject, language):
+    with db.transaction() as c:
+        c.execute('''UPDATE offline_content SET download_count = download_count + 1
+                     WHERE grade_level = ? AND subject = ? AND language = ?''', (grade, subject, language))
+
+@profiled('db')
+def search_offline_content(text, grade=None, subject=None, language='English', page=0):
+    return search_content(db, text, language=language, grade=grade, subject=subject, page=page)
+
+@profiled('db')
+def search_chat_history(user_id, text, page=0):
+    return search_chats(db, user_id, text, page=page)
+
+def read_bundle(manifest_id):
+    with open(bundle_path(BUNDLE_DIR, manifest_id), 'rb') as f:
+        return f.read()
 
 # Page functions
+@profiled('page')
 def login_page():
     st.markdown("<h1 class='main-header fade-in'>Shiksha Yatra</h1>", unsafe_allow_html=True)
     st.markdown("<h3 class='sub-header fade-in'>Login to Your Account</h3>", unsafe_allow_html=True)
-    if LOTTIE_WELCOME:
-        st_lottie(LOTTIE_WELCOME, height=200, key="login_anim")
+    lottie_welcome = load_lottie('welcome')
+    if lottie_welcome:
+        show_lottie(lottie_welcome, height=200, key="login_anim")
     with st.form("login_form"):
         username = st.text_input("Username")
         password = st.text_input("Password", type="password")
         submitted = st.form_submit_button("Login")
         if submitted:
-            user = verify_user(username, password)
-            if user:
-                st.session_state.user = {
-                    'id': user[0], 'username': user[1], 'name': user[3], 'grade': user[4], 'school': user[5],
-                    'language': user[6], 'avatar': user[7], 'points': user[8]
-                }
+            result = verify_user(username, password)
+            if result.status == OK:
+                start_session(result.user)
                 st.session_state.page = "dashboard"
                 st.rerun()
+            elif result.status == RATE_LIMITED:
+                st.error("Too many login attempts. Please wait a few minutes and try again.")
+            elif result.status == BUSY:
+                st.warning("Many students are logging in right now. Please try again in a moment.")
             else:
                 st.error("Invalid username or password")
     if st.button("Create New Account"):
         st.session_state.page = "register"
         st.rerun()
 
+@profiled('page')
 def register_page():
     st.markdown("<h1 class='main-header fade-in'>Shiksha Yatra</h1>", unsafe_allow_html=True)
     st.markdown("<h3 class='sub-header fade-in'>Create New Account</h3>", unsafe_allow_html=True)
-    if LOTTIE_WELCOME:
-        st_lottie(LOTTIE_WELCOME, height=200, key="register_anim")
+    lottie_welcome = load_lottie('welcome')
+    if lottie_welcome:
+        show_lottie(lottie_welcome, height=200, key="register_anim")
     with st.form("register_form"):
         name = st.text_input("Full Name")
         username = st.text_input("Username")
@@ -680,8 +820,18 @@ def register_page():
         st.session_state.page = "login"
         st.rerun()
 
+DASHBOARD_LABELS = [
+    "Total Learning Time", "Hours", "Problems Solved", "Count", "Subjects Covered", "EduPoints", "Points",
+    "Quick Actions", "📚 Study Now", "💬 Ask Tutor", "🎮 Play Games", "📥 Offline Content",
+    "Subject-wise Performance", "Time Spent per Subject", "Problems Solved per Subject", "Daily Activity (last 30 days)",
+    "No analytics data yet. Start studying to see your progress!", "Recent Activity",
+    "No recent activity. Start a conversation with your AI tutor!",
+]
+
+@profiled('page')
 def dashboard_page():
     user_lang = st.session_state.user['language']
+    translate_many_from_english(DASHBOARD_LABELS, LANGUAGE_MAPPING[user_lang])
     welcome_text = translate_from_english(f"Welcome, {st.session_state.user['name']}!", LANGUAGE_MAPPING[user_lang])
     st.markdown(f"<h1 class='main-header fade-in'>{welcome_text}</h1>", unsafe_allow_html=True)
     analytics = get_analytics(st.session_state.user['id'])
@@ -708,7 +858,7 @@ def dashboard_page():
     with col4:
         st.markdown("<div class='card fade-in'>", unsafe_allow_html=True)
         st.subheader(translate_from_english("EduPoints", LANGUAGE_MAPPING[user_lang]))
-        st.metric(label=translate_from_english("Points", LANGUAGE_MAPPING[user_lang]), value=st.session_state.user['points'])
+        st.metric(label=translate_from_english("Points", LANGUAGE_MAPPING[user_lang]), value=get_user_points(st.session_state.user['id']))
         st.markdown("</div>", unsafe_allow_html=True)
     
     st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Quick Actions', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
@@ -732,58 +882,87 @@ def dashboard_page():
     
     st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Subject-wise Performance', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
     if analytics:
+        import pandas as pd
+        import plotly.express as px
         df = pd.DataFrame(analytics, columns=['Subject', 'Time Spent', 'Problems Solved'])
         col1, col2 = st.columns(2)
         with col1:
-            fig = px.pie(df, values='Time Spent', names='Subject', title=translate_from_english('Time Spent per Subject', LANGUAGE_MAPPING[user_lang]))
-            st.plotly_chart(fig, use_container_width=True)
+            with profiler.span('chart.subject_time'):
+                fig = px.pie(df, values='Time Spent', names='Subject', title=translate_from_english('Time Spent per Subject', LANGUAGE_MAPPING[user_lang]))
+                st.plotly_chart(fig, use_container_width=True)
         with col2:
-            fig = px.bar(df, x='Subject', y='Problems Solved', title=translate_from_english('Problems Solved per Subject', LANGUAGE_MAPPING[user_lang]))
-            st.plotly_chart(fig, use_container_width=True)
+            with profiler.span('chart.subject_problems'):
+                fig = px.bar(df, x='Subject', y='Problems Solved', title=translate_from_english('Problems Solved per Subject', LANGUAGE_MAPPING[user_lang]))
+                st.plotly_chart(fig, use_container_width=True)
+        daily = get_analytics_timeseries(st.session_state.user['id'])
+        if len(daily) > 1:
+            with profiler.span('chart.daily_activity'):
+                daily_df = pd.DataFrame(daily, columns=['Day', 'Time Spent', 'Problems Solved'])
+                fig = px.line(daily_df, x='Day', y=['Time Spent', 'Problems Solved'], markers=True, title=translate_from_english('Daily Activity (last 30 days)', LANGUAGE_MAPPING[user_lang]))
+                st.plotly_chart(fig, use_container_width=True)
     else:
         st.info(translate_from_english("No analytics data yet. Start studying to see your progress!", LANGUAGE_MAPPING[user_lang]))
     st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Recent Activity', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
     chat_history = get_chat_history(st.session_state.user['id'])
     if chat_history:
-        for message, response, timestamp, subject in chat_history:
-            if user_lang != 'English':
-                message_preview = translate_from_english(message[:100], LANGUAGE_MAPPING[user_lang])
-            else:
-                message_preview = message[:100]
+        # Messages are stored as the student typed them; only those from another language are re-rendered, together
+        stale = [i for i, row in enumerate(chat_history) if (row[4] or 'English') != user_lang and row[5]]
+        previews = [row[0][:100] for row in chat_history]
+        for i, text in zip(stale, translate_many_from_english([chat_history[i][5][:100] for i in stale], LANGUAGE_MAPPING[user_lang])):
+            previews[i] = text
+        for (message, response, timestamp, subject, language, message_english), message_preview in zip(chat_history, previews):
             st.markdown(f"<div class='card fade-in'><b>{timestamp.split()[0]}:</b> {message_preview}... <i>({subject})</i></div>", unsafe_allow_html=True)
     else:
         st.info(translate_from_english("No recent activity. Start a conversation with your AI tutor!", LANGUAGE_MAPPING[user_lang]))
 
+SUBJECTS_LABELS = [
+    "Study Subjects", "Choose a subject to study",
+    "Mathematics", "Science", "Technology", "Engineering", "English", "Social Studies",
+    "Study Mathematics", "Study Science", "Study Technology", "Study Engineering", "Study English",
+    "Study Social Studies",
+]
+
+SUBJECTS = [
+    {"name": "Mathematics", "icon": "🧮", "color": "#FF6B6B"},
+    {"name": "Science", "icon": "🔬", "color": "#4ECDC4"},
+    {"name": "Technology", "icon": "💻", "color": "#45B7D1"},
+    {"name": "Engineering", "icon": "⚙️", "color": "#FFBE0B"},
+    {"name": "English", "icon": "📚", "color": "#FF6B6B"},
+    {"name": "Social Studies", "icon": "🌍", "color": "#4ECDC4"},
+]
+
+# Header, cards and button labels depend only on the language
+def build_subjects_fragment(dest_lang):
+    labels, complete = fragment_labels(SUBJECTS_LABELS, dest_lang)
+    cards = [(f"""
+                <div class='card fade-in subject-card' style='border-top: 5px solid {subject["color"]}; text-align: center;'>
+                    <h2>{subject['icon']}</h2>
+                    <h3>{labels[subject['name']]}</h3>
+                </div>
+            """, labels[f"Study {subject['name']}"]) for subject in SUBJECTS]
+    return {
+        'header': f"<h1 class='main-header fade-in'>{labels['Study Subjects']}</h1>",
+        'subheader': f"<h3 class='sub-header fade-in'>{labels['Choose a subject to study']}</h3>",
+        'cards': cards,
+    }, complete
+
+@profiled('page')
 def subjects_page():
-    user_lang = st.session_state.user['language']
-    st.markdown(f"<h1 class='main-header fade-in'>{translate_from_english('Study Subjects', LANGUAGE_MAPPING[user_lang])}</h1>", unsafe_allow_html=True)
-    st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Choose a subject to study', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
-    
-    subjects = [
-        {"name": "Mathematics", "icon": "🧮", "color": "#FF6B6B"},
-        {"name": "Science", "icon": "🔬", "color": "#4ECDC4"},
-        {"name": "Technology", "icon": "💻", "color": "#45B7D1"},
-        {"name": "Engineering", "icon": "⚙️", "color": "#FFBE0B"},
-        {"name": "English", "icon": "📚", "color": "#FF6B6B"},
-        {"name": "Social Studies", "icon": "🌍", "color": "#4ECDC4"},
-    ]
+    dest_lang = LANGUAGE_MAPPING[st.session_state.user['language']]
+    fragment = fragments.get('subjects', dest_lang, lambda: build_subjects_fragment(dest_lang))
+    st.markdown(fragment['header'], unsafe_allow_html=True)
+    st.markdown(fragment['subheader'], unsafe_allow_html=True)
     
     cols = st.columns(3)
-    for idx, subject in enumerate(subjects):
+    for idx, (subject, (card, button_label)) in enumerate(zip(SUBJECTS, fragment['cards'])):
         with cols[idx % 3]:
-            subject_name = translate_from_english(subject['name'], LANGUAGE_MAPPING[user_lang])
-            st.markdown(f"""
-                <div class='card fade-in subject-card' style='border-top: 5px solid {subject["color"]}; text-align: center;'>
-                    <h2>{subject['icon']}</h2>
-                    <h3>{subject_name}</h3>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            if st.button(translate_from_english(f"Study {subject['name']}", LANGUAGE_MAPPING[user_lang]), key=f"subject_{idx}"):
+            st.markdown(card, unsafe_allow_html=True)
+            if st.button(button_label, key=f"subject_{idx}"):
                 st.session_state.current_subject = subject['name']
                 st.session_state.page = "chat"
                 st.rerun()
 
+@profiled('page')
 def chat_page():
     user_lang = st.session_state.user['language']
     subject = st.session_state.get('current_subject', 'General Help')
@@ -795,13 +974,19 @@ def chat_page():
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
     
-    for message, is_user, original_lang in st.session_state.chat_history:
-        if is_user:
-            display_message = message if original_lang == user_lang else translate_from_english(message, LANGUAGE_MAPPING[user_lang])
-            st.markdown(f"<div class='chat-message fade-in user'><b>{translate_from_english('You', LANGUAGE_MAPPING[user_lang])}:</b> {display_message}</div>", unsafe_allow_html=True)
+    # Each turn keeps its renderings per language, so a rerun only translates a turn
+    # the first time it is shown in a new language
+    unrendered = [turn for turn in st.session_state.chat_history if user_lang not in turn['rendered']]
+    if unrendered:
+        texts = translate_many_from_english([turn['english'] for turn in unrendered], LANGUAGE_MAPPING[user_lang])
+        for turn, text in zip(unrendered, texts):
+            turn['rendered'][user_lang] = text
+    for turn in st.session_state.chat_history:
+        rendered = turn['rendered']
+        if turn['role'] == 'user':
+            st.markdown(f"<div class='chat-message fade-in user'><b>{translate_from_english('You', LANGUAGE_MAPPING[user_lang])}:</b> {rendered[user_lang]}</div>", unsafe_allow_html=True)
         else:
-            display_message = translate_from_english(message, LANGUAGE_MAPPING[user_lang])
-            st.markdown(f"<div class='chat-message fade-in assistant'><b>EduBot:</b> {display_message}</div>", unsafe_allow_html=True)
+            st.markdown(f"<div class='chat-message fade-in assistant'><b>EduBot:</b> {rendered[user_lang]}</div>", unsafe_allow_html=True)
     
     subject = st.session_state.get('current_subject', 'General')
     chat_placeholder = translate_from_english("Type your question here...", LANGUAGE_MAPPING[user_lang])
@@ -809,70 +994,149 @@ def chat_page():
     
     if user_input:
         user_input_english = translate_to_english(user_input, LANGUAGE_MAPPING[user_lang])
-        st.session_state.chat_history.append((user_input, True, user_lang))
-        with st.spinner(translate_from_english("EduBot is thinking...", LANGUAGE_MAPPING[user_lang])):
-            response = get_gemini_response(user_input_english, st.session_state.user)
-        st.session_state.chat_history.append((response, False, 'English'))
-        save_chat(st.session_state.user['id'], user_input, response, subject)
+        st.session_state.chat_history.append({'role': 'user', 'english': user_input_english, 'rendered': {user_lang: user_input}})
+        st.markdown(f"<div class='chat-message fade-in user'><b>{translate_from_english('You', LANGUAGE_MAPPING[user_lang])}:</b> {user_input}</div>", unsafe_allow_html=True)
+        answer_box = st.empty()
+        answer_box.markdown(f"<div class='chat-message fade-in assistant'><b>EduBot:</b> {translate_from_english('EduBot is thinking...', LANGUAGE_MAPPING[user_lang])}</div>", unsafe_allow_html=True)
+        # Render tokens as they arrive; for other languages, finished sentences are translated behind the stream
+        dest_lang = LANGUAGE_MAPPING[user_lang]
+        translate = None if dest_lang == 'en' else lambda sentence: translate_from_english(sentence, dest_lang)
+        response = display_message = ""
+        for response, display_message in stream_translated(stream_gemini_response(user_input_english, st.session_state.user, subject),
+                                                           translate, io_loop.executor('translate')):
+            if display_message:
+                answer_box.markdown(f"<div class='chat-message fade-in assistant'><b>EduBot:</b> {display_message}</div>", unsafe_allow_html=True)
+        # Persist only once the stream has completed
+        st.session_state.chat_history.append({'role': 'assistant', 'english': response, 'rendered': {'English': response, user_lang: display_message}})
+        save_chat(st.session_state.user['id'], user_input, response, subject, language=user_lang,
+                  message_english=user_input_english, response_translated=display_message)
         update_analytics(st.session_state.user['id'], subject, time_spent=2, problems_solved=1)
         st.rerun()
     
+    with st.expander(translate_from_english("Search your past questions", LANGUAGE_MAPPING[user_lang])):
+        query = st.text_input(translate_from_english("Search", LANGUAGE_MAPPING[user_lang]), key="chat_search")
+        if query.strip():
+            results = search_chat_history(st.session_state.user['id'], query, page=search_page_number("chat_search_page", query))
+            for hit in results.hits:
+                st.markdown(f"<div class='card'><p><b>{html.escape(hit.message)}</b> <small>({hit.subject}, {hit.timestamp})</small></p><p>{search_snippet_html(hit.snippet)}</p></div>", unsafe_allow_html=True)
+            if not results.hits:
+                st.info(translate_from_english("Nothing found in your past questions.", LANGUAGE_MAPPING[user_lang]))
+            search_pager("chat_search_page", results, user_lang)
+    
     if st.button(translate_from_english("Back to Subjects", LANGUAGE_MAPPING[user_lang])):
         st.session_state.page = "subjects"
         st.rerun()
 
+GAMES_LABELS = [
+    "Educational Games", "Learn through fun games!", "Math Quiz", "Science Quiz", "Memory Match",
+    "Test your math skills with challenging questions", "Explore science concepts with fun quizzes",
+    "Match STEM symbols in this memory game", "Play Math Quiz", "Play Science Quiz", "Play Memory Match",
+    "Back to Games Menu", "Your Game Scores", "points", "No game scores yet. Play some games to earn points!",
+    "Back to Dashboard",
+]
+
+GAMES = [
+    {"name": "Math Quiz", "icon": "🧮", "description": "Test your math skills with challenging questions", "subject": "Math"},
+    {"name": "Science Quiz", "icon": "🔬", "description": "Explore science concepts with fun quizzes", "subject": "Science"},
+    {"name": "Memory Match", "icon": "🎯", "description": "Match STEM symbols in this memory game", "subject": "General"},
+]
+
+def build_games_fragment(dest_lang):
+    labels, complete = fragment_labels(GAMES_LABELS, dest_lang)
+    cards = [(f"""
+                <div class='card fade-in subject-card' style='text-align: center;'>
+                    <h2>{game['icon']}</h2>
+                    <h3>{labels[game['name']]}</h3>
+                    <p>{labels[game['description']]}</p>
+                </div>
+            """, labels[f"Play {game['name']}"]) for game in GAMES]
+    return {
+        'header': f"<h1 class='main-header fade-in'>{labels['Educational Games']}</h1>",
+        'subheader': f"<h3 class='sub-header fade-in'>{labels['Learn through fun games!']}</h3>",
+        'cards': cards,
+        'labels': labels,
+    }, complete
+
+# Built on every render, not cached: a cached copy could only be invalidated once the
+# write-behind commits, so the rerun right after "Save Score" would show the old list
+def build_game_scores_fragment(user_id, dest_lang):
+    game_scores = get_game_scores(user_id)
+    labels, complete = fragment_labels(list(dict.fromkeys(["points"] + [game_name for game_name, score, timestamp in game_scores])),
+                                       dest_lang)
+    return [f"<div class='card fade-in'><b>{labels[game_name]}:</b> {score} {labels['points']} <i>({timestamp.split()[0]})</i></div>"
+            for game_name, score, timestamp in game_scores], complete
+
+@profiled('page')
 def games_page():
-    user_lang = st.session_state.user['language']
-    st.markdown(f"<h1 class='main-header fade-in'>{translate_from_english('Educational Games', LANGUAGE_MAPPING[user_lang])}</h1>", unsafe_allow_html=True)
-    st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Learn through fun games!', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
-    
-    games = [
-        {"name": "Math Quiz", "icon": "🧮", "description": "Test your math skills with challenging questions", "subject": "Math"},
-        {"name": "Science Quiz", "icon": "🔬", "description": "Explore science concepts with fun quizzes", "subject": "Science"},
-        {"name": "Memory Match", "icon": "🎯", "description": "Match STEM symbols in this memory game", "subject": "General"},
-    ]
+    user_id = st.session_state.user['id']
+    dest_lang = LANGUAGE_MAPPING[st.session_state.user['language']]
+    fragment = fragments.get('games', dest_lang, lambda: build_games_fragment(dest_lang))
+    labels = fragment['labels']
+    st.markdown(fragment['header'], unsafe_allow_html=True)
+    st.markdown(fragment['subheader'], unsafe_allow_html=True)
     
     cols = st.columns(3)
-    for idx, game in enumerate(games):
+    for idx, (game, (card, button_label)) in enumerate(zip(GAMES, fragment['cards'])):
         with cols[idx]:
-            game_name = translate_from_english(game['name'], LANGUAGE_MAPPING[user_lang])
-            game_desc = translate_from_english(game['description'], LANGUAGE_MAPPING[user_lang])
-            st.markdown(f"""
-                <div class='card fade-in subject-card' style='text-align: center;'>
-                    <h2>{game['icon']}</h2>
-                    <h3>{game_name}</h3>
-                    <p>{game_desc}</p>
-                </div>
-            """, unsafe_allow_html=True)
-            if st.button(translate_from_english(f"Play {game['name']}", LANGUAGE_MAPPING[user_lang]), key=f"game_{idx}"):
+            st.markdown(card, unsafe_allow_html=True)
+            if st.button(button_label, key=f"game_{idx}"):
                 st.session_state.current_game = game['name']
                 st.rerun()
     
     if hasattr(st.session_state, 'current_game'):
-        game_name = translate_from_english(st.session_state.current_game, LANGUAGE_MAPPING[user_lang])
-        st.markdown(f"<h3 class='sub-header fade-in'>{game_name}</h3>", unsafe_allow_html=True)
+        st.markdown(f"<h3 class='sub-header fade-in'>{labels.get(st.session_state.current_game, st.session_state.current_game)}</h3>", unsafe_allow_html=True)
         if st.session_state.current_game == "Math Quiz":
-            math_quiz_game()
+            quiz_game("Math")
         elif st.session_state.current_game == "Science Quiz":
-            science_quiz_game()
+            quiz_game("Science")
         elif st.session_state.current_game == "Memory Match":
             memory_match_game()
-        if st.button(translate_from_english("Back to Games Menu", LANGUAGE_MAPPING[user_lang])):
+        if st.button(labels["Back to Games Menu"]):
             del st.session_state.current_game
             st.rerun()
     
-    st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Your Game Scores', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
-    game_scores = get_game_scores(st.session_state.user['id'])
-    if game_scores:
-        for game_name, score, timestamp in game_scores:
-            game_name_translated = translate_from_english(game_name, LANGUAGE_MAPPING[user_lang])
-            st.markdown(f"<div class='card fade-in'><b>{game_name_translated}:</b> {score} {translate_from_english('points', LANGUAGE_MAPPING[user_lang])} <i>({timestamp.split()[0]})</i></div>", unsafe_allow_html=True)
+    st.markdown(f"<h3 class='sub-header fade-in'>{labels['Your Game Scores']}</h3>", unsafe_allow_html=True)
+    score_cards, _ = build_game_scores_fragment(user_id, dest_lang)
+    if score_cards:
+        for card in score_cards:
+            st.markdown(card, unsafe_allow_html=True)
     else:
-        st.info(translate_from_english("No game scores yet. Play some games to earn points!", LANGUAGE_MAPPING[user_lang]))
-    if st.button(translate_from_english("Back to Dashboard", LANGUAGE_MAPPING[user_lang])):
+        st.info(labels["No game scores yet. Play some games to earn points!"])
+    if st.button(labels["Back to Dashboard"]):
         st.session_state.page = "dashboard"
         st.rerun()
 
+def offline_item_card(item, user_lang, snippet=None):
+    id, title, subject, content_type, content, grade_level, language, download_count = item
+    matched = f"<p>{search_snippet_html(snippet)}</p>" if snippet else ""
+    st.markdown(f"<div class='card fade-in'><h3>{title} ({subject})</h3>{matched}<p>{translate_from_english('Grade', LANGUAGE_MAPPING[user_lang])}: {grade_level} | {translate_from_english('Type', LANGUAGE_MAPPING[user_lang])}: {content_type} | {translate_from_english('Language', LANGUAGE_MAPPING[user_lang])}: {language} | {translate_from_english('Downloads', LANGUAGE_MAPPING[user_lang])}: {download_count}</p></div>", unsafe_allow_html=True)
+    download_text = translate_from_english(f"Download {title}", LANGUAGE_MAPPING[user_lang])
+    if st.button(download_text, key=f"download_{id}"):
+        increment_download_count(id)
+        st.success(translate_from_english(f"Downloading {title}. This content is now available offline!", LANGUAGE_MAPPING[user_lang]))
+
+def search_snippet_html(snippet):
+    return highlighted(html.escape(snippet), "<mark>", "</mark>")
+
+# Results page for a search box; back to the first page whenever the query changes
+def search_page_number(key, query):
+    if st.session_state.get(f"{key}_query") != query:
+        st.session_state[f"{key}_query"] = query
+        st.session_state[key] = 0
+    return st.session_state.get(key, 0)
+
+def search_pager(key, results, user_lang):
+    col1, col2 = st.columns(2)
+    with col1:
+        if results.page > 0 and st.button(translate_from_english("Previous", LANGUAGE_MAPPING[user_lang]), key=f"{key}_previous"):
+            st.session_state[key] = results.page - 1
+            st.rerun()
+    with col2:
+        if results.has_more and st.button(translate_from_english("Next", LANGUAGE_MAPPING[user_lang]), key=f"{key}_next"):
+            st.session_state[key] = results.page + 1
+            st.rerun()
+
+@profiled('page')
 def offline_content_page():
     user_lang = st.session_state.user['language']
     st.markdown(f"<h1 class='main-header fade-in'>{translate_from_english('Offline Content', LANGUAGE_MAPPING[user_lang])}</h1>", unsafe_allow_html=True)
@@ -884,22 +1148,38 @@ def offline_content_page():
     with col2:
         subject_filter = st.selectbox(translate_from_english("Filter by Subject", LANGUAGE_MAPPING[user_lang]), options=["All", "Math", "Science", "Technology", "Engineering", "English"], index=0)
     
-    content = get_offline_content(grade=grade_filter if grade_filter != "All" else None, subject=subject_filter if subject_filter != "All" else None, language=user_lang)
-    
-    if content:
-        for item in content:
-            id, title, subject, content_type, content, grade_level, language, download_count = item
-            st.markdown(f"<div class='card fade-in'><h3>{title} ({subject})</h3><p>{translate_from_english('Grade', LANGUAGE_MAPPING[user_lang])}: {grade_level} | {translate_from_english('Type', LANGUAGE_MAPPING[user_lang])}: {content_type} | {translate_from_english('Language', LANGUAGE_MAPPING[user_lang])}: {language} | {translate_from_english('Downloads', LANGUAGE_MAPPING[user_lang])}: {download_count}</p></div>", unsafe_allow_html=True)
-            download_text = translate_from_english(f"Download {title}", LANGUAGE_MAPPING[user_lang])
-            if st.button(download_text, key=f"download_{id}"):
-                increment_download_count(id)
-                st.success(translate_from_english(f"Downloading {title}. This content is now available offline!", LANGUAGE_MAPPING[user_lang]))
+    grade, subject = (grade_filter if grade_filter != "All" else None), (subject_filter if subject_filter != "All" else None)
+    bundles = get_content_bundles(grade=grade, subject=subject, language=user_lang)
+    if bundles:
+        st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Download a whole subject at once', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
+        for bundle_grade, bundle_subject, manifest_id, files, size, stored_size in bundles:
+            label = f"{translate_from_english('Grade', LANGUAGE_MAPPING[user_lang])} {bundle_grade} {bundle_subject}: {files} {translate_from_english('files', LANGUAGE_MAPPING[user_lang])}, {stored_size / 1048576:.1f} MB"
+            # The bundle server resumes broken downloads; without it the app streams the file itself
+            if BUNDLE_URL:
+                st.link_button(label, f"{BUNDLE_URL}/files/{manifest_id}.bundle")
+            else:
+                st.download_button(label, data=lambda manifest_id=manifest_id: read_bundle(manifest_id), file_name=f"{bundle_grade}-{bundle_subject}-{user_lang}.bundle",
+                                   mime="application/octet-stream", key=f"bundle_{manifest_id}", on_click=increment_bundle_downloads, args=(bundle_grade, bundle_subject, user_lang))
+    query = st.text_input(translate_from_english("Search content", LANGUAGE_MAPPING[user_lang]), key="content_search")
+    if query.strip():
+        results = search_offline_content(query, grade=grade, subject=subject, language=user_lang,
+                                         page=search_page_number("content_search_page", query))
+        for hit in results.hits:
+            offline_item_card(hit[:8], user_lang, snippet=hit.snippet)
+        if not results.hits:
+            st.info(translate_from_english("No offline content matches your search.", LANGUAGE_MAPPING[user_lang]))
+        search_pager("content_search_page", results, user_lang)
     else:
-        st.info(translate_from_english("No offline content available for your filters.", LANGUAGE_MAPPING[user_lang]))
+        content = get_offline_content(grade=grade, subject=subject, language=user_lang)
+        for item in content:
+            offline_item_card(item, user_lang)
+        if not content:
+            st.info(translate_from_english("No offline content available for your filters.", LANGUAGE_MAPPING[user_lang]))
     if st.button(translate_from_english("Back to Dashboard", LANGUAGE_MAPPING[user_lang])):
         st.session_state.page = "dashboard"
         st.rerun()
 
+@profiled('page')
 def profile_page():
     user_lang = st.session_state.user['language']
     st.markdown(f"<h1 class='main-header fade-in'>{translate_from_english('Your Profile', LANGUAGE_MAPPING[user_lang])}</h1>", unsafe_allow_html=True)
@@ -923,65 +1203,123 @@ def profile_page():
             st.info(translate_from_english("You haven't earned any badges yet. Keep learning!", LANGUAGE_MAPPING[user_lang]))
         st.markdown("</div>", unsafe_allow_html=True)
     
+    st.markdown(f"<h3 class='sub-header fade-in'>{translate_from_english('Leaderboard', LANGUAGE_MAPPING[user_lang])}</h3>", unsafe_allow_html=True)
+    scope_labels = {
+        'global': translate_from_english("All Students", LANGUAGE_MAPPING[user_lang]),
+        'school': translate_from_english("My School", LANGUAGE_MAPPING[user_lang]),
+        'grade': translate_from_english("My Grade", LANGUAGE_MAPPING[user_lang]),
+    }
+    scope = st.radio(translate_from_english("Leaderboard", LANGUAGE_MAPPING[user_lang]), list(scope_labels), format_func=scope_labels.get, horizontal=True, label_visibility="collapsed")
+    rank, total = get_rank(st.session_state.user['id'], scope)
+    if rank:
+        st.metric(label=translate_from_english("Your Rank", LANGUAGE_MAPPING[user_lang]), value=f"#{rank} / {total}")
+    for position, (name, grade, school, points) in enumerate(get_leaderboard(scope, st.session_state.user['id']), start=1):
+        st.markdown(f"<div class='card fade-in'><b>#{position} {name}</b> ({school}, {translate_from_english('Grade', LANGUAGE_MAPPING[user_lang])} {grade}) - {points} {translate_from_english('points', LANGUAGE_MAPPING[user_lang])}</div>", unsafe_allow_html=True)
+
     if st.button(translate_from_english("Back to Dashboard", LANGUAGE_MAPPING[user_lang])):
         st.session_state.page = "dashboard"
         st.rerun()
 
+ABOUT_LABELS = ["About Shiksha Yatra", """<p>Shiksha Yatra is an innovative platform...</p>"""]
+CONTACT_LABELS = ["Contact Us", """<p>We'd love to hear from you!</p>"""]
+
+# Static pages: a heading and one card of content
+def build_static_fragment(page_labels, dest_lang):
+    labels, complete = fragment_labels(page_labels, dest_lang)
+    title, content = page_labels
+    return [f"<h1 class='main-header fade-in'>{labels[title]}</h1>",
+            f"<div class='card fade-in'>{labels[content]}</div>"], complete
+
+@profiled('page')
 def about_page():
-    user_lang = st.session_state.user['language']
-    st.markdown(f"<h1 class='main-header fade-in'>{translate_from_english('About Shiksha Yatra', LANGUAGE_MAPPING[user_lang])}</h1>", unsafe_allow_html=True)
-    about_content = translate_from_english("""<p>Shiksha Yatra is an innovative platform...</p>""", LANGUAGE_MAPPING[user_lang])
-    st.markdown(f"<div class='card fade-in'>{about_content}</div>", unsafe_allow_html=True)
+    dest_lang = LANGUAGE_MAPPING[st.session_state.user['language']]
+    for block in fragments.get('about', dest_lang, lambda: build_static_fragment(ABOUT_LABELS, dest_lang)):
+        st.markdown(block, unsafe_allow_html=True)
     
+@profiled('page')
 def contact_page():
-    user_lang = st.session_state.user['language']
-    st.markdown(f"<h1 class='main-header fade-in'>{translate_from_english('Contact Us', LANGUAGE_MAPPING[user_lang])}</h1>", unsafe_allow_html=True)
-    contact_content = translate_from_english("""<p>We'd love to hear from you!</p>""", LANGUAGE_MAPPING[user_lang])
-    st.markdown(f"<div class='card fade-in'>{contact_content}</div>", unsafe_allow_html=True)
+    dest_lang = LANGUAGE_MAPPING[st.session_state.user['language']]
+    for block in fragments.get('contact', dest_lang, lambda: build_static_fragment(CONTACT_LABELS, dest_lang)):
+        st.markdown(block, unsafe_allow_html=True)
+
+# Operators only: usernames listed in EDUGAMIFY_ADMINS (comma separated)
+ADMIN_USERNAMES = {name.strip() for name in os.getenv('EDUGAMIFY_ADMINS', '').split(',') if name.strip()}
+SAMPLE_RATES = [0.0, 0.01, 0.1, 0.5, 1.0]
+
+def is_admin(user):
+    return bool(user) and user['username'] in ADMIN_USERNAMES
+
+def performance_page():
+    st.markdown("<h1 class='main-header fade-in'>Performance</h1>", unsafe_allow_html=True)
+    rates = sorted(set(SAMPLE_RATES + [profiler.sample_rate]))
+    profiler.sample_rate = st.select_slider("Fraction of calls timed", rates, value=profiler.sample_rate)
+    import pandas as pd
+    rows = profiler.snapshot()
+    if rows:
+        df = pd.DataFrame(rows).sort_values('total_seconds', ascending=False)
+        st.dataframe(df, hide_index=True, use_container_width=True)
+    else:
+        st.info("No calls recorded yet.")
+    st.markdown("<h3 class='sub-header fade-in'>Backends</h3>", unsafe_allow_html=True)
+    st.dataframe(pd.DataFrame([{'backend': name, 'state': breaker.state, 'trips': breaker.trips,
+                                'short_circuits': breaker.short_circuits} for name, breaker in breakers.items()]),
+                 hide_index=True, use_container_width=True)
+    st.markdown("<h3 class='sub-header fade-in'>Components</h3>", unsafe_allow_html=True)
+    for source, stats in profiler.source_stats().items():
+        with st.expander(source):
+            st.dataframe(pd.DataFrame(list(stats.items()), columns=['stat', 'value']), hide_index=True, use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download Prometheus metrics", profiler.prometheus(), file_name="metrics.prom", mime="text/plain")
+    with col2:
+        if st.button("Reset timings"):
+            profiler.reset()
+            st.rerun()
+    if metrics_path:
+        st.caption(f"Also written to {metrics_path} every {EXPORT_INTERVAL} s.")
 
 # Main app
+SIDEBAR_PAGES = [
+    (N_("🏠 Dashboard"), "dashboard"),
+    (N_("📚 Study Subjects"), "subjects"),
+    (N_("💬 AI Tutor"), "chat"),
+    (N_("🎮 Educational Games"), "games"),
+    (N_("📥 Offline Content"), "offline"),
+    (N_("📊 Profile & Badges"), "profile"),
+    (N_("ℹ️ About"), "about"),
+    (N_("📞 Contact"), "contact"),
+]
+ADMIN_PAGES = [(N_("📈 Performance"), "performance")]
+
 def main():
     local_css()
     if "page" not in st.session_state:
         st.session_state.page = "login"
     if "user" not in st.session_state:
         st.session_state.user = None
+    if st.session_state.user is None and restore_session() and st.session_state.page in ("login", "register"):
+        st.session_state.page = "dashboard"
     
     if st.session_state.user:
         user_lang = st.session_state.user['language']
+        celebrate_badges(writer.take_notices(st.session_state.user['id']))
         with st.sidebar:
             st.image("https://ideogram.ai/assets/image/lossless/response/Y4_3nbqYQOu7h4NNJjaPkw", use_column_width=True)
             welcome_text = translate_from_english(f"Welcome, {st.session_state.user['name']}!", LANGUAGE_MAPPING[user_lang])
             st.write(welcome_text)
             st.divider()
-            if st.button(translate_from_english("🏠 Dashboard", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "dashboard"
-                st.rerun()
-            if st.button(translate_from_english("📚 Study Subjects", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "subjects"
-                st.rerun()
-            if st.button(translate_from_english("💬 AI Tutor", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "chat"
-                st.rerun()
-            if st.button(translate_from_english("🎮 Educational Games", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "games"
-                st.rerun()
-            if st.button(translate_from_english("📥 Offline Content", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "offline"
-                st.rerun()
-            if st.button(translate_from_english("📊 Profile & Badges", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "profile"
-                st.rerun()
-            if st.button(translate_from_english("ℹ️ About", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "about"
-                st.rerun()
-            if st.button(translate_from_english("📞 Contact", LANGUAGE_MAPPING[user_lang])):
-                st.session_state.page = "contact"
-                st.rerun()
-            if st.button(translate_from_english("🚪 Logout", LANGUAGE_MAPPING[user_lang])):
+            pages = SIDEBAR_PAGES + (ADMIN_PAGES if is_admin(st.session_state.user) else [])
+            nav_labels = translate_many_from_english([label for label, _ in pages] + ["🚪 Logout"], LANGUAGE_MAPPING[user_lang])
+            for (label, page), nav_label in zip(pages, nav_labels):
+                if st.button(nav_label):
+                    st.session_state.page = page
+                    st.rerun()
+            if st.button(nav_labels[-1]):
+                authenticator.revoke_tokens(st.session_state.user['id'])
                 st.session_state.user = None
                 st.session_state.page = "login"
                 st.session_state.chat_history = []
+                st.query_params.clear()
                 st.rerun()
     
     if st.session_state.page == "login":
@@ -1004,6 +1342,9 @@ def main():
         about_page()
     elif st.session_state.page == "contact":
         contact_page()
+    elif st.session_state.page == "performance" and is_admin(st.session_state.user):
+        performance_page()
 
 if __name__ == "__main__":
-    main()
+    with profiler.span('page.rerun'):
+        main()
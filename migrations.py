@@ -0,0 +1,292 @@
+# migrations.py
+# Versioned schema migrations for edugamify.db. The applied version is kept in
+# PRAGMA user_version and every step is logged in schema_migrations.
+#
+#   python -m migrations            # apply pending migrations
+#   python -m migrations --check    # report hot queries that still scan a table
+#   python -m migrations --backfill-rollups   # rebuild analytics_daily from raw rows
+import argparse
+import sys
+import threading
+
+from questionbank import seed_question_bank
+from search import create_search_indexes
+from storage import DB_PATH, Database, create_schema
+
+SAMPLE_OFFLINE_CONTENT = '''INSERT INTO offline_content
+                            (title, subject, content_type, content, grade_level, language)
+                            SELECT * FROM (VALUES
+                            ('Basic Algebra', 'Math', 'PDF', 'algebra_basics.pdf', 6, 'English'),
+                            ('Photosynthesis', 'Science', 'PDF', 'photosynthesis.pdf', 7, 'English'),
+                            ('Simple Circuits', 'Technology', 'PDF', 'circuits.pdf', 8, 'English'),
+                            ('Geometry Basics', 'Math', 'Game', 'geometry_game.html', 6, 'English'),
+                            ('English Vocabulary', 'English', 'Flashcards', 'vocabulary_cards.pdf', 6, 'English'),
+                            ('बीजगणित की मूल बातें', 'Math', 'PDF', 'algebra_basics_hindi.pdf', 6, 'Hindi'),
+                            ('প্রকৃতির বিস্ময়', 'Science', 'PDF', 'nature_wonders_bengali.pdf', 7, 'Bengali'),
+                            ('ଗଣିତ ମୌଳିକ', 'Math', 'PDF', 'math_basics_odia.pdf', 6, 'Odia'))
+                            WHERE NOT EXISTS (SELECT 1 FROM offline_content)'''
+
+# Rebuild the per-day analytics rollups from the raw analytics rows
+def rebuild_analytics_rollups(c):
+    c.execute("DELETE FROM analytics_daily")
+    c.execute('''INSERT INTO analytics_daily (user_id, subject, day, time_spent, problems_solved)
+                 SELECT user_id, subject, date(date), SUM(time_spent), SUM(problems_solved)
+                 FROM analytics GROUP BY user_id, subject, date(date)''')
+
+
+# (version, description, steps); a step is an SQL string or a callable taking a cursor
+MIGRATIONS = [
+    (1, "base schema and sample offline content", [
+        create_schema,
+        SAMPLE_OFFLINE_CONTENT,
+    ]),
+    (2, "secondary indexes for per-user and catalogue queries", [
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_time ON chat_history (user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_analytics_user_subject ON analytics (user_id, subject)",
+        "CREATE INDEX IF NOT EXISTS idx_game_scores_user_time ON game_scores (user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_gamification_user_badge ON gamification (user_id, badge_name)",
+        "CREATE INDEX IF NOT EXISTS idx_gamification_user_earned ON gamification (user_id, earned_date)",
+        "CREATE INDEX IF NOT EXISTS idx_offline_content_filter ON offline_content (language, grade_level, subject)",
+        "CREATE INDEX IF NOT EXISTS idx_users_points ON users (points)",
+    ]),
+    # Older builds re-inserted the sample content on every start; fold the copies into one row
+    (3, "deduplicate offline content and make content files unique", [
+        '''UPDATE offline_content SET download_count = (
+               SELECT SUM(o.download_count) FROM offline_content o WHERE o.content = offline_content.content)
+           WHERE id IN (SELECT MIN(id) FROM offline_content GROUP BY content)''',
+        "DELETE FROM offline_content WHERE id NOT IN (SELECT MIN(id) FROM offline_content GROUP BY content)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_offline_content_file ON offline_content (content)",
+    ]),
+    (4, "running per-user counters for the badge engine", [
+        '''CREATE TABLE IF NOT EXISTS user_stats
+           (user_id INTEGER PRIMARY KEY,
+            problems_solved INTEGER NOT NULL DEFAULT 0,
+            games_played INTEGER NOT NULL DEFAULT 0,
+            subjects_covered INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id))''',
+        '''CREATE TABLE IF NOT EXISTS user_subjects
+           (user_id INTEGER,
+            subject TEXT,
+            PRIMARY KEY (user_id, subject)) WITHOUT ROWID''',
+        "INSERT OR IGNORE INTO user_subjects (user_id, subject) SELECT DISTINCT user_id, subject FROM analytics WHERE subject IS NOT NULL",
+        '''INSERT OR REPLACE INTO user_stats (user_id, problems_solved, games_played, subjects_covered)
+           SELECT u.id,
+                  COALESCE((SELECT SUM(a.problems_solved) FROM analytics a WHERE a.user_id = u.id), 0),
+                  (SELECT COUNT(*) FROM game_scores g WHERE g.user_id = u.id),
+                  (SELECT COUNT(*) FROM user_subjects s WHERE s.user_id = u.id)
+           FROM users u''',
+    ]),
+    (5, "per-user, per-subject daily analytics rollups", [
+        '''CREATE TABLE IF NOT EXISTS analytics_daily
+           (user_id INTEGER,
+            subject TEXT,
+            day DATE,
+            time_spent INTEGER NOT NULL DEFAULT 0,
+            problems_solved INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, subject, day)) WITHOUT ROWID''',
+        "CREATE INDEX IF NOT EXISTS idx_analytics_daily_user_day ON analytics_daily (user_id, day)",
+        rebuild_analytics_rollups,
+    ]),
+    (6, "shared tutor response cache", [
+        '''CREATE TABLE IF NOT EXISTS llm_response_cache
+           (key TEXT PRIMARY KEY,
+            grade INTEGER,
+            subject TEXT,
+            prompt TEXT,
+            response TEXT,
+            created_at REAL,
+            last_hit REAL,
+            hits INTEGER DEFAULT 0)''',
+        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_bucket ON llm_response_cache (grade, subject, last_hit)",
+        "CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_hit ON llm_response_cache (last_hit)",
+    ]),
+    # Rows written before this get language 'English' from the column default;
+    # message_english and response_translated stay NULL (message already English, response untranslated)
+    (7, "store chat turns with their renderings in the student's language", [
+        "ALTER TABLE chat_history ADD COLUMN language TEXT DEFAULT 'English'",
+        "ALTER TABLE chat_history ADD COLUMN message_english TEXT",
+        "ALTER TABLE chat_history ADD COLUMN response_translated TEXT",
+    ]),
+    (8, "write-behind spool watermarks", [
+        '''CREATE TABLE IF NOT EXISTS write_behind_state
+           (spool TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL)''',
+    ]),
+    # seq is dense within each (subject, grade, difficulty) bucket so questions can be sampled by position
+    (9, "quiz question bank with stored translations", [
+        '''CREATE TABLE IF NOT EXISTS questions
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject TEXT NOT NULL,
+            grade INTEGER NOT NULL,
+            difficulty INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            answer_index INTEGER NOT NULL)''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_bucket_seq ON questions (subject, grade, difficulty, seq)",
+        '''CREATE TABLE IF NOT EXISTS question_buckets
+           (subject TEXT,
+            grade INTEGER,
+            difficulty INTEGER,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (subject, grade, difficulty)) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS question_translations
+           (question_id INTEGER,
+            language TEXT,
+            question TEXT,
+            options TEXT,
+            PRIMARY KEY (question_id, language)) WITHOUT ROWID''',
+        seed_question_bank,
+    ]),
+    # Everyone starts at skill.INITIAL_RATING; ratings are written back from the in-memory skill cache
+    (10, "per-student, per-subject skill ratings", [
+        '''CREATE TABLE IF NOT EXISTS user_skill
+           (user_id INTEGER,
+            subject TEXT,
+            rating REAL NOT NULL,
+            answers INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, subject)) WITHOUT ROWID''',
+    ]),
+    (11, "shared application secrets", [
+        '''CREATE TABLE IF NOT EXISTS app_secrets
+           (name TEXT PRIMARY KEY,
+            value TEXT NOT NULL)''',
+    ]),
+    # One row per built version of a (grade, subject, language) bundle; the newest id is current
+    (12, "offline content bundle versions", [
+        '''CREATE TABLE IF NOT EXISTS content_bundles
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            grade INTEGER NOT NULL,
+            subject TEXT NOT NULL,
+            language TEXT NOT NULL,
+            manifest_id TEXT NOT NULL,
+            files INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+        "CREATE INDEX IF NOT EXISTS idx_content_bundles_group ON content_bundles (grade, subject, language, id)",
+        "CREATE INDEX IF NOT EXISTS idx_content_bundles_manifest ON content_bundles (manifest_id)",
+    ]),
+    # FTS5 indexes over offline_content and chat_history, kept current by triggers (see search.py)
+    (13, "full-text search over offline content and chat history", [
+        create_search_indexes,
+    ]),
+    # Bumped on every login, restore and logout; a session token is valid only for the current generation
+    (14, "per-user session token generation", [
+        "ALTER TABLE users ADD COLUMN session_generation INTEGER NOT NULL DEFAULT 0",
+    ]),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_checked_paths = set()
+_checked_lock = threading.Lock()
+
+# Queries on the request path, with representative parameters, for --check
+HOT_QUERIES = [
+    ("get_chat_history", "SELECT message, response, timestamp, subject, language, message_english FROM chat_history WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10", (1,)),
+    ("get_analytics", "SELECT subject, SUM(time_spent) as total_time, SUM(problems_solved) as total_problems FROM analytics_daily WHERE user_id = ? GROUP BY subject", (1,)),
+    ("get_analytics_timeseries", "SELECT day, SUM(time_spent), SUM(problems_solved) FROM analytics_daily WHERE user_id = ? AND day >= date('now', ?) GROUP BY day ORDER BY day", (1, '-30 days')),
+    ("get_game_scores", "SELECT game_name, score, timestamp FROM game_scores WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10", (1,)),
+    ("get_badges", "SELECT badge_name, badge_description, earned_date FROM gamification WHERE user_id = ? ORDER BY earned_date DESC", (1,)),
+    ("get_leaderboard", "SELECT name, grade, school, points FROM users ORDER BY points DESC LIMIT 10", ()),
+    ("get_offline_content", "SELECT * FROM offline_content WHERE language = ? AND grade_level = ? AND subject = ?", ('English', 6, 'Math')),
+    ("badge_counters", "SELECT u.points, s.problems_solved, s.games_played, s.subjects_covered FROM users u LEFT JOIN user_stats s ON s.user_id = u.id WHERE u.id = ?", (1,)),
+    ("badge_earned", "SELECT badge_name FROM gamification WHERE user_id = ? AND badge_name IN (?, ?)", (1, 'Starter', 'Game Master')),
+    ("llm_cache_candidates", "SELECT key, prompt, response FROM llm_response_cache WHERE grade = ? AND subject = ? AND created_at > ? ORDER BY last_hit DESC LIMIT ?", (7, 'Science', 0, 200)),
+    ("question_buckets", "SELECT difficulty, count FROM question_buckets WHERE subject = ? AND grade = ?", ('Math', 7)),
+    ("question_sample", "SELECT id FROM questions WHERE subject = ? AND grade = ? AND difficulty = ? AND seq IN (?, ?, ?)", ('Math', 7, 1, 1, 2, 3)),
+    ("question_get", "SELECT q.question, q.options, q.answer_index, q.difficulty, t.question, t.options FROM questions q LEFT JOIN question_translations t ON t.question_id = q.id AND t.language = ? WHERE q.id = ?", ('hi', 1)),
+    ("user_skill", "SELECT rating, answers FROM user_skill WHERE user_id = ? AND subject = ?", (1, 'Math')),
+    ("latest_bundle", "SELECT manifest_id, files, size, stored_size FROM content_bundles WHERE grade = ? AND subject = ? AND language = ? ORDER BY id DESC LIMIT 1", (6, 'Math', 'English')),
+    ("search_content", "SELECT o.id FROM offline_content_fts f JOIN offline_content o ON o.id = f.rowid WHERE offline_content_fts MATCH ? AND o.language = ? ORDER BY f.rank LIMIT ?", ('"algebra"*', 'English', 11)),
+    ("search_chats", "SELECT f.rowid FROM chat_history_fts f WHERE chat_history_fts MATCH ? ORDER BY f.rowid DESC LIMIT ?", ('owner:"u1" AND ("gravity"*)', 500)),
+    ("verify_user", "SELECT id, username, password, name, grade, school, language, avatar, points FROM users WHERE username = ?", ('student',)),
+]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db, target=None):
+    applied = []
+    # Up-to-date databases (every start but the first) skip the write lock entirely
+    with db.connection() as conn:
+        if current_version(conn) >= (LATEST_VERSION if target is None else target):
+            return applied
+    for version, description, steps in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with db.transaction() as c:
+            # Re-read under the write lock so concurrent processes apply each migration once
+            if current_version(c.connection) >= version:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(c)
+                else:
+                    c.execute(step)
+            c.execute('''CREATE TABLE IF NOT EXISTS schema_migrations
+                         (version INTEGER PRIMARY KEY,
+                          description TEXT,
+                          applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+            c.execute("INSERT OR REPLACE INTO schema_migrations (version, description) VALUES (?, ?)",
+                      (version, description))
+            c.execute(f"PRAGMA user_version = {int(version)}")
+        applied.append(version)
+    return applied
+
+
+# For app start-up: migrate each database file at most once per process, however
+# many sessions or reruns ask
+def ensure_schema(db):
+    with _checked_lock:
+        if db.path in _checked_paths:
+            return []
+        applied = migrate(db)
+        _checked_paths.add(db.path)
+        return applied
+
+
+# A plan step is flagged when it scans a whole table or sorts through a temp b-tree
+def check_query_plans(db, queries=HOT_QUERIES):
+    problems = []
+    with db.connection() as conn:
+        for name, sql, params in queries:
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+                detail = row[-1]
+                full_scan = detail.startswith("SCAN") and "INDEX" not in detail
+                if full_scan or "USE TEMP B-TREE" in detail:
+                    problems.append((name, detail))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply edugamify.db schema migrations.")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--check', action='store_true', help="flag hot queries that still do full scans")
+    parser.add_argument('--backfill-rollups', action='store_true', help="rebuild analytics_daily from raw analytics rows")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    applied = migrate(db)
+    if args.backfill_rollups:
+        with db.transaction() as c:
+            rebuild_analytics_rollups(c)
+            c.execute("SELECT COUNT(*) FROM analytics_daily")
+            print(f"rebuilt {c.fetchone()[0]} analytics_daily rows")
+    with db.connection() as conn:
+        print(f"schema version {current_version(conn)}" + (f" (applied {applied})" if applied else ""))
+    if args.check:
+        problems = check_query_plans(db)
+        for name, detail in problems:
+            print(f"FULL SCAN  {name}: {detail}")
+        if not problems:
+            print(f"all {len(HOT_QUERIES)} hot queries use an index")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# profiling.py
+# Low-overhead timers and counters for the app's hot paths. Functions wrapped with
+# Profiler.timed (and blocks in Profiler.span) count every call, but only time a
+# sampled fraction of them, so the cost of leaving profiling on in production is
+# one random() call per unsampled call. Latency percentiles come from a window of
+# recent samples. Component stats (cache hit counts, queue depths, ...) are pulled
+# from registered sources when a snapshot is taken. Snapshots can be written as
+# Prometheus text exposition format, periodically by a background thread.
+import atexit
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+SAMPLE_RATE = float(os.environ.get('EDUGAMIFY_PROFILE_SAMPLE', 0.1))
+WINDOW = 1024
+EXPORT_INTERVAL = 15
+METRIC_PREFIX = 'edugamify'
+
+logger = logging.getLogger(__name__)
+
+
+class Metric:
+    __slots__ = ('calls', 'sampled', 'errors', 'total', 'samples')
+
+    def __init__(self, window):
+        self.calls = 0
+        self.sampled = 0
+        self.errors = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Profiler:
+    def __init__(self, sample_rate=SAMPLE_RATE, window=WINDOW):
+        self.sample_rate = sample_rate
+        self.window = window
+        self._metrics = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+
+    def _metric(self, name):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, Metric(self.window))
+        return metric
+
+    def record(self, name, seconds, error=False):
+        metric = self._metric(name)
+        with self._lock:
+            metric.sampled += 1
+            metric.total += seconds
+            metric.samples.append(seconds)
+            if error:
+                metric.errors += 1
+
+    # Decorator; name defaults to "<group>.<function name>"
+    def timed(self, group, name=None):
+        def decorate(func):
+            metric_name = f"{group}.{name or func.__name__}"
+            metric = self._metric(metric_name)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                metric.calls += 1  # approximate under contention, like any unlocked counter
+                if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                error = False
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    # Control-flow exceptions (e.g. Streamlit's rerun) derive from BaseException and are not errors
+                    self.record(metric_name, time.perf_counter() - start, error)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def span(self, name):
+        metric = self._metric(name)
+        metric.calls += 1
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            yield
+            return
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, error)
+
+    # stats() -> {name: number}; read on every snapshot
+    def add_source(self, name, stats):
+        self._sources[name] = stats
+
+    # One row per metric: calls, sampled, errors, estimated total seconds over all calls, p50/p99 in ms
+    def snapshot(self):
+        with self._lock:
+            metrics = [(name, metric.calls, metric.sampled, metric.errors, metric.total, sorted(metric.samples))
+                       for name, metric in self._metrics.items()]
+        rows = []
+        for name, calls, sampled, errors, total, ordered in sorted(metrics):
+            rows.append({
+                'name': name,
+                'calls': calls,
+                'sampled': sampled,
+                'errors': errors,
+                'total_seconds': total * calls / sampled if sampled else 0.0,
+                'p50_ms': percentile(ordered, 0.5) * 1000,
+                'p99_ms': percentile(ordered, 0.99) * 1000,
+            })
+        return rows
+
+    # {source: {stat: number}}; one level of nesting is flattened to "outer.inner"
+    def source_stats(self):
+        stats = {}
+        for name, source in list(self._sources.items()):
+            try:
+                flat = {}
+                for key, value in source().items():
+                    items = [(f"{key}.{inner}", v) for inner, v in value.items()] if isinstance(value, dict) else [(key, value)]
+                    flat.update((k, v) for k, v in items if isinstance(v, (int, float)) and not isinstance(v, bool))
+                stats[name] = flat
+            except Exception:
+                logger.exception("profiling source %s failed", name)
+        return stats
+
+    def reset(self):
+        with self._lock:
+            for name in self._metrics:
+                self._metrics[name].__init__(self.window)
+
+    def prometheus(self):
+        rows = self.snapshot()
+        lines = [f"# TYPE {METRIC_PREFIX}_calls_total counter"]
+        lines += [f'{METRIC_PREFIX}_calls_total{{name="{_label(row["name"])}"}} {row["calls"]}' for row in rows]
+        lines.append(f"# TYPE {METRIC_PREFIX}_errors_total counter")
+        lines += [f'{METRIC_PREFIX}_errors_total{{name="{_label(row["name"])}"}} {row["errors"]}' for row in rows]
+        lines.append(f"# TYPE {METRIC_PREFIX}_latency_seconds summary")
+        for row in rows:
+            name = _label(row['name'])
+            lines.append(f'{METRIC_PREFIX}_latency_seconds{{name="{name}",quantile="0.5"}} {row["p50_ms"] / 1000:.6f}')
+            lines.append(f'{METRIC_PREFIX}_latency_seconds{{name="{name}",quantile="0.99"}} {row["p99_ms"] / 1000:.6f}')
+            lines.append(f'{METRIC_PREFIX}_latency_seconds_sum{{name="{name}"}} {row["total_seconds"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_latency_seconds_count{{name="{name}"}} {row["calls"]}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_component gauge")
+        for source, stats in sorted(self.source_stats().items()):
+            lines += [f'{METRIC_PREFIX}_component{{source="{_label(source)}",stat="{_label(key)}"}} {value}'
+                      for key, value in sorted(stats.items())]
+        lines.append(f"# TYPE {METRIC_PREFIX}_profile_sample_rate gauge")
+        lines.append(f"{METRIC_PREFIX}_profile_sample_rate {self.sample_rate}")
+        return "\n".join(lines) + "\n"
+
+    # Atomic replace, so a scraper never reads a half-written file
+    def write_prometheus(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    # Rewrite path every interval seconds from a daemon thread, and once more at exit
+    def start_export(self, path, interval=EXPORT_INTERVAL):
+        if self._exporter is not None:
+            return
+
+        def export():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_prometheus(path)
+                except Exception:
+                    logger.exception("could not write metrics to %s", path)
+
+        self._exporter = threading.Thread(target=export, name='metrics-export', daemon=True)
+        self._exporter.start()
+        atexit.register(self.write_prometheus, path)
@@ -0,0 +1,223 @@
+# questionbank.py
+# Quiz question bank. Questions live in edugamify.db, bucketed by (subject, grade,
+# difficulty) with a dense per-bucket sequence number, and a bucket table keeps the
+# count of each bucket. Drawing k questions picks k random sequence numbers and
+# fetches them through the unique index, so sampling costs O(k) however large the
+# bank grows. Translations are stored per question and language, so a question is
+# translated at most once per language, ever, and never while a student waits
+# once the bank has been pre-translated:
+#
+#   python -m questionbank --stats
+#   python -m questionbank --import questions.json
+#   python -m questionbank --translate hi or te
+import argparse
+import json
+import random
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+from storage import DB_PATH, Database
+
+QUIZ_LENGTH = 5
+DIFFICULTIES = (1, 2, 3)
+CACHE_SIZE = 2048
+
+Question = namedtuple('Question', 'id question options answer_index difficulty')
+
+# Built-in questions: (subject, grades, difficulty, question, options, answer_index)
+SEED_QUESTIONS = [
+    ('Math', range(6, 9), 1, "What is 15 + 27?", ["42", "32", "52", "37"], 0),
+    ('Math', range(6, 9), 2, "If a = 5 and b = 3, what is a² + b²?", ["64", "34", "16", "25"], 1),
+    ('Math', range(6, 9), 1, "What is 7 × 8?", ["54", "48", "56", "64"], 2),
+    ('Math', range(6, 9), 1, "What is the sum of the angles of a triangle?", ["90°", "180°", "270°", "360°"], 1),
+    ('Math', range(6, 9), 2, "What is 25% of 80?", ["25", "16", "40", "20"], 3),
+    ('Math', range(6, 9), 3, "Solve for x: 3x + 5 = 20", ["5", "15", "25/3", "4"], 0),
+    ('Math', range(9, 13), 2, "What is the value of sin(90°)?", ["1", "0", "0.5", "√2/2"], 0),
+    ('Math', range(9, 13), 2, "If f(x) = x² + 3x - 4, what is f(2)?", ["2", "6", "10", "8"], 1),
+    ('Math', range(9, 13), 1, "What is log₁₀(1000)?", ["10", "100", "3", "30"], 2),
+    ('Math', range(9, 13), 2, "What are the roots of x² - 5x + 6 = 0?", ["1 and 6", "-2 and -3", "5 and 6", "2 and 3"], 3),
+    ('Math', range(9, 13), 2, "What is the area of a circle of radius 7? (π = 22/7)", ["154", "44", "49", "22"], 0),
+    ('Math', range(9, 13), 3, "What is the derivative of x²?", ["x", "2x", "x²/2", "2"], 1),
+    ('Science', range(6, 9), 1, "Which planet is known as the Red Planet?", ["Mars", "Venus", "Jupiter", "Saturn"], 0),
+    ('Science', range(6, 9), 1, "What is the process by which plants make their own food?", ["Respiration", "Photosynthesis"], 1),
+    ('Science', range(6, 9), 1, "Which gas do we breathe out?", ["Oxygen", "Nitrogen", "Carbon dioxide", "Hydrogen"], 2),
+    ('Science', range(6, 9), 1, "At what temperature does water boil at sea level?", ["90°C", "50°C", "120°C", "100°C"], 3),
+    ('Science', range(6, 9), 2, "What is the SI unit of force?", ["Newton", "Joule", "Watt", "Pascal"], 0),
+    ('Science', range(6, 9), 2, "Which part of the cell contains its genetic material?", ["Cell wall", "Nucleus", "Cytoplasm", "Vacuole"], 1),
+    ('Science', range(9, 13), 1, "What is the chemical symbol for gold?", ["Au", "Ag", "Fe", "Go"], 0),
+    ('Science', range(9, 13), 2, "Which subatomic particle has a negative charge?", ["Proton", "Electron", "Neutron", "Photon"], 1),
+    ('Science', range(9, 13), 1, "What is the pH of pure water?", ["0", "14", "7", "1"], 2),
+    ('Science', range(9, 13), 1, "Which equation states Newton's second law?", ["E = mc²", "V = IR", "P = VI", "F = ma"], 3),
+    ('Science', range(9, 13), 2, "Which gas is released when zinc reacts with dilute hydrochloric acid?", ["Hydrogen", "Oxygen", "Chlorine", "Carbon dioxide"], 0),
+    ('Science', range(9, 13), 3, "What current flows through a 10 Ω resistor across 5 V?", ["2 A", "0.5 A", "50 A", "5 A"], 1),
+]
+
+
+# Append questions to their buckets; rows are (subject, grade, difficulty, question, options, answer_index)
+def add_questions(c, rows):
+    counts = {}
+    for subject, grade, difficulty, question, options, answer_index in rows:
+        if not 0 <= answer_index < len(options):
+            raise ValueError(f"answer_index {answer_index} out of range for {question!r}")
+        bucket = (subject, grade, difficulty)
+        if bucket not in counts:
+            c.execute("SELECT count FROM question_buckets WHERE subject = ? AND grade = ? AND difficulty = ?", bucket)
+            row = c.fetchone()
+            counts[bucket] = row[0] if row else 0
+        counts[bucket] += 1
+        c.execute('''INSERT INTO questions (subject, grade, difficulty, seq, question, options, answer_index)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                  bucket + (counts[bucket], question, json.dumps(options, ensure_ascii=False), answer_index))
+    c.executemany('''INSERT INTO question_buckets (subject, grade, difficulty, count) VALUES (?, ?, ?, ?)
+                     ON CONFLICT (subject, grade, difficulty) DO UPDATE SET count = excluded.count''',
+                  [bucket + (count,) for bucket, count in counts.items()])
+    return sum(counts.values())
+
+
+def seed_question_bank(c):
+    c.execute("SELECT 1 FROM questions LIMIT 1")
+    if c.fetchone():
+        return
+    add_questions(c, [(subject, grade, difficulty, question, options, answer_index)
+                      for subject, grades, difficulty, question, options, answer_index in SEED_QUESTIONS
+                      for grade in grades])
+
+
+class QuestionBank:
+    # translate_many(texts, dest_lang) -> texts fills in a missing language variant once, then it is stored
+    # is_translated(text, lang) tells a real translation from the English fallback translate_many
+    # returns for a string the backend failed on; a question with a fallback is served but not stored
+    def __init__(self, db, translate_many=None, cache_size=CACHE_SIZE, is_translated=None):
+        self.db = db
+        self.translate_many = translate_many
+        self.is_translated = is_translated
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket_counts(self, subject, grade):
+        return dict(self.db.query("SELECT difficulty, count FROM question_buckets WHERE subject = ? AND grade = ?",
+                                  (subject, grade)))
+
+    # k distinct question ids drawn uniformly from the bucket(s), skipping ids in exclude;
+    # O(k + len(exclude)) regardless of bank size
+    def sample(self, subject, grade, k=QUIZ_LENGTH, difficulty=None, exclude=()):
+        counts = self.bucket_counts(subject, grade)
+        if difficulty is not None:
+            counts = {difficulty: counts.get(difficulty, 0)}
+        buckets = [(d, n) for d, n in sorted(counts.items()) if n]
+        total = sum(n for d, n in buckets)
+        if not total:
+            return []
+        # Positions in the concatenated buckets map back to (difficulty, seq)
+        exclude = set(exclude)
+        picks = {}
+        for position in random.sample(range(total), min(k + len(exclude), total)):
+            for d, n in buckets:
+                if position < n:
+                    picks.setdefault(d, []).append(position + 1)
+                    break
+                position -= n
+        ids = []
+        for d, seqs in picks.items():
+            placeholders = ", ".join("?" for _ in seqs)
+            ids.extend(row[0] for row in self.db.query(
+                f"SELECT id FROM questions WHERE subject = ? AND grade = ? AND difficulty = ? AND seq IN ({placeholders})",
+                [subject, grade, d] + seqs) if row[0] not in exclude)
+        random.shuffle(ids)
+        return ids[:k]
+
+    # One question in the given language code, falling back to English if it cannot be translated
+    def get(self, question_id, lang='en'):
+        key = (question_id, lang)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        row = self.db.query_one('''SELECT q.question, q.options, q.answer_index, q.difficulty, t.question, t.options
+                                   FROM questions q LEFT JOIN question_translations t
+                                   ON t.question_id = q.id AND t.language = ?
+                                   WHERE q.id = ?''', (lang, question_id))
+        if row is None:
+            return None
+        question, options, answer_index, difficulty, translated_question, translated_options = row
+        complete = True
+        if translated_question is not None:
+            question, options = translated_question, translated_options
+        elif lang != 'en' and self.translate_many:
+            question, options, complete = self._translate(question_id, lang, question, json.loads(options))
+        result = Question(question_id, question, json.loads(options) if isinstance(options, str) else options, answer_index,
+                          difficulty)
+        if not complete:
+            return result
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    # (question, options, stored); a question with any string left in English is not stored
+    def _translate(self, question_id, lang, question, options):
+        texts = [question] + options
+        translated = self.translate_many(texts, lang)
+        if self.is_translated and not all(self.is_translated(text, lang) for text in texts):
+            return translated[0], translated[1:], False
+        with self.db.transaction() as c:
+            c.execute('''INSERT OR REPLACE INTO question_translations (question_id, language, question, options)
+                         VALUES (?, ?, ?, ?)''',
+                      (question_id, lang, translated[0], json.dumps(translated[1:], ensure_ascii=False)))
+        return translated[0], translated[1:], True
+
+    # Fill in every missing variant for lang; returns (questions stored, questions left in English)
+    def pretranslate(self, lang, subject=None):
+        sql = '''SELECT q.id, q.question, q.options FROM questions q
+                 WHERE NOT EXISTS (SELECT 1 FROM question_translations t WHERE t.question_id = q.id AND t.language = ?)'''
+        params = [lang]
+        if subject:
+            sql += " AND q.subject = ?"
+            params.append(subject)
+        rows = self.db.query(sql, params)
+        stored = sum(self._translate(question_id, lang, question, json.loads(options))[2]
+                     for question_id, question, options in rows)
+        return stored, len(rows) - stored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the quiz question bank in edugamify.db.")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--import', dest='import_path', metavar='JSON',
+                        help="append questions from a JSON list of {subject, grade, difficulty, question, options, answer_index}")
+    parser.add_argument('--translate', nargs='+', metavar='LANG', help="store translations for these language codes")
+    parser.add_argument('--stats', action='store_true', help="print question counts per bucket")
+    args = parser.parse_args(argv)
+
+    from migrations import migrate
+    db = Database(args.db)
+    migrate(db)
+    if args.import_path:
+        with open(args.import_path, encoding='utf-8') as f:
+            items = json.load(f)
+        with db.transaction() as c:
+            added = add_questions(c, [(item['subject'], int(item['grade']), int(item.get('difficulty', 1)),
+                                       item['question'], item['options'], int(item['answer_index'])) for item in items])
+        print(f"imported {added} questions")
+    if args.translate:
+        from googletrans import Translator
+        from translation_cache import TranslationCache
+        translator = Translator()
+        cache = TranslationCache(lambda text, dest, src: translator.translate(text, dest=dest, src=src).text)
+        bank = QuestionBank(db, translate_many=lambda texts, dest: cache.translate_many(texts, dest, 'en'),
+                            is_translated=lambda text, dest: cache.get(text, dest, 'en') is not None)
+        for lang in args.translate:
+            stored, failed = bank.pretranslate(lang)
+            print(f"{lang}: translated {stored} questions" + (f", {failed} failed; run again to retry" if failed else ""))
+    if args.stats or not (args.import_path or args.translate):
+        for subject, grade, difficulty, count in db.query(
+                "SELECT subject, grade, difficulty, count FROM question_buckets ORDER BY subject, grade, difficulty"):
+            print(f"{subject:<10} grade {grade:<3} difficulty {difficulty}  {count:>6} questions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# search.py
+# Full-text search over offline content and each student's tutor history. Both
+# are SQLite FTS5 indexes over their tables (external content, so the text is not
+# stored twice) that triggers keep in step with every insert, update and delete.
+#
+# The tokenizer is unicode61 with categories 'L* N* Co M*'. Its default set leaves
+# out the M* (mark) categories, which are the vowel signs and viramas of every
+# Indic script in LANGUAGE_MAPPING, so "संश्लेषण" would be split into fragments;
+# with marks kept, Devanagari, Bengali, Telugu, Tamil, Odia... words stay whole.
+#
+# Chat rows are indexed with an "owner" token (u<user_id>), so a student's search
+# is intersected with their own rows inside the index. Those hits are ranked here
+# with BM25 over the student's own history: FTS5's bm25() would first count the
+# term's documents across every student, which for a common word over a million
+# rows costs tens of milliseconds.
+import math
+import re
+from collections import namedtuple
+
+TOKENIZER = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+PAGE_SIZE = 10
+MAX_CANDIDATES = 500
+SNIPPET_TOKENS = 12
+BM25_K1 = 1.2
+BM25_B = 0.75
+# (column, weight) in index order; owner only scopes the query
+CHAT_COLUMNS = [('message', 2.0), ('message_english', 2.0), ('response_translated', 1.0), ('response', 1.0),
+                ('subject', 0.5)]
+CONTENT_WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+_MARKED = re.compile('\x02([^\x03]*)\x03')
+
+SearchPage = namedtuple('SearchPage', 'hits page has_more')
+ContentHit = namedtuple('ContentHit', 'id title subject content_type content grade_level language download_count snippet')
+ChatHit = namedtuple('ChatHit', 'id message response subject timestamp language score snippet')
+
+
+def _chat_columns(prefix):
+    return ", ".join(f"{prefix}{name}" for name, _ in CHAT_COLUMNS)
+
+
+# Migration step: indexes, the triggers that maintain them, and a backfill of existing rows
+def create_search_indexes(c):
+    c.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS offline_content_fts USING fts5
+                  (title, subject, content_type, content,
+                   content='offline_content', content_rowid='id', tokenize="{TOKENIZER}")''')
+    columns = "title, subject, content_type, content"
+    old_values, new_values = "old.title, old.subject, old.content_type, old.content", \
+        "new.title, new.subject, new.content_type, new.content"
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS offline_content_fts_insert AFTER INSERT ON offline_content BEGIN
+                      INSERT INTO offline_content_fts (rowid, {columns}) VALUES (new.id, {new_values});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS offline_content_fts_delete AFTER DELETE ON offline_content BEGIN
+                      INSERT INTO offline_content_fts (offline_content_fts, rowid, {columns})
+                      VALUES ('delete', old.id, {old_values});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS offline_content_fts_update AFTER UPDATE OF {columns} ON offline_content BEGIN
+                      INSERT INTO offline_content_fts (offline_content_fts, rowid, {columns})
+                      VALUES ('delete', old.id, {old_values});
+                      INSERT INTO offline_content_fts (rowid, {columns}) VALUES (new.id, {new_values});
+                  END''')
+    c.execute(f"INSERT INTO offline_content_fts (offline_content_fts, rank) VALUES ('rank', 'bm25({', '.join(map(str, CONTENT_WEIGHTS))})')")
+    c.execute("INSERT INTO offline_content_fts (offline_content_fts) VALUES ('rebuild')")
+
+    # The owner token is not a column of chat_history, so the index reads its rows through a view
+    c.execute(f'''CREATE VIEW IF NOT EXISTS chat_history_search AS
+                  SELECT id, 'u' || user_id AS owner, {_chat_columns('')} FROM chat_history''')
+    c.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5
+                  (owner, {_chat_columns('')},
+                   content='chat_history_search', content_rowid='id', tokenize="{TOKENIZER}")''')
+    columns = f"owner, {_chat_columns('')}"
+    old_values, new_values = f"'u' || old.user_id, {_chat_columns('old.')}", f"'u' || new.user_id, {_chat_columns('new.')}"
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+                      INSERT INTO chat_history_fts (rowid, {columns}) VALUES (new.id, {new_values});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+                      INSERT INTO chat_history_fts (chat_history_fts, rowid, {columns})
+                      VALUES ('delete', old.id, {old_values});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE OF user_id, {_chat_columns('')}
+                  ON chat_history BEGIN
+                      INSERT INTO chat_history_fts (chat_history_fts, rowid, {columns})
+                      VALUES ('delete', old.id, {old_values});
+                      INSERT INTO chat_history_fts (rowid, {columns}) VALUES (new.id, {new_values});
+                  END''')
+    c.execute("INSERT INTO chat_history_fts (chat_history_fts) VALUES ('rebuild')")
+
+
+# Turn what a student typed into an FTS5 query that every word must match. Words
+# are quoted, so FTS5 syntax in the input (AND, NEAR, column:, quotes) is searched
+# for as text, never interpreted. A trailing * asks for a prefix match ("photo*").
+# There are no prefix indexes: on chat text they tripled the index size, so a prefix
+# query reads every matching term's full doclist and is left to students who ask.
+def fts_query(text):
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if any(ch.isalnum() for ch in word):
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return " ".join(terms) or None
+
+
+def _page_bounds(page, per_page):
+    page = max(0, page)
+    return page, page * per_page
+
+
+def search_content(db, text, language=None, grade=None, subject=None, page=0, per_page=PAGE_SIZE):
+    query = fts_query(text)
+    page, offset = _page_bounds(page, per_page)
+    if query is None:
+        return SearchPage([], page, False)
+    sql = '''SELECT o.id, o.title, o.subject, o.content_type, o.content, o.grade_level, o.language, o.download_count,
+                    snippet(offline_content_fts, -1, ?, ?, '…', ?)
+             FROM offline_content_fts f JOIN offline_content o ON o.id = f.rowid
+             WHERE offline_content_fts MATCH ?'''
+    params = [_MARK_OPEN, _MARK_CLOSE, SNIPPET_TOKENS, query]
+    for column, value in (('language', language), ('grade_level', grade), ('subject', subject)):
+        if value:
+            sql += f" AND o.{column} = ?"
+            params.append(value)
+    rows = db.query(sql + " ORDER BY f.rank LIMIT ? OFFSET ?", params + [per_page + 1, offset])
+    hits = [ContentHit(*row) for row in rows[:per_page]]
+    return SearchPage(hits, page, len(rows) > per_page)
+
+
+def _bm25(frequency, length, average_length, idf):
+    return idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+
+
+# A student's own tutor turns matching text, best first. Candidates are the student's
+# MAX_CANDIDATES most recent matches; highlight() marks the matched tokens of each
+# column, which gives term frequencies without tokenizing anything in Python.
+def search_chats(db, user_id, text, page=0, per_page=PAGE_SIZE):
+    query = fts_query(text)
+    page, offset = _page_bounds(page, per_page)
+    if query is None:
+        return SearchPage([], page, False)
+    marked = ", ".join(f"highlight(chat_history_fts, {i + 1}, ?, ?)" for i in range(len(CHAT_COLUMNS)))
+    rows = db.query(f'''SELECT f.rowid, {marked}
+                        FROM chat_history_fts f WHERE chat_history_fts MATCH ?
+                        ORDER BY f.rowid DESC LIMIT ?''',
+                    [_MARK_OPEN, _MARK_CLOSE] * len(CHAT_COLUMNS) + [f'owner:"u{int(user_id)}" AND ({query})', MAX_CANDIDATES])
+    if not rows:
+        return SearchPage([], page, False)
+
+    # Per row, (column, length, term counts) of each column with a match; word counts stand in for token counts
+    documents, containing, length_sums = [], {}, [0] * len(CHAT_COLUMNS)
+    for row in rows:
+        matched = []
+        for i, text in enumerate(row[1:]):
+            if not text:
+                continue
+            length = text.count(' ') + 1
+            length_sums[i] += length
+            if _MARK_OPEN in text:
+                terms = {}
+                for term in _MARKED.findall(text):
+                    term = term.casefold()
+                    terms[term] = terms.get(term, 0) + 1
+                matched.append((i, length, terms))
+        documents.append(matched)
+        for term in {term for _, _, terms in matched for term in terms}:
+            containing[term] = containing.get(term, 0) + 1
+    total = len(rows)
+    averages = [max(1.0, length_sum / total) for length_sum in length_sums]
+    idf = {term: math.log(1 + (total - count + 0.5) / (count + 0.5)) for term, count in containing.items()}
+    scored = []
+    for row, matched in zip(rows, documents):
+        score = 0.0
+        for i, length, terms in matched:
+            weight, average = CHAT_COLUMNS[i][1], averages[i]
+            for term, frequency in terms.items():
+                score += weight * _bm25(frequency, length, average, idf[term])
+        scored.append((score, row))
+    # Newer turns win ties; rows came newest first and the sort is stable
+    scored.sort(key=lambda item: -item[0])
+    window = scored[offset:offset + per_page]
+    if not window:
+        return SearchPage([], page, False)
+
+    ids = [row[0] for _, row in window]
+    details = {row[0]: row[1:] for row in db.query(
+        f'''SELECT id, message, COALESCE(response_translated, response), subject, timestamp, language
+            FROM chat_history WHERE id IN ({", ".join("?" for _ in ids)})''', ids)}
+    hits = []
+    for score, row in window:
+        if row[0] not in details:
+            continue
+        # The snippet comes from the best-scoring column that has a match
+        marked_text = next((row[i + 1] for i, _ in sorted(enumerate(CHAT_COLUMNS), key=lambda c: -c[1][1])
+                            if row[i + 1] and _MARK_OPEN in row[i + 1]), "")
+        hits.append(ChatHit(row[0], *details[row[0]], round(score, 3), snippet(marked_text)))
+    return SearchPage(hits, page, len(scored) > offset + per_page)
+
+
+# About SNIPPET_TOKENS words around the first match, still carrying the match markers
+def snippet(marked_text, tokens=SNIPPET_TOKENS):
+    words = marked_text.split()
+    first = next((i for i, word in enumerate(words) if _MARK_OPEN in word), 0)
+    start = max(0, first - tokens // 3)
+    text = " ".join(words[start:start + tokens])
+    return ("…" if start else "") + text + ("…" if start + tokens < len(words) else "")
+
+
+# Wrap the matches of a snippet for display, e.g. highlighted(s, "<mark>", "</mark>")
+def highlighted(text, open_tag, close_tag):
+    return text.replace(_MARK_OPEN, open_tag).replace(_MARK_CLOSE, close_tag)
@@ -0,0 +1,131 @@
+# skill.py
+# Per-student, per-subject skill ratings (Elo) and the adaptive quiz scheduler.
+# Each answered question moves the student's rating against the rating of the
+# question's difficulty bucket, in constant time. Ratings live in an in-memory
+# cache and changed ones are written back to user_skill every FLUSH_INTERVAL
+# seconds and at exit, so picking the next question never reads the student's
+# history.
+import atexit
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+INITIAL_RATING = 1400.0
+# Ratings of the bank's difficulty buckets; a new student is at even odds on difficulty 2
+DIFFICULTY_RATINGS = {1: 1250.0, 2: 1400.0, 3: 1550.0}
+# Aim for questions the student answers correctly about this often
+TARGET_SUCCESS = 0.7
+EXPLORE_RATE = 0.1
+K_NEW = 64.0
+K_SETTLED = 16.0
+SETTLE_AFTER = 30
+FLUSH_INTERVAL = 30
+CACHE_SIZE = 10000
+
+logger = logging.getLogger(__name__)
+
+
+def expected_score(rating, opponent):
+    return 1.0 / (1.0 + math.pow(10.0, (opponent - rating) / 400.0))
+
+
+# Ratings move fast for new students and settle as answers accumulate
+def k_factor(answers):
+    if answers >= SETTLE_AFTER:
+        return K_SETTLED
+    return K_NEW - (K_NEW - K_SETTLED) * answers / SETTLE_AFTER
+
+
+class SkillModel:
+    def __init__(self, db, flush_interval=FLUSH_INTERVAL, cache_size=CACHE_SIZE):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._ratings = OrderedDict()  # (user_id, subject) -> [rating, answers]
+        self._dirty = set()
+        self._flushed_at = time.time()
+        atexit.register(self.flush)
+
+    # Caller holds self._lock
+    def _entry(self, user_id, subject):
+        key = (user_id, subject)
+        entry = self._ratings.get(key)
+        if entry is None:
+            row = self.db.query_one("SELECT rating, answers FROM user_skill WHERE user_id = ? AND subject = ?", key)
+            entry = list(row) if row else [INITIAL_RATING, 0]
+            self._ratings[key] = entry
+            self._evict()
+        else:
+            self._ratings.move_to_end(key)
+        return entry
+
+    # Only ratings already written back may be dropped
+    def _evict(self):
+        while len(self._ratings) > self.cache_size:
+            for key in self._ratings:
+                if key not in self._dirty:
+                    del self._ratings[key]
+                    break
+            else:
+                return
+
+    def rating(self, user_id, subject):
+        with self._lock:
+            return self._entry(user_id, subject)[0]
+
+    # outcome is 1.0 for a correct answer and 0.0 for a wrong one (partial credit in between)
+    def record(self, user_id, subject, difficulty, outcome):
+        with self._lock:
+            entry = self._entry(user_id, subject)
+            opponent = DIFFICULTY_RATINGS.get(difficulty, INITIAL_RATING)
+            entry[0] += k_factor(entry[1]) * (outcome - expected_score(entry[0], opponent))
+            entry[1] += 1
+            self._dirty.add((user_id, subject))
+            due = time.time() - self._flushed_at >= self.flush_interval
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("could not write back skill ratings; will retry")
+        return entry[0]
+
+    # Whole-game results (e.g. Memory Match) count as one answer at medium difficulty
+    def record_game(self, user_id, subject, score, max_score):
+        if max_score > 0:
+            self.record(user_id, subject, 2, max(0.0, min(1.0, score / max_score)))
+
+    # Difficulty whose predicted success rate is closest to TARGET_SUCCESS, among those available
+    def choose_difficulty(self, user_id, subject, available=tuple(DIFFICULTY_RATINGS)):
+        available = [d for d in available if d in DIFFICULTY_RATINGS]
+        if not available:
+            return None
+        if random.random() < EXPLORE_RATE:
+            return random.choice(available)
+        rating = self.rating(user_id, subject)
+        return min(available, key=lambda d: abs(expected_score(rating, DIFFICULTY_RATINGS[d]) - TARGET_SUCCESS))
+
+    def flush(self):
+        with self._lock:
+            rows = [key + tuple(self._ratings[key]) for key in self._dirty if key in self._ratings]
+            self._dirty.clear()
+            self._flushed_at = time.time()
+        if not rows:
+            return 0
+        try:
+            with self.db.transaction() as c:
+                c.executemany('''INSERT INTO user_skill (user_id, subject, rating, answers, updated_at)
+                                 VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                                 ON CONFLICT (user_id, subject) DO UPDATE SET
+                                     rating = excluded.rating,
+                                     answers = excluded.answers,
+                                     updated_at = excluded.updated_at''', rows)
+        except Exception:
+            # Keep the ratings dirty so the next flush retries them
+            with self._lock:
+                self._dirty.update(row[:2] for row in rows)
+            raise
+        return len(rows)
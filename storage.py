@@ -0,0 +1,167 @@
+# storage.py
+# Data-access layer for edugamify.db: a small pool of WAL-mode connections with
+# tuned pragmas, shared by every Streamlit session thread.
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get('EDUGAMIFY_DB', 'edugamify.db')
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+# How long a caller waits for a pooled connection when all of them are in use
+POOL_TIMEOUT = 30
+# sqlite3 keeps a per-connection cache of compiled statements keyed on the SQL text,
+# so the fixed queries in the helpers are prepared once per pooled connection.
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+]
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS users
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password TEXT,
+        name TEXT,
+        grade INTEGER,
+        school TEXT,
+        language TEXT DEFAULT 'English',
+        avatar TEXT DEFAULT 'student1',
+        points INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE IF NOT EXISTS chat_history
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        message TEXT,
+        response TEXT,
+        subject TEXT,
+        sentiment TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id))''',
+    '''CREATE TABLE IF NOT EXISTS analytics
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        subject TEXT,
+        time_spent INTEGER,
+        problems_solved INTEGER,
+        date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id))''',
+    '''CREATE TABLE IF NOT EXISTS gamification
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        badge_name TEXT,
+        badge_description TEXT,
+        earned_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id))''',
+    '''CREATE TABLE IF NOT EXISTS offline_content
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        subject TEXT,
+        content_type TEXT,
+        content TEXT,
+        grade_level INTEGER,
+        language TEXT,
+        download_count INTEGER DEFAULT 0)''',
+    '''CREATE TABLE IF NOT EXISTS game_scores
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        game_name TEXT,
+        score INTEGER,
+        subject TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id))''',
+]
+
+
+def create_schema(c):
+    for statement in SCHEMA:
+        c.execute(statement)
+
+
+class Database:
+    def __init__(self, path=DB_PATH, pool_size=POOL_SIZE):
+        self.path = path
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._created = 0
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # isolation_level=None: transactions are opened explicitly by transaction()
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        try:
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self._pool_size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._connect()
+            except BaseException:
+                # Give the slot back, or after pool_size failures every caller would wait forever
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._pool.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"no free connection to {self.path} after {POOL_TIMEOUT}s") from None
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    # One write transaction per call; BEGIN IMMEDIATE takes the write lock up front so
+    # concurrent writers queue on busy_timeout instead of failing mid-transaction.
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                yield c
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def query(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,64 @@
+# streaming.py
+# Helpers for streaming tutor answers: completed sentences are handed to a
+# translation pool as soon as they arrive, so translation runs behind the model
+# instead of after it.
+import re
+from collections import deque
+
+# Sentence ends (Latin and Devanagari danda) or line breaks, kept as separators
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])[ \t]+|\n+")
+
+
+# Split off the complete sentences in buffer: ([(sentence, separator), ...], remainder)
+def split_sentences(buffer):
+    segments = []
+    start = 0
+    for match in SENTENCE_END.finditer(buffer):
+        segments.append((buffer[start:match.start()], match.group()))
+        start = match.end()
+    return segments, buffer[start:]
+
+
+# Yields (english_so_far, translated_so_far) after every chunk and every finished translation.
+# translate(text) -> text runs on executor; with translate=None the English is passed through.
+def stream_translated(chunks, translate=None, executor=None):
+    english = []
+    if translate is None:
+        for chunk in chunks:
+            english.append(chunk)
+            text = "".join(english)
+            yield text, text
+        return
+
+    translated = []
+    pending = deque()
+    buffer = ""
+
+    def submit(text, separator):
+        future = executor.submit(translate, text) if text.strip() else None
+        pending.append((future, text, separator))
+
+    def collect(block):
+        while pending and (block or pending[0][0] is None or pending[0][0].done()):
+            future, text, separator = pending.popleft()
+            try:
+                text = future.result() if future else text
+            except Exception:
+                pass  # a failed or timed-out sentence is shown in English
+            translated.append(text + separator)
+            if block:
+                return
+
+    for chunk in chunks:
+        english.append(chunk)
+        buffer += chunk
+        segments, buffer = split_sentences(buffer)
+        for text, separator in segments:
+            submit(text, separator)
+        collect(block=False)
+        yield "".join(english), "".join(translated)
+    if buffer:
+        submit(buffer, "")
+    while pending:
+        collect(block=True)
+        yield "".join(english), "".join(translated)
@@ -0,0 +1,154 @@
+# translation_cache.py
+# Two-level cache for UI/content translations: an in-process LRU in front of
+# an on-disk SQLite table, keyed on (text, src, dest).
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+TRANSLATION_CACHE_DB = 'translation_cache.db'
+UI_CATALOG_PATH = 'ui_catalog.json'
+BATCH_SEPARATOR = '\n'
+
+
+class TranslationCache:
+    def __init__(self, backend, db_path=TRANSLATION_CACHE_DB, maxsize=4096, fan_out=None):
+        # backend(text, dest, src) -> translated text; may raise on failure
+        self.backend = backend
+        # fan_out(func, arg_tuples) -> results (exceptions in place) runs backend calls concurrently
+        self.fan_out = fan_out
+        self.maxsize = maxsize
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute('''CREATE TABLE IF NOT EXISTS translations
+                            (text TEXT,
+                             src TEXT,
+                             dest TEXT,
+                             translated TEXT,
+                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                             PRIMARY KEY (text, src, dest)) WITHOUT ROWID''')
+        self._db.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+        self.backend_time = 0.0
+
+    # In-process LRU
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, keys):
+        found = {}
+        disk_keys = []
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                    self.memory_hits += 1
+                else:
+                    disk_keys.append(key)
+            for key in disk_keys:
+                row = self._db.execute("SELECT translated FROM translations WHERE text = ? AND src = ? AND dest = ?",
+                                       key).fetchone()
+                if row:
+                    found[key] = row[0]
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def _store(self, items):
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+            self._db.executemany("INSERT OR REPLACE INTO translations (text, src, dest, translated) VALUES (?, ?, ?, ?)",
+                                 [key + (value,) for key, value in items.items()])
+            self._db.commit()
+
+    def _call_backend(self, text, dest, src):
+        start = time.perf_counter()
+        try:
+            return self.backend(text, dest, src)
+        finally:
+            with self._lock:
+                self.backend_calls += 1
+                self.backend_time += time.perf_counter() - start
+
+    def get(self, text, dest, src='en'):
+        return self._lookup([(text, src, dest)]).get((text, src, dest))
+
+    def translate(self, text, dest, src='en'):
+        return self.translate_many([text], dest, src)[0]
+
+    # Translate a whole page worth of strings; all cache misses go upstream in one request
+    def translate_many(self, texts, dest, src='en'):
+        keys = [(text, src, dest) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing = [key[0] for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            found.update(self._translate_missing(missing, dest, src))
+        # Backend failures fall back to the original text and are not cached
+        return [found.get(key, key[0]) for key in keys]
+
+    def _translate_missing(self, texts, dest, src):
+        translated = {}
+        if len(texts) > 1 and not any(BATCH_SEPARATOR in text for text in texts):
+            try:
+                result = self._call_backend(BATCH_SEPARATOR.join(texts), dest, src).split(BATCH_SEPARATOR)
+                if len(result) == len(texts):
+                    translated = {(text, src, dest): value.strip() for text, value in zip(texts, result)}
+            except Exception:
+                pass
+        # Whatever the joined request could not cover goes one string per request, concurrently if possible
+        remaining = [text for text in texts if (text, src, dest) not in translated]
+        if self.fan_out and len(remaining) > 1:
+            results = self.fan_out(self._call_backend, [(text, dest, src) for text in remaining])
+        else:
+            results = []
+            for text in remaining:
+                try:
+                    results.append(self._call_backend(text, dest, src))
+                except Exception as e:
+                    results.append(e)
+        for text, result in zip(remaining, results):
+            if not isinstance(result, BaseException):
+                translated[(text, src, dest)] = result
+        if translated:
+            self._store(translated)
+        return translated
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        avg_backend = self.backend_time / self.backend_calls if self.backend_calls else 0.0
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'backend_calls': self.backend_calls,
+            'backend_seconds': round(self.backend_time, 3),
+            'estimated_seconds_saved': round(hits * avg_backend, 3),
+            'lru_size': len(self._lru),
+        }
+
+
+# Precompiled UI strings written by build_ui_catalog.py: {lang_code: {english: translated}}
+def load_ui_catalog(path=UI_CATALOG_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('languages', {})
+    except (OSError, ValueError):
+        return {}
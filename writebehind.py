@@ -0,0 +1,272 @@
+# writebehind.py
+# Write-behind queue for learning events (chat turns, analytics, game scores).
+# Requests enqueue an event and return at once; a single writer thread drains the
+# queue and commits events in batches, one transaction per batch. The queue is
+# bounded, so producers wait when the writer falls behind instead of growing
+# memory. An optional spool file makes queued events survive a crash: each event
+# is appended before it is queued, and the highest committed sequence number is
+# stored in the same transaction as the batch, so a restart replays exactly the
+# events that never committed. A batch that still fails after MAX_RETRIES attempts
+# is written to <spool>.failed (or the log, without a spool) and dropped, so one
+# bad batch cannot stall the writer and every producer behind it.
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+QUEUE_SIZE = 1000
+BATCH_SIZE = 100
+BATCH_WINDOW = 0.02
+RETRY_DELAY = 0.5
+MAX_RETRIES = 5
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehind:
+    # handlers: {kind: handler(c, user_id, **payload) -> notices}, run on the writer's cursor.
+    # on_commit(user_id, points) is called once the event's transaction has committed.
+    def __init__(self, db, handlers, on_commit=None, spool_path=None, maxsize=QUEUE_SIZE,
+                 batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW, fsync=True):
+        self.db = db
+        self.handlers = dict(handlers)
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.fsync = fsync
+        # Capacity is a semaphore taken before _submit_lock, so a producer waiting for
+        # room never holds the lock the writer needs to truncate the spool
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(maxsize)
+        self._submit_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending_points = {}
+        self._notices = {}
+        self._seq = 0
+        self._commits = 0
+        self.committed = 0
+        self.failed = 0
+        self.batches = 0
+        self.dropped = 0
+        self.spool_path = os.path.abspath(spool_path) if spool_path else None
+        self._spool = None
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        if self.spool_path:
+            self._replay_spool()
+            self._spool = open(self.spool_path, 'a', encoding='utf-8')
+        atexit.register(self.close)
+
+    # Queue an event; blocks only while the queue is full
+    def submit(self, kind, user_id, points=0, **payload):
+        if kind not in self.handlers:
+            raise ValueError(f"no write-behind handler for {kind!r}")
+        self._slots.acquire()
+        with self._submit_lock:
+            self._seq += 1
+            event = {'seq': self._seq, 'kind': kind, 'user_id': user_id, 'points': points, 'payload': payload}
+            if self._spool:
+                self._spool.write(json.dumps(event, ensure_ascii=False) + '\n')
+                self._spool.flush()
+                if self.fsync:
+                    os.fsync(self._spool.fileno())
+            with self._lock:
+                self._pending_points[user_id] = self._pending_points.get(user_id, 0) + points
+            # Held across put() so queue order is sequence order, which the spool watermark relies on;
+            # the queue is unbounded, so put() never waits
+            self._queue.put(event)
+
+    # Committed points plus points still queued: the student always sees their own writes
+    def points(self, user_id):
+        while True:
+            with self._lock:
+                commits = self._commits
+            row = self.db.query_one("SELECT points FROM users WHERE id = ?", (user_id,))
+            with self._lock:
+                # A batch committed in between may already be in row; read again
+                if commits == self._commits:
+                    return (row[0] or 0 if row else 0) + self._pending_points.get(user_id, 0)
+
+    # Notices (e.g. new badge names) produced by the user's committed events since the last call
+    def take_notices(self, user_id):
+        with self._lock:
+            return self._notices.pop(user_id, [])
+
+    # Wait until everything queued so far has been committed (or dropped)
+    def flush(self, timeout=None):
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: self._queue.unfinished_tasks == 0, timeout)
+
+    def close(self, timeout=10):
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._spool:
+            self._spool.close()
+            self._spool = None
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'committed': self.committed,
+            'failed': self.failed,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'events_per_batch': self.committed / self.batches if self.batches else 0.0,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                break
+            batch = [first]
+            # Give concurrent requests a moment to join this commit
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(event)
+            if stopping:
+                # Drain whatever is left so shutdown loses nothing
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            self._write_batch(batch)
+            for _ in batch:
+                self._slots.release()
+                self._queue.task_done()
+
+    def _write_batch(self, batch):
+        for attempt in range(MAX_RETRIES):
+            try:
+                self._commit(batch)
+                return
+            except Exception:
+                # The whole transaction failed (e.g. the database stayed locked); keep the batch and retry
+                logger.exception("write-behind batch of %d events failed (attempt %d of %d)",
+                                 len(batch), attempt + 1, MAX_RETRIES)
+                if attempt + 1 < MAX_RETRIES:
+                    time.sleep(RETRY_DELAY * 2 ** attempt)
+        self._drop(batch)
+
+    # Give up on a batch that cannot commit (disk full, corrupt database, broken handler)
+    def _drop(self, batch):
+        lines = ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in batch)
+        if self.spool_path:
+            with open(self.spool_path + '.failed', 'a', encoding='utf-8') as f:
+                f.write(lines)
+            logger.error("dropped %d write-behind events; saved to %s.failed", len(batch), self.spool_path)
+        else:
+            logger.error("dropped %d write-behind events:\n%s", len(batch), lines)
+        with self._lock:
+            self._commits += 1
+            for event in batch:
+                user_id = event['user_id']
+                self._pending_points[user_id] -= event['points']
+                if not self._pending_points[user_id]:
+                    del self._pending_points[user_id]
+        self.dropped += len(batch)
+        self._truncate_spool(batch[-1]['seq'])
+
+    def _commit(self, batch):
+        results = []
+        with self.db.connection() as conn:
+            c = conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                for event in batch:
+                    # A savepoint per event: one bad event is dropped without losing the rest of the batch
+                    c.execute("SAVEPOINT event")
+                    try:
+                        notices = self.handlers[event['kind']](c, event['user_id'], points=event['points'], **event['payload'])
+                        c.execute("RELEASE SAVEPOINT event")
+                        results.append((event, notices or [], True))
+                    except Exception:
+                        c.execute("ROLLBACK TO SAVEPOINT event")
+                        c.execute("RELEASE SAVEPOINT event")
+                        logger.exception("dropping write-behind event %s", event['kind'])
+                        results.append((event, [], False))
+                if self.spool_path:
+                    c.execute('''INSERT INTO write_behind_state (spool, last_seq) VALUES (?, ?)
+                                 ON CONFLICT (spool) DO UPDATE SET last_seq = excluded.last_seq''',
+                              (self.spool_path, batch[-1]['seq']))
+            except BaseException:
+                conn.rollback()
+                raise
+            # Commit and settle pending points together so points() never counts an event twice
+            with self._lock:
+                conn.commit()
+                self._commits += 1
+                for event, notices, ok in results:
+                    user_id = event['user_id']
+                    self._pending_points[user_id] -= event['points']
+                    if not self._pending_points[user_id]:
+                        del self._pending_points[user_id]
+                    if notices:
+                        self._notices.setdefault(user_id, []).extend(notices)
+        self.batches += 1
+        for event, notices, ok in results:
+            if ok:
+                self.committed += 1
+                if self.on_commit and event['points']:
+                    self.on_commit(event['user_id'], event['points'])
+            else:
+                self.failed += 1
+        self._truncate_spool(batch[-1]['seq'])
+
+    # Once every spooled event has committed the spool can start over
+    def _truncate_spool(self, committed_seq):
+        if not self._spool:
+            return
+        with self._submit_lock:
+            if self._spool and self._seq == committed_seq:
+                self._spool.truncate(0)
+                self._spool.seek(0)
+
+    def _replay_spool(self):
+        row = self.db.query_one("SELECT last_seq FROM write_behind_state WHERE spool = ?", (self.spool_path,))
+        last_seq = row[0] if row else 0
+        self._seq = last_seq
+        if not os.path.exists(self.spool_path):
+            return
+        events = []
+        with open(self.spool_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # torn final line from a crash mid-write
+                self._seq = max(self._seq, event['seq'])
+                if event['seq'] > last_seq and event['kind'] in self.handlers:
+                    events.append(event)
+        # Rewrite the spool without the torn tail, so events appended from now on stay readable
+        tmp_path = self.spool_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(event, ensure_ascii=False) + '\n' for event in events)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
+        if events:
+            logger.warning("replaying %d uncommitted write-behind events from %s", len(events), self.spool_path)
+        for event in events:
+            self._slots.acquire()
+            with self._lock:
+                self._pending_points[event['user_id']] = self._pending_points.get(event['user_id'], 0) + event['points']
+            self._queue.put(event)